@@ -20,10 +20,288 @@
 #  ───────────────────────────────────────────────────────────────────
 
 import numpy
-from o2sclpy.utils import string_to_dict2
+from o2sclpy.utils import string_to_dict2, _replay_mix
+from o2sclpy.utils import _flatten_tree, _tree_walk
 from o2sclpy.hdf import *
 from o2sclpy.doc_data import version
 
+def _contig_input(v,n_dim):
+    """Return the points in ``v`` as a two-dimensional C-contiguous
+    float64 array, without copying if ``v`` is already in that
+    format, and a flag which is True if no conversion was required.
+    """
+    as_is=True
+    if (not isinstance(v,numpy.ndarray) or v.dtype!=numpy.float64 or
+        not v.flags.c_contiguous):
+        v=numpy.ascontiguousarray(v,dtype=numpy.float64)
+        as_is=False
+    if v.ndim==1:
+        v=v.reshape(1,-1)
+    if v.shape[1]!=n_dim:
+        raise ValueError('Points have dimension '+str(v.shape[1])+
+                         ' but the classifier expects '+str(n_dim)+'.')
+    return v,as_is
+
+def _eval_proba_list(model,v,trans,outformat,verbose,cls_name):
+    """Return the class probabilities from ``model`` at the points in
+    ``v`` for the ``eval_proba_list()`` method of the classifier
+    class named ``cls_name``
+
+    The points are transformed with ``trans.transform()`` unless
+    ``trans`` is None. If ``v`` is already a C-contiguous array of
+    type float64, then scikit-learn's check for infinite or NaN
+    values in ``model.predict_proba()`` is skipped. The result is a
+    list if ``outformat`` is ``'list'`` and a numpy array otherwise.
+    """
+    import sklearn
+
+    v,as_is=_contig_input(v,model.n_features_in_)
+    try:
+        if trans is not None:
+            v=trans.transform(v)
+        # Leave the setting unchanged (None) for converted input
+        with sklearn.config_context(assume_finite=(as_is or None)):
+            proba=model.predict_proba(v)
+    except Exception as e:
+        print('Exception in '+cls_name+'::eval_proba_list():',e)
+        raise
+    
+    if outformat=='list':
+        return proba.tolist()
+   
+    if verbose>1:
+        print(cls_name+'::eval_proba_list():',
+              'type(proba),proba:',type(proba),proba)
+                    
+    return numpy.ascontiguousarray(proba)
+
+def _reject_list(model,v,trans,label,threshold,cls_name):
+    """Return a boolean numpy array which is True for each point in
+    ``v`` for which the probability of the class ``label`` from
+    ``model`` is smaller than ``threshold``, for the
+    ``reject_list()`` method of the classifier class named
+    ``cls_name``. The arguments ``model``, ``v``, and ``trans`` are
+    as in :func:`_eval_proba_list`.
+    """
+    ix=numpy.nonzero(model.classes_==label)[0]
+    if len(ix)==0:
+        raise ValueError('Label '+str(label)+' not found in '+
+                         cls_name+'::reject_list().')
+    proba=_eval_proba_list(model,v,trans,'numpy',0,cls_name)
+    return proba[:,ix[0]]<threshold
+
+def _write_model_arrays(filename,obj_prefix,arrays):
+    """Write the numeric arrays in the dictionary ``arrays`` to the
+    HDF5 file ``filename`` as plain contiguous datasets named
+    ``obj_prefix+'_'+key``, replacing any datasets with the same
+    name. Contiguous, uncompressed datasets can be memory-mapped
+    by :func:`_read_model_arrays`.
+    """
+    import h5py
+    
+    with h5py.File(filename,'a') as f:
+        for key in arrays:
+            name=obj_prefix+'_'+key
+            if name in f:
+                del f[name]
+            f.create_dataset(name,data=numpy.ascontiguousarray
+                             (arrays[key]))
+    return
+
+def _read_model_arrays(filename,obj_prefix,keys,mmap=False):
+    """Read the arrays written by :func:`_write_model_arrays` and
+    return them in a dictionary. If ``mmap`` is True, then each
+    contiguous dataset is memory-mapped read-only using
+    ``numpy.memmap``, so that several processes on the same node
+    share one copy of the arrays through the page cache. Datasets
+    which cannot be mapped are read into memory.
+    """
+    import h5py
+
+    arrays={}
+    with h5py.File(filename,'r') as f:
+        for key in keys:
+            dset=f[obj_prefix+'_'+key]
+            offset=None
+            if mmap and dset.chunks is None and dset.compression is None:
+                offset=dset.id.get_offset()
+            if offset is not None:
+                arrays[key]=numpy.memmap(filename,mode='r',
+                                         dtype=dset.dtype,
+                                         offset=offset,shape=dset.shape)
+            else:
+                arrays[key]=dset[()]
+    return arrays
+
+def _dtc_to_arrays(dtc):
+    """Convert the fitted ``DecisionTreeClassifier`` object
+    ``dtc`` to the arrays and the metadata dictionary used by
+    :class:`_dtc_arrays`.
+    """
+    if dtc.n_outputs_!=1:
+        raise ValueError('Only single-output trees can be stored '+
+                         'as arrays.')
+    tree=dtc.tree_
+    feature,threshold,children,depth=_flatten_tree(tree)
+    proba=numpy.array(tree.value[:,0,:],dtype=numpy.float64)
+    norm=proba.sum(axis=1,keepdims=True)
+    norm[norm==0.0]=1.0
+    proba/=norm
+    arrays={'feature': feature,'threshold': threshold,
+            'children': children,'proba': proba}
+    meta={'classes': dtc.classes_,
+          'n_features_in': dtc.n_features_in_,
+          'depth': depth}
+    return arrays,meta
+
+class _dtc_arrays:
+    """Evaluate a fitted single-output scikit-learn decision tree
+    classifier from plain numeric arrays.
+
+    The tree is stored in the arrays ``feature``, ``threshold``,
+    and ``children`` created by :func:`o2sclpy.utils._flatten_tree`,
+    and the array ``proba`` of shape ``(n_nodes,n_classes)`` with
+    the class probabilities at each node.
+    """
+
+    def __init__(self,arrays,meta):
+        self.feature=arrays['feature']
+        self.threshold=arrays['threshold']
+        self.children=arrays['children']
+        self.proba=arrays['proba']
+        self.classes_=meta['classes']
+        self.n_features_in_=meta['n_features_in']
+        self.depth=meta['depth']
+        return
+
+    def predict_proba(self,v):
+        node=_tree_walk(self.feature,self.threshold,self.children,
+                        self.depth,v)
+        return numpy.asarray(self.proba[node])
+
+    def predict(self,v):
+        return self.classes_.take(numpy.argmax(self.predict_proba(v),
+                                               axis=1))
+
+def _mlpc_to_arrays(mlpc):
+    """Convert the fitted ``MLPClassifier`` object ``mlpc`` to
+    the arrays and the metadata dictionary used by
+    :class:`_mlpc_arrays`.
+    """
+    if mlpc.out_activation_ not in ['logistic','softmax']:
+        raise ValueError('Output activation '+
+                         str(mlpc.out_activation_)+
+                         ' cannot be stored as arrays.')
+    if mlpc.out_activation_=='logistic' and mlpc.n_outputs_!=1:
+        raise ValueError('Multilabel classifiers cannot be stored '+
+                         'as arrays.')
+    arrays={}
+    for i in range(len(mlpc.coefs_)):
+        arrays['coef_'+str(i)]=mlpc.coefs_[i]
+        arrays['intercept_'+str(i)]=mlpc.intercepts_[i]
+    meta={'n_layers': mlpc.n_layers_,
+          'activation': mlpc.activation,
+          'out_activation': mlpc.out_activation_,
+          'classes': mlpc.classes_,
+          'n_features_in': mlpc.n_features_in_}
+    return arrays,meta
+
+class _mlpc_arrays:
+    """Evaluate a fitted scikit-learn multi-layer perceptron
+    classifier from its weights and intercepts, stored in the
+    arrays ``coef_i`` and ``intercept_i`` for each layer ``i``.
+    """
+
+    def __init__(self,arrays,meta):
+        n=meta['n_layers']-1
+        self.coefs_=[arrays['coef_'+str(i)] for i in range(n)]
+        self.intercepts_=[arrays['intercept_'+str(i)] for i in range(n)]
+        self.activation=meta['activation']
+        self.out_activation_=meta['out_activation']
+        self.classes_=meta['classes']
+        self.n_features_in_=meta['n_features_in']
+        return
+
+    def _activate(self,z,name):
+        if name=='relu':
+            numpy.maximum(z,0.0,out=z)
+        elif name=='tanh':
+            numpy.tanh(z,out=z)
+        elif name=='logistic':
+            from scipy.special import expit
+            expit(z,out=z)
+        elif name=='softmax':
+            z-=z.max(axis=1,keepdims=True)
+            numpy.exp(z,out=z)
+            z/=z.sum(axis=1,keepdims=True)
+        elif name!='identity':
+            raise ValueError('Unknown activation '+str(name)+'.')
+        return z
+
+    def predict_proba(self,v):
+        z=numpy.asarray(v,dtype=numpy.float64)
+        if z.ndim==1:
+            z=z.reshape(1,-1)
+        n=len(self.coefs_)
+        for i in range(n):
+            z=z@self.coefs_[i]+self.intercepts_[i]
+            if i<n-1:
+                self._activate(z,self.activation)
+        self._activate(z,self.out_activation_)
+        if self.out_activation_=='logistic':
+            z=z.ravel()
+            return numpy.vstack([1.0-z,z]).T
+        return z
+
+    def predict(self,v):
+        return self.classes_.take(numpy.argmax(self.predict_proba(v),
+                                               axis=1))
+
+def _gnb_to_arrays(gnb):
+    """Convert the fitted ``GaussianNB`` object ``gnb`` to the
+    arrays and the metadata dictionary used by :class:`_gnb_arrays`.
+    """
+    arrays={'theta': gnb.theta_,'var': gnb.var_,
+            'class_prior': gnb.class_prior_}
+    meta={'classes': gnb.classes_,
+          'n_features_in': gnb.n_features_in_}
+    return arrays,meta
+
+class _gnb_arrays:
+    """Evaluate a fitted scikit-learn Gaussian naive Bayes classifier
+    from the arrays ``theta`` and ``var`` of shape
+    ``(n_classes,n_features)`` and the class priors ``class_prior``.
+    """
+
+    def __init__(self,arrays,meta):
+        self.theta_=arrays['theta']
+        self.var_=arrays['var']
+        self.class_prior_=arrays['class_prior']
+        self.classes_=meta['classes']
+        self.n_features_in_=meta['n_features_in']
+        return
+
+    def _joint_log_likelihood(self,v):
+        x=numpy.asarray(v,dtype=numpy.float64)
+        if x.ndim==1:
+            x=x.reshape(1,-1)
+        jll=numpy.zeros((x.shape[0],len(self.classes_)))
+        for i in range(len(self.classes_)):
+            jll[:,i]=(numpy.log(self.class_prior_[i])-0.5*
+                      numpy.sum(numpy.log(2.0*numpy.pi*self.var_[i,:])))
+            jll[:,i]-=0.5*numpy.sum(((x-self.theta_[i,:])**2)/
+                                    self.var_[i,:],1)
+        return jll
+
+    def predict_proba(self,v):
+        from scipy.special import logsumexp
+        jll=self._joint_log_likelihood(v)
+        return numpy.exp(jll-logsumexp(jll,axis=1,keepdims=True))
+
+    def predict(self,v):
+        return self.classes_.take(numpy.argmax(
+            self._joint_log_likelihood(v),axis=1))
+
 class classify_sklearn_dtc:
     """
     Classify a data set using scikit-learn's decision tree classifier.
@@ -191,10 +469,38 @@ class classify_sklearn_dtc:
                     
         return numpy.ascontiguousarray(pred)
 
-    def save(self,filename,obj_prefix="classify_sklearn_dtc"):
+    def eval_proba_list(self,v):
+        """Return the probability of each class at the array of
+        points stored in ``v`` as a two-dimensional numpy array of
+        shape ``(n_points,n_classes)``. The columns are ordered
+        according to the labels in ``self.dtc.classes_``.
+
+        If ``v`` is already a C-contiguous array of type float64,
+        it is used without conversion, and scikit-learn's check for
+        infinite or NaN values is skipped.
+        """
+        return _eval_proba_list(self.dtc,v,None,self.outformat,
+                                self.verbose,'classify_sklearn_dtc')
+
+    def reject_list(self,v,label,threshold=0.5):
+        """Return a boolean numpy array which is True for each point
+        in ``v`` for which the probability of the class ``label`` is
+        smaller than ``threshold``, for use as a fast pre-filter
+        which rejects points before more expensive computations.
+        """
+        return _reject_list(self.dtc,v,None,label,threshold,
+                            'classify_sklearn_dtc')
+
+    def save(self,filename,obj_prefix="classify_sklearn_dtc",
+             model_format='pickle'):
         """
         Save the classifer to an HDF5 file named ``filename`` as a
         string named ``obj_prefix``. 
+
+        If ``model_format`` is ``'arrays'``, then the tree is instead
+        stored in plain HDF5 datasets whose names begin with
+        ``obj_prefix``, which :meth:`load` can memory-map. This
+        format requires ``h5py`` and a single-output tree.
         """
         try:
             import pickle
@@ -214,8 +520,19 @@ class classify_sklearn_dtc:
                      "random_state": self.random_state,
                      "test_size": self.test_size}
             
+            if model_format=='arrays':
+                arrays,meta=_dtc_to_arrays(self.dtc)
+                loc_dct["format"]="arrays"
+                loc_dct["arrays"]=list(arrays.keys())
+                loc_dct["meta"]=meta
+                byte_string=b''
+            elif model_format=='pickle':
+                byte_string=pickle.dumps(self.dtc)
+            else:
+                raise ValueError("In classify_sklearn_dtc::save() "+
+                                 "unknown model format "+
+                                 str(model_format)+".")
             dct_string=pickle.dumps(loc_dct)
-            byte_string=pickle.dumps(self.dtc)
         except Exception as e:
             print('Exception 3 in classify_sklearn_dtc::save()',e)
             raise
@@ -238,18 +555,27 @@ class classify_sklearn_dtc:
             hf=o2sclpy.hdf_file()
             hf.open_or_create(filename)
             hf.sets(obj_prefix+'_dct',dct_string)
-            hf.sets(obj_prefix,byte_string)
+            if model_format=='pickle':
+                hf.sets(obj_prefix,byte_string)
             hf.close()
+            if model_format=='arrays':
+                _write_model_arrays(filename,obj_prefix,arrays)
         except Exception as e:
             print('Exception in classify_sklearn_dtc::save()',e)
             raise
 
         return
 
-    def load(self,filename,obj_prefix):
+    def load(self,filename,obj_prefix,mmap=False):
         """
         Load the classifer from an HDF5 file named ``filename`` as a
         string named ``obj_prefix``. 
+
+        If the classifier was saved with ``model_format='arrays'``,
+        then the tree is read from its datasets and, if ``mmap`` is
+        True, memory-mapped read-only, so that processes on the same
+        node share one copy. A classifier loaded in this way can be
+        evaluated, but not retrained.
         """
         import pickle
 
@@ -258,11 +584,15 @@ class classify_sklearn_dtc:
             hf.open(filename)
             s=o2sclpy.std_string()
             s2=o2sclpy.std_string()
-            hf.gets(obj_prefix,s)
             hf.gets(obj_prefix+'_dct',s2)
-            hf.close()
-            sb=s.to_bytes()
             sb2=s2.to_bytes()
+            arrays_format=(pickle.loads(sb2).get("format")=="arrays")
+            if arrays_format:
+                sb=b''
+            else:
+                hf.gets(obj_prefix,s)
+                sb=s.to_bytes()
+            hf.close()
         except Exception as e:
             print('Exception in classify_sklearn_dtc::load()',e)
             raise
@@ -298,7 +628,12 @@ class classify_sklearn_dtc:
             self.random_state=loc_dct["random_state"]
             self.test_size=loc_dct["test_size"]
             
-            self.dtc=pickle.loads(sb)
+            if arrays_format:
+                arrays=_read_model_arrays(filename,obj_prefix,
+                                          loc_dct["arrays"],mmap=mmap)
+                self.dtc=_dtc_arrays(arrays,loc_dct["meta"])
+            else:
+                self.dtc=pickle.loads(sb)
         except Exception as e:
             print('Exception 3 in classify_sklearn_dtc::load()',e)
             raise
@@ -319,6 +654,9 @@ class classify_sklearn_mlpc:
         self.outformat='numpy'
         self.SS1=0
         self.transform_in='none'
+        self.in_data=None
+        self.out_data=None
+        self.n_seen=0
         
         return
     
@@ -344,6 +682,9 @@ class classify_sklearn_mlpc:
         self.outformat=outformat
         self.verbose=verbose
         self.transform_in=transform_in
+        self.in_data=in_data
+        self.out_data=out_data
+        self.n_seen=numpy.shape(in_data)[0]
         
         if self.verbose>0:
             print('classify_sklearn_mlpc::set_data():')
@@ -419,6 +760,77 @@ class classify_sklearn_mlpc:
 
         return
     
+    def add_data(self,in_data,out_data,epochs=10,n_replay=None,
+                 update_scaler=True,n_reservoir=100000):
+        """Add new training data and update the classifier starting
+        from the current weights rather than retraining from
+        scratch.
+
+        The new points are combined with ``n_replay`` points chosen
+        randomly (by default, the same number as the number of new
+        points) from a reservoir which holds a uniform random sample
+        of at most ``n_reservoir`` of the previous training points,
+        and then ``MLPClassifier.fit()`` is warm-started from the
+        current weights with at most ``epochs`` iterations over the
+        combined data. The new data may not contain labels which were not
+        present in the original training data.
+
+        If ``update_scaler`` is True, then the 'moto' and
+        'standard' transformations are updated with the new data.
+        The 'quant' transformation cannot be updated incrementally
+        and is left unchanged.
+        """
+        if self.mlpc==0:
+            raise RuntimeError('No model in classify_sklearn_mlpc::'+
+                               'add_data(). Call set_data() first.')
+
+        out_data=numpy.reshape(out_data,(numpy.shape(out_data)[0],))
+        
+        # After load(), the previous training data is not available
+        n_new=numpy.shape(in_data)[0]
+        n_old=0
+        if self.in_data is not None:
+            n_old=numpy.shape(self.in_data)[0]
+        if n_replay is None:
+            n_replay=n_new
+        n_replay=min(n_replay,n_old)
+
+        if self.verbose>0:
+            print('classify_sklearn_mlpc::add_data():')
+            print('  new points:',n_new)
+            print('  reservoir points:',n_old)
+            print('  replayed points:',n_replay)
+            print('  epochs:',epochs)
+
+        if update_scaler and (self.transform_in=='moto' or
+                              self.transform_in=='standard'):
+            self.SS1.partial_fit(in_data)
+
+        if n_old>0:
+            self.out_data=numpy.reshape(self.out_data,(n_old,))
+        (x_train,y_train,self.in_data,self.out_data,
+         self.n_seen)=_replay_mix(self.in_data,self.out_data,
+                                  self.n_seen,in_data,out_data,
+                                  n_replay,n_reservoir)
+            
+        if self.transform_in!='none':
+            x_train=self.SS1.transform(x_train)
+
+        # Temporarily switch to a warm start with a bounded number
+        # of iterations
+        max_iter=self.mlpc.max_iter
+        self.mlpc.set_params(warm_start=True,max_iter=epochs)
+        try:
+            self.mlpc.fit(x_train,y_train)
+        except Exception as e:
+            print('Exception in classify_sklearn_mlpc::add_data()',
+                  'at fit().',e)
+            raise
+        finally:
+            self.mlpc.set_params(warm_start=False,max_iter=max_iter)
+
+        return
+    
     def set_data_str(self,in_data,out_data,options):
         """
         Set the input and output data to train the interpolator,
@@ -482,6 +894,8 @@ class classify_sklearn_mlpc:
         """
 
         try:
+            if self.transform_in!='none':
+                v=self.SS1.transform(v)
             pred=self.mlpc.predict(v)
         except Exception as e:
             print('Exception in classify_sklearn_mlpc::eval_list():',e)
@@ -497,10 +911,44 @@ class classify_sklearn_mlpc:
                     
         return numpy.ascontiguousarray(pred)
 
-    def save(self,filename,obj_prefix="classify_sklearn_mlpc"):
+    def eval_proba_list(self,v):
+        """Return the probability of each class at the array of
+        points stored in ``v`` as a two-dimensional numpy array of
+        shape ``(n_points,n_classes)``. The columns are ordered
+        according to the labels in ``self.mlpc.classes_``.
+
+        If ``v`` is already a C-contiguous array of type float64,
+        it is used without conversion, and scikit-learn's check for
+        infinite or NaN values is skipped.
+        """
+        trans=None
+        if self.transform_in!='none':
+            trans=self.SS1
+        return _eval_proba_list(self.mlpc,v,trans,self.outformat,
+                                self.verbose,'classify_sklearn_mlpc')
+
+    def reject_list(self,v,label,threshold=0.5):
+        """Return a boolean numpy array which is True for each point
+        in ``v`` for which the probability of the class ``label`` is
+        smaller than ``threshold``, for use as a fast pre-filter
+        which rejects points before more expensive computations.
+        """
+        trans=None
+        if self.transform_in!='none':
+            trans=self.SS1
+        return _reject_list(self.mlpc,v,trans,label,threshold,
+                            'classify_sklearn_mlpc')
+
+    def save(self,filename,obj_prefix="classify_sklearn_mlpc",
+             model_format='pickle'):
         """
         Save the classifer to an HDF5 file named ``filename`` as a
         string named ``obj_prefix``. 
+
+        If ``model_format`` is ``'arrays'``, then the weights and intercepts of each layer are
+        instead stored in plain HDF5 datasets whose names begin with
+        ``obj_prefix``, which :meth:`load` can memory-map. This
+        format requires ``h5py``.
         """
         import pickle
 
@@ -509,8 +957,22 @@ class classify_sklearn_mlpc:
                              "object prefix cannot be empty.")
         
         loc_dct={"version": version}
+        if model_format=='arrays':
+            arrays,meta=_mlpc_to_arrays(self.mlpc)
+            loc_dct["format"]="arrays"
+            loc_dct["arrays"]=list(arrays.keys())
+            loc_dct["meta"]=meta
+            loc_dct["transform_in"]=self.transform_in
+            loc_dct["SS1"]=self.SS1
+            loc_dct["outformat"]=self.outformat
+            byte_string=b''
+        elif model_format=='pickle':
+            byte_string=pickle.dumps(self.mlpc)
+        else:
+            raise ValueError("In classify_sklearn_mlpc::save() "+
+                             "unknown model format "+
+                             str(model_format)+".")
         dct_string=pickle.dumps(loc_dct)
-        byte_string=pickle.dumps(self.mlpc)
 
         if self.verbose>2:
             print('In classify_sklearn_mlpc::save().')
@@ -521,18 +983,27 @@ class classify_sklearn_mlpc:
             hf=o2sclpy.hdf_file()
             hf.open_or_create(filename)
             hf.sets(obj_prefix+'_dct',dct_string)
-            hf.sets(obj_prefix,byte_string)
+            if model_format=='pickle':
+                hf.sets(obj_prefix,byte_string)
             hf.close()
+            if model_format=='arrays':
+                _write_model_arrays(filename,obj_prefix,arrays)
         except Exception as e:
             print('Exception in classify_sklearn_mlpc::save()',e)
             raise
         
         return
 
-    def load(self,filename,obj_prefix):
+    def load(self,filename,obj_prefix,mmap=False):
         """
         Load the classifer from an HDF5 file named ``filename`` as a
         string named ``obj_prefix``. 
+
+        If the classifier was saved with ``model_format='arrays'``,
+        then its arrays are read from their datasets and, if
+        ``mmap`` is True, memory-mapped read-only, so that processes
+        on the same node share one copy. A classifier loaded in this
+        way can be evaluated, but not retrained.
         """
         import pickle
 
@@ -541,11 +1012,15 @@ class classify_sklearn_mlpc:
             hf.open(filename)
             s=o2sclpy.std_string()
             s2=o2sclpy.std_string()
-            hf.gets(obj_prefix,s)
             hf.gets(obj_prefix+'_dct',s2)
-            hf.close()
-            sb=s.to_bytes()
             sb2=s2.to_bytes()
+            arrays_format=(pickle.loads(sb2).get("format")=="arrays")
+            if arrays_format:
+                sb=b''
+            else:
+                hf.gets(obj_prefix,s)
+                sb=s.to_bytes()
+            hf.close()
         except Exception as e:
             print('Exception in classify_sklearn_mlpc::load()',e)
             raise
@@ -560,7 +1035,15 @@ class classify_sklearn_mlpc:
             raise ValueError("In function classify_sklearn_mlpc::"+
                              "load(): Cannot read files with version "+
                              loc_dct["version"])
-        self.mlpc=pickle.loads(sb)
+        if arrays_format:
+            arrays=_read_model_arrays(filename,obj_prefix,
+                                      loc_dct["arrays"],mmap=mmap)
+            self.mlpc=_mlpc_arrays(arrays,loc_dct["meta"])
+            self.transform_in=loc_dct["transform_in"]
+            self.SS1=loc_dct["SS1"]
+            self.outformat=loc_dct["outformat"]
+        else:
+            self.mlpc=pickle.loads(sb)
 
         return
     
@@ -630,13 +1113,13 @@ class classify_sklearn_gnb:
             try:
                 from sklearn.model_selection import train_test_split
                 x_train,x_test,y_train,y_test=train_test_split(
-                    in_data,out_data,test_size=test_size)
+                    in_data_trans,out_data,test_size=test_size)
             except Exception as e:
                 print('Exception in classify_sklearn_gnb::set_data()',
                       'at test_train_split().',e)
                 raise
         else:
-            x_train=in_data
+            x_train=in_data_trans
             y_train=out_data
             
         # ────────────────────────────────────────────────────────────
@@ -712,6 +1195,8 @@ class classify_sklearn_gnb:
         """
 
         try:
+            if self.transform_in!='none':
+                v=self.SS1.transform(v)
             pred=self.gnb.predict(v)
         except Exception as e:
             print('Exception in classify_sklearn_gnb::eval_list():',e)
@@ -727,10 +1212,44 @@ class classify_sklearn_gnb:
                     
         return numpy.ascontiguousarray(pred)
 
-    def save(self,filename,obj_prefix="classify_sklearn_gnb"):
+    def eval_proba_list(self,v):
+        """Return the probability of each class at the array of
+        points stored in ``v`` as a two-dimensional numpy array of
+        shape ``(n_points,n_classes)``. The columns are ordered
+        according to the labels in ``self.gnb.classes_``.
+
+        If ``v`` is already a C-contiguous array of type float64,
+        it is used without conversion, and scikit-learn's check for
+        infinite or NaN values is skipped.
+        """
+        trans=None
+        if self.transform_in!='none':
+            trans=self.SS1
+        return _eval_proba_list(self.gnb,v,trans,self.outformat,
+                                self.verbose,'classify_sklearn_gnb')
+
+    def reject_list(self,v,label,threshold=0.5):
+        """Return a boolean numpy array which is True for each point
+        in ``v`` for which the probability of the class ``label`` is
+        smaller than ``threshold``, for use as a fast pre-filter
+        which rejects points before more expensive computations.
+        """
+        trans=None
+        if self.transform_in!='none':
+            trans=self.SS1
+        return _reject_list(self.gnb,v,trans,label,threshold,
+                            'classify_sklearn_gnb')
+
+    def save(self,filename,obj_prefix="classify_sklearn_gnb",
+             model_format='pickle'):
         """
         Save the classifer to an HDF5 file named ``filename`` as a
         string named ``obj_prefix``. 
+
+        If ``model_format`` is ``'arrays'``, then the class means, variances, and priors are
+        instead stored in plain HDF5 datasets whose names begin with
+        ``obj_prefix``, which :meth:`load` can memory-map. This
+        format requires ``h5py``.
         """
         import pickle
 
@@ -740,23 +1259,46 @@ class classify_sklearn_gnb:
         
         try:
             loc_dct={"version": version}
+            if model_format=='arrays':
+                arrays,meta=_gnb_to_arrays(self.gnb)
+                loc_dct["format"]="arrays"
+                loc_dct["arrays"]=list(arrays.keys())
+                loc_dct["meta"]=meta
+                loc_dct["transform_in"]=self.transform_in
+                loc_dct["SS1"]=self.SS1
+                loc_dct["outformat"]=self.outformat
+                byte_string=b''
+            elif model_format=='pickle':
+                byte_string=pickle.dumps(self.gnb)
+            else:
+                raise ValueError("In classify_sklearn_gnb::save() "+
+                                 "unknown model format "+
+                                 str(model_format)+".")
             dct_string=pickle.dumps(loc_dct)
-            byte_string=pickle.dumps(self.gnb)
             hf=o2sclpy.hdf_file()
             hf.open_or_create(filename)
             hf.sets(obj_prefix+'_dct',dct_string)
-            hf.sets(obj_prefix,byte_string)
+            if model_format=='pickle':
+                hf.sets(obj_prefix,byte_string)
             hf.close()
+            if model_format=='arrays':
+                _write_model_arrays(filename,obj_prefix,arrays)
         except Exception as e:
             print('Exception in classify_sklearn_gnb::save()',e)
             raise
         
         return
 
-    def load(self,filename,obj_prefix="classify_sklearn_gnb"):
+    def load(self,filename,obj_prefix="classify_sklearn_gnb",mmap=False):
         """
         Load the classifer from an HDF5 file named ``filename`` as a
         string named ``obj_prefix``. 
+
+        If the classifier was saved with ``model_format='arrays'``,
+        then its arrays are read from their datasets and, if
+        ``mmap`` is True, memory-mapped read-only, so that processes
+        on the same node share one copy. A classifier loaded in this
+        way can be evaluated, but not retrained.
         """
         import pickle
 
@@ -765,11 +1307,15 @@ class classify_sklearn_gnb:
             hf.open(filename)
             s=o2sclpy.std_string()
             s2=o2sclpy.std_string()
-            hf.gets(obj_prefix,s)
             hf.gets(obj_prefix+'_dct',s2)
-            hf.close()
-            sb=s.to_bytes()
             sb2=s2.to_bytes()
+            arrays_format=(pickle.loads(sb2).get("format")=="arrays")
+            if arrays_format:
+                sb=b''
+            else:
+                hf.gets(obj_prefix,s)
+                sb=s.to_bytes()
+            hf.close()
         except Exception as e:
             print('Exception in classify_sklearn_gnb::load()',e)
             raise
@@ -779,7 +1325,15 @@ class classify_sklearn_gnb:
             raise ValueError("In function classify_sklearn_gnb::"+
                              "load(): Cannot read files with version "+
                              loc_dct["version"])
-        self.gnb=pickle.loads(sb)
+        if arrays_format:
+            arrays=_read_model_arrays(filename,obj_prefix,
+                                      loc_dct["arrays"],mmap=mmap)
+            self.gnb=_gnb_arrays(arrays,loc_dct["meta"])
+            self.transform_in=loc_dct["transform_in"]
+            self.SS1=loc_dct["SS1"]
+            self.outformat=loc_dct["outformat"]
+        else:
+            self.gnb=pickle.loads(sb)
 
         return
     
@@ -20,7 +20,7 @@
 #  ───────────────────────────────────────────────────────────────────
 
 import numpy
-from o2sclpy.utils import string_to_dict2
+from o2sclpy.utils import string_to_dict2, _iter_chunks
 from o2sclpy.doc_data import version
 from o2sclpy.base import *
 
@@ -44,6 +44,8 @@ class dimred_sklearn_pca:
         self.pca=0
         self.SS1=0
         self.transform=0
+        self.method='full'
+        self.chunk_size=100000
         
         return
     
@@ -109,10 +111,170 @@ class dimred_sklearn_pca:
 
         return out_data
 
+    def run_stream(self,source,n_components=None,verbose=0,
+                   transform='standard',whiten=False,chunk_size=0,
+                   col_names=None):
+        """Compute the principal components with an incremental
+        PCA, reading the data in blocks of rows
+
+        The object ``source`` can be a numpy array of shape
+        ``(n_points,n_dim)``, a :class:`table` object (in which case
+        ``col_names`` gives the list of columns to use), or any
+        re-iterable object which yields two-dimensional arrays, such
+        as an :class:`interpm_hdf_source` object reading tables from
+        one or more HDF5 files. Only one block of at most
+        ``chunk_size`` rows (or :attr:`chunk_size` rows if
+        ``chunk_size`` is zero) is stored in memory at a time, so the
+        full data set does not need to fit in memory. Each block must
+        have at least ``n_components`` rows.
+
+        The data is read twice if ``transform`` is 'standard' or
+        'moto' (once to fit the scaling and once to fit the PCA) and
+        once otherwise. The 'quant' transformation requires the full
+        data set and is not supported here.
+
+        This function returns None, use :meth:`transform_table()` or
+        the ``pca`` attribute to project data on to the components.
+        """
+        self.verbose=verbose
+        self.n_components=n_components
+        self.whiten=whiten
+        self.transform=transform
+        self.method='incremental'
+        if chunk_size<=0:
+            chunk_size=self.chunk_size
+        
+        if self.verbose>0:
+            print('dimred_sklearn_pca::run_stream():')
+            print('  verbose:',verbose)
+            print('  n_components:',n_components)
+            print('  whiten:',whiten)
+            print('  transform:',transform)
+            print('  chunk_size:',chunk_size)
+
+        from sklearn.preprocessing import MinMaxScaler
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.decomposition import IncrementalPCA
+
+        if self.transform=='moto':
+            self.SS1=MinMaxScaler(feature_range=(-1,1))
+        elif self.transform=='standard':
+            self.SS1=StandardScaler()
+        elif self.transform=='quant':
+            print('Transform \'quant\' not supported in',
+                  'dimred_sklearn_pca::run_stream().')
+            raise ValueError('Transform \'quant\' not supported in '+
+                             'dimred_sklearn_pca::run_stream().')
+        else:
+            self.SS1=0
+
+        # First pass to fit the scaling
+        if self.SS1!=0:
+            n_points=0
+            for x in _iter_chunks(source,chunk_size,col_names):
+                self.SS1.partial_fit(x)
+                n_points+=x.shape[0]
+            if n_points==0:
+                print('No data in dimred_sklearn_pca::run_stream().')
+                raise ValueError('No data in '+
+                                 'dimred_sklearn_pca::run_stream().')
+            if self.verbose>0:
+                print('  scaling fit to',n_points,'points.')
+
+        # Second pass to fit the principal components
+        try:
+            self.pca=IncrementalPCA(n_components=self.n_components,
+                                    whiten=self.whiten)
+            n_points=0
+            for x in _iter_chunks(source,chunk_size,col_names):
+                if self.SS1!=0:
+                    x=self.SS1.transform(x)
+                self.pca.partial_fit(x)
+                n_points+=x.shape[0]
+                
+        except Exception as e:
+            print('Exception in dimred_sklearn_pca::run_stream()',
+                  'at partial_fit().',e)
+            raise
+
+        if n_points==0:
+            print('No data in dimred_sklearn_pca::run_stream().')
+            raise ValueError('No data in '+
+                             'dimred_sklearn_pca::run_stream().')
+        if self.verbose>0:
+            print('  PCA fit to',n_points,'points.')
+            
+        return
+
+    def transform_table(self,tab,in_cols,out_prefix='pca_',out_cols=[],
+                        chunk_size=0):
+        """Project the columns ``in_cols`` of the table ``tab`` on to
+        the principal components and store the result in new columns
+
+        The output column names are taken from ``out_cols``, and
+        ``out_prefix`` followed by the component index is used for
+        any components beyond the end of ``out_cols``. The table is
+        processed in blocks of ``chunk_size`` rows (or
+        :attr:`chunk_size` rows if ``chunk_size`` is zero) and the
+        results are written directly into the table columns.
+        """
+        if self.pca==0:
+            print('PCA not computed in',
+                  'dimred_sklearn_pca::transform_table().')
+            raise ValueError('PCA not computed in '+
+                             'dimred_sklearn_pca::transform_table().')
+        if chunk_size<=0:
+            chunk_size=self.chunk_size
+
+        for i in range(0,len(in_cols)):
+            if tab.is_column(in_cols[i])==False:
+                raise ValueError('Column '+in_cols[i]+
+                                 ' is not in the table.')
+            
+        n_comp=self.pca.components_.shape[0]
+        out_cols_loc=[]
+        for i in range(0,n_comp):
+            if i<len(out_cols):
+                out_cols_loc.append(out_cols[i])
+            else:
+                out_cols_loc.append(out_prefix+str(i))
+        for j in range(0,n_comp):
+            if tab.is_column(out_cols_loc[j])==False:
+                tab.new_column(out_cols_loc[j])
+
+        # Obtain the column views after all of the new columns
+        # have been created
+        n_lines=tab.get_nlines()
+        in_views=[tab[name] for name in in_cols]
+        out_views=[tab[name] for name in out_cols_loc]
+        for i in range(0,n_lines,chunk_size):
+            k=min(i+chunk_size,n_lines)
+            x=numpy.column_stack([col[i:k] for col in in_views])
+            if self.SS1!=0:
+                x=self.SS1.transform(x)
+            y=self.pca.transform(x)
+            for j in range(0,n_comp):
+                out_views[j][i:k]=y[:,j]
+                
+        return out_cols_loc
+    
     def run_table(self,tab,in_cols,n_components=None,verbose=0,
                   replace=False,out_prefix='pca_',out_cols=[],
                   random_state=None,svd_solver='auto',whiten=False,
-                  tol=0.0):
+                  tol=0.0,method='full',chunk_size=0):
+        """Compute the principal components of the columns
+        ``in_cols`` in table ``tab`` and store the projected data in
+        new columns
+
+        If ``method`` is 'full', then the selected columns are copied
+        into one array and sent to :meth:`run()`. Setting
+        ``svd_solver`` to 'randomized' then gives a faster
+        approximate decomposition when ``n_components`` is small. If
+        ``method`` is 'incremental', then the table is read in blocks
+        of ``chunk_size`` rows using :meth:`run_stream()` and
+        :meth:`transform_table()`, which avoids a full copy of the
+        data.
+        """
 
         # First check that all columns specified in 'in_cols' are
         # actually in the table.
@@ -122,51 +284,67 @@ class dimred_sklearn_pca:
                 raise ValueError('Column '+in_cols[i]+
                                  ' is not in the table.')
 
-        # Construct the list of output columns from out_prefix and out_cols
+        if verbose>0:
+            print("dimred_sklearn_pca::run_table():")
+            print("  Input columns:",in_cols)
+            print("  n_components:",n_components)
+            print("  replace:",replace)
+            print("  method:",method)
+
+        if method=='incremental':
             
-        out_cols_loc=[]
-        if n_components is not None:
+            self.run_stream(tab,n_components,verbose=verbose,
+                            whiten=whiten,chunk_size=chunk_size,
+                            col_names=in_cols)
+            out_cols_loc=self.transform_table(tab,in_cols,out_prefix,
+                                              out_cols,chunk_size)
+            
+        elif method=='full':
+            
+            # Construct the input data matrix from the column views
+            n_lines=tab.get_nlines()
+            in_data=numpy.column_stack([tab[name][0:n_lines]
+                                        for name in in_cols])
+            
+            # Perform the dimensional reduction
+            out_data=self.run(in_data,n_components,verbose=verbose,
+                              random_state=random_state,
+                              tol=tol,whiten=whiten,
+                              svd_solver=svd_solver)
+            del in_data
+
+            # Add the output data to the table
+            if n_components is None:
+                n_components=numpy.shape(out_data)[1]
+                print('Setting n_components to ',n_components)
+            
+            out_cols_loc=[]
             for i in range(0,n_components):
                 if i<len(out_cols):
                     out_cols_loc.append(out_cols[i])
                 else:
                     out_cols_loc.append(out_prefix+str(i))
+                    
+            for j in range(0,n_components):
+                if tab.is_column(out_cols_loc[j])==False:
+                    tab.new_column(out_cols_loc[j])
+            for j in range(0,n_components):
+                tab[out_cols_loc[j]][0:n_lines]=out_data[:,j]
+                
+        else:
+            print('Unknown method',method,'in',
+                  'dimred_sklearn_pca::run_table().')
+            raise ValueError('Unknown method '+str(method)+' in '+
+                             'dimred_sklearn_pca::run_table().')
 
         if verbose>0:
-            print("dimred_sklearn_pca::run_table():")
-            print("  Input columns:",in_cols)
             print("  Output columns:",out_cols_loc)
-            print("  n_components:",n_components)
-            print("  replace:",replace)
-
-        # Construct the input data matrix (brute force)
-        in_data=numpy.zeros((tab.get_nlines(),len(in_cols)))
-        for i in range(0,tab.get_nlines()):
-            for j in range(0,len(in_cols)):
-                in_data[i][j]=tab.get(in_cols[j],i)
-
-        # Perform the dimensional reduction
-        out_data=self.run(in_data,n_components,verbose=verbose,
-                          random_state=random_state,
-                          tol=tol,whiten=whiten,
-                          svd_solver=svd_solver)
-
+            
         # Remove the old columns if requested
         if replace==True:
-            for i in range(i,len(in_cols)):
+            for i in range(0,len(in_cols)):
                 tab.delete_column(in_cols[i])
         
-        # Add the output data to the table
-        if n_components is None:
-            n_components=numpy.shape(out_data)[1]
-            print('Setting n_components to ',n_components)
-
-        for j in range(0,n_components):
-            if tab.is_column(out_cols_loc[j])==False:
-                tab.new_column(out_cols_loc[j])
-            for i in range(0,tab.get_nlines()):
-                tab.set(out_cols_loc[j],i,out_data[i][j])
-                
         return
     
     def run_table_str(self,tab,n_components,input_cols,options):
@@ -177,7 +355,8 @@ class dimred_sklearn_pca:
 
         dct=string_to_dict2(options,list_of_ints=['random_state',
                                                   'n_components',
-                                                  'verbose'],
+                                                  'verbose',
+                                                  'chunk_size'],
                             list_of_floats=['tol'],
                             list_of_bools=['replace','whiten'])
         
@@ -211,6 +390,33 @@ class dimred_sklearn_pca:
         return
 
     
+_tsne_nn_cache={}
+"""
+Cache of the nearest-neighbor distances (or the full distance matrix
+for the exact method) used to compute the t-SNE affinities, indexed by
+a hash of the data and the perplexity
+"""
+
+_tsne_emb_cache={}
+"""
+Cache of t-SNE embeddings, indexed by a hash of the data and all of
+the parameters
+"""
+
+_tsne_cache_max=4
+"""
+The maximum number of entries in each of the t-SNE caches
+"""
+
+def _tsne_cache_store(cache,key,value):
+    """Store ``value`` in ``cache``, removing the oldest entry if
+    the cache is full
+    """
+    if key not in cache and len(cache)>=_tsne_cache_max:
+        del cache[next(iter(cache))]
+    cache[key]=value
+    return
+
 class dimred_sklearn_tsne:
     """
     """
@@ -220,6 +426,19 @@ class dimred_sklearn_tsne:
     Verbosity parameter (default 0)
     """
 
+    exact_max=2000
+    """
+    The largest number of points for which the 'auto' method uses the
+    exact O(N^2) algorithm (default 2000)
+    """
+
+    fft_min=20000
+    """
+    The smallest number of points for which the 'auto' method uses the
+    FFT-accelerated algorithm from openTSNE, if it is installed 
+    (default 20000)
+    """
+
     def __init__(self):
 
         self.verbose=0
@@ -229,22 +448,119 @@ class dimred_sklearn_tsne:
         self.transform=0
         self.SS1=0
         self.tsne=0
+        self.method='auto'
+        self.n_jobs=1
+        self.perplexity=30.0
         
         return
+
+    def _select_method(self,n_points,method):
+        """Return the t-SNE algorithm to use for ``n_points`` points,
+        resolving ``method='auto'`` and falling back to Barnes-Hut
+        when openTSNE is not installed
+        """
+        if method=='auto':
+            if self.n_components>3 or n_points<=self.exact_max:
+                return 'exact'
+            if n_points>=self.fft_min and self.n_components<=2:
+                try:
+                    import openTSNE
+                    return 'fft'
+                except ImportError:
+                    pass
+            return 'barnes_hut'
+        
+        if method=='fft':
+            try:
+                import openTSNE
+            except ImportError:
+                print('dimred_sklearn_tsne::run(): Method fft requires',
+                      'openTSNE. Using barnes_hut.')
+                return 'barnes_hut'
+            
+        if method not in ['exact','barnes_hut','fft']:
+            print('Unknown method',method,'in dimred_sklearn_tsne::run().')
+            raise ValueError('Unknown method '+str(method)+' in '+
+                             'dimred_sklearn_tsne::run().')
+        return method
+
+    def _neighbors(self,in_data_trans,data_hash,method):
+        """Return the distances used to compute the affinities, either
+        the sparse nearest-neighbor graph (for the Barnes-Hut method)
+        or the dense distance matrix (for the exact method), using
+        the cache if possible
+        """
+        key=(data_hash,method,self.perplexity)
+        if key in _tsne_nn_cache:
+            if self.verbose>0:
+                print('dimred_sklearn_tsne::run(): Using cached',
+                      'distances.')
+            return _tsne_nn_cache[key]
+        
+        if method=='exact':
+            from sklearn.metrics import pairwise_distances
+            dist=pairwise_distances(in_data_trans,n_jobs=self.n_jobs)
+        else:
+            from sklearn.neighbors import NearestNeighbors
+            n_points=in_data_trans.shape[0]
+            n_neighbors=min(n_points-1,int(3.0*self.perplexity+1))
+            # Include each point as its own neighbor, since
+            # scikit-learn removes it from a precomputed graph
+            knn=NearestNeighbors(n_neighbors=n_neighbors+1,
+                                 n_jobs=self.n_jobs)
+            knn.fit(in_data_trans)
+            dist=knn.kneighbors_graph(in_data_trans,mode='distance')
+            del knn
+            
+        _tsne_cache_store(_tsne_nn_cache,key,dist)
+        return dist
+
+    def _pca_init(self,in_data_trans):
+        """Return the PCA initialization used by scikit-learn's TSNE,
+        which it cannot compute when the distances are precomputed
+        """
+        from sklearn.decomposition import PCA
+        
+        pca=PCA(n_components=self.n_components,
+                random_state=self.random_state)
+        init=pca.fit_transform(in_data_trans).astype(numpy.float32,
+                                                     copy=False)
+        return init/numpy.std(init[:,0])*1.0e-4
     
     def run(self,in_data,n_components=2,verbose=0,
             min_grad_norm=1.0e-7,random_state=None,
-            transform='standard'):
+            transform='standard',method='auto',n_jobs=1,
+            perplexity=30.0,cache=True,cache_dir=''):
         """Set the input and output data to train the classifier
 
         The variable ``in_data`` should be an array of shape
         ``(n_points,n_dim)``
+
+        The value of ``method`` can be 'exact', 'barnes_hut',
+        'fft' (which requires openTSNE), or 'auto', which chooses
+        the exact method for at most :attr:`exact_max` points (or
+        more than three components), the FFT-accelerated method for
+        at least :attr:`fft_min` points if openTSNE is installed, and
+        Barnes-Hut otherwise. The parameter ``n_jobs`` gives the
+        number of threads used for the neighbor search and the
+        gradient (-1 for all cores).
+
+        If ``cache`` is True, the distances used to compute the
+        affinities and the final embedding are stored in memory,
+        indexed by a hash of the transformed data and the
+        parameters, so calling this function again with the same
+        data returns immediately. Changing only the parameters of
+        the optimization reuses the cached distances. If
+        ``cache_dir`` is not empty, the embedding is also stored in
+        a file in that directory.
         """
         self.verbose=verbose
         self.transform=transform
         self.n_components=n_components
         self.random_state=random_state
         self.min_grad_norm=min_grad_norm
+        self.n_jobs=n_jobs
+        self.perplexity=perplexity
        
         if self.verbose>0:
             print('dimred_sklearn_tsne::set_data():')
@@ -254,6 +570,9 @@ class dimred_sklearn_tsne:
             print('  n_components:',n_components)
             print('  random_state:',random_state)
             print('  min_grad_norm:',min_grad_norm)
+            print('  method:',method)
+            print('  n_jobs:',n_jobs)
+            print('  perplexity:',perplexity)
 
         # ----------------------------------------------------------
         # Handle the data transformation
@@ -273,25 +592,128 @@ class dimred_sklearn_tsne:
             in_data_trans=self.SS1.fit_transform(in_data)
         else:
             in_data_trans=in_data
+        in_data_trans=numpy.ascontiguousarray(in_data_trans,
+                                              dtype=numpy.float64)
+
+        n_points=in_data_trans.shape[0]
+        self.method=self._select_method(n_points,method)
+        if self.verbose>0:
+            print('  Using method',self.method,'for',n_points,'points.')
+
+        # ----------------------------------------------------------
+        # Check the caches
+        
+        if cache==True or len(cache_dir)>0:
+            import os
+            import json
+            import hashlib
+            
+            h=hashlib.sha256()
+            h.update(in_data_trans.tobytes())
+            h.update(json.dumps(list(in_data_trans.shape)).encode())
+            data_hash=h.hexdigest()
+            h.update(json.dumps([self.method,n_components,
+                                 float(perplexity),
+                                 float(min_grad_norm),
+                                 str(random_state)]).encode())
+            emb_hash=h.hexdigest()
+
+            if cache==True and emb_hash in _tsne_emb_cache:
+                if self.verbose>0:
+                    print('dimred_sklearn_tsne::run(): Using cached',
+                          'embedding.')
+                self.tsne,out_data=_tsne_emb_cache[emb_hash]
+                return out_data.copy()
             
+            if len(cache_dir)>0:
+                cache_file=os.path.join(cache_dir,'dimred_tsne_'+
+                                        emb_hash[0:20]+'.npy')
+                if os.path.exists(cache_file):
+                    out_data=numpy.load(cache_file)
+                    if self.verbose>0:
+                        print('dimred_sklearn_tsne::run(): Read',
+                              'embedding from',cache_file)
+                    if cache==True:
+                        _tsne_cache_store(_tsne_emb_cache,emb_hash,
+                                          (self.tsne,out_data))
+                    return out_data.copy()
+
+        # ----------------------------------------------------------
+        # Compute the embedding
+        
         try:
-            from sklearn.manifold import TSNE
-            self.tsne=TSNE(n_components=self.n_components,
-                           random_state=self.random_state,
-                           min_grad_norm=self.min_grad_norm,
-                           n_jobs=1)
-            out_data=self.tsne.fit_transform(in_data_trans)
+            if self.method=='fft':
+                
+                from openTSNE import TSNE as fft_TSNE
+                from openTSNE import affinity
+
+                key=(data_hash,'fft',perplexity) if cache==True else None
+                if key is not None and key in _tsne_nn_cache:
+                    aff=_tsne_nn_cache[key]
+                else:
+                    aff=affinity.PerplexityBasedNN(in_data_trans,
+                                                   perplexity=perplexity,
+                                                   n_jobs=n_jobs,
+                                                   random_state=
+                                                   random_state)
+                    if key is not None:
+                        _tsne_cache_store(_tsne_nn_cache,key,aff)
+                self.tsne=fft_TSNE(n_components=self.n_components,
+                                   negative_gradient_method='fft',
+                                   n_jobs=n_jobs,
+                                   random_state=self.random_state)
+                out_data=numpy.asarray(self.tsne.fit(in_data_trans,
+                                                     affinities=aff))
+
+            else:
+                
+                from sklearn.manifold import TSNE
+                
+                if cache==True:
+                    dist=self._neighbors(in_data_trans,data_hash,
+                                         self.method)
+                    self.tsne=TSNE(n_components=self.n_components,
+                                   random_state=self.random_state,
+                                   min_grad_norm=self.min_grad_norm,
+                                   perplexity=perplexity,
+                                   method=self.method,
+                                   metric='precomputed',
+                                   init=self._pca_init(in_data_trans),
+                                   n_jobs=n_jobs)
+                    out_data=self.tsne.fit_transform(dist)
+                else:
+                    self.tsne=TSNE(n_components=self.n_components,
+                                   random_state=self.random_state,
+                                   min_grad_norm=self.min_grad_norm,
+                                   perplexity=perplexity,
+                                   method=self.method,
+                                   n_jobs=n_jobs)
+                    out_data=self.tsne.fit_transform(in_data_trans)
             
         except Exception as e:
             print('Exception in dimred_TSNE::run()',
                   'at fit_transform().',e)
             raise
 
+        if cache==True:
+            _tsne_cache_store(_tsne_emb_cache,emb_hash,
+                              (self.tsne,out_data.copy()))
+        if len(cache_dir)>0:
+            os.makedirs(cache_dir,exist_ok=True)
+            numpy.save(cache_file,out_data)
+            
         return out_data
 
     def run_table(self,tab,in_cols,n_components=2,verbose=0,
                   replace=False,out_prefix='tsne_',out_cols=[],
-                  random_state=None,min_grad_norm=0.0):
+                  random_state=None,min_grad_norm=0.0,method='auto',
+                  n_jobs=1,perplexity=30.0,cache=True,cache_dir=''):
+        """Compute the t-SNE embedding of the columns ``in_cols`` in
+        table ``tab`` and store it in new columns
+
+        See :meth:`run()` for a description of ``method``,
+        ``n_jobs``, ``perplexity``, ``cache``, and ``cache_dir``.
+        """
 
         # First check that all columns specified in 'in_cols' are
         # actually in the table.
@@ -317,20 +739,21 @@ class dimred_sklearn_tsne:
             print("  Output columns:",out_cols_loc)
             print("  Components:",n_components)
                     
-        # Construct the input data matrix (brute force)
-        in_data=numpy.zeros((tab.get_nlines(),len(in_cols)))
-        for i in range(0,tab.get_nlines()):
-            for j in range(0,len(in_cols)):
-                in_data[i][j]=tab.get(in_cols[j],i)
+        # Construct the input data matrix from the column views
+        n_lines=tab.get_nlines()
+        in_data=numpy.column_stack([tab[name][0:n_lines]
+                                    for name in in_cols])
 
         # Perform the TSNE
         out_data=self.run(in_data,n_components=n_components,
                           verbose=verbose,random_state=random_state,
-                          min_grad_norm=min_grad_norm)
+                          min_grad_norm=min_grad_norm,method=method,
+                          n_jobs=n_jobs,perplexity=perplexity,
+                          cache=cache,cache_dir=cache_dir)
 
         # Remove the old columns if requested
         if replace==True:
-            for i in range(i,len(in_cols)):
+            for i in range(0,len(in_cols)):
                 tab.delete_column(in_cols[i])
         
         # Add the output data to the table
@@ -341,8 +764,8 @@ class dimred_sklearn_tsne:
         for j in range(0,n_components):
             if tab.is_column(out_cols_loc[j])==False:
                 tab.new_column(out_cols_loc[j])
-            for i in range(0,tab.get_nlines()):
-                tab.set(out_cols_loc[j],i,out_data[i][j])
+        for j in range(0,n_components):
+            tab[out_cols_loc[j]][0:n_lines]=out_data[:,j]
                 
         return
     
@@ -354,9 +777,10 @@ class dimred_sklearn_tsne:
 
         dct=string_to_dict2(options,list_of_ints=['random_state',
                                                   'n_components',
-                                                  'verbose'],
-                            list_of_floats=['min_grad_norm'],
-                            list_of_bools=['replace'])
+                                                  'verbose','n_jobs'],
+                            list_of_floats=['min_grad_norm',
+                                            'perplexity'],
+                            list_of_bools=['replace','cache'])
 
         if self.verbose>2:
             print('In dimred_sklearn_tsne::set_data_str(): string:',
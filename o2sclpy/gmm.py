@@ -21,7 +21,274 @@
 #
 import numpy
 
-from o2sclpy.utils import string_to_dict2
+from o2sclpy.utils import string_to_dict2, _iter_chunks
+
+def _component_log_dens(x,weights,means,prec_chol,covariance_type):
+    """Return the logarithm of the weighted density of each Gaussian
+    in a mixture, i.e. the weight times the normal density of that
+    component, at the points in the array ``x`` of shape
+    ``(n_points,n_dim)`` as an array of shape
+    ``(n_points,n_components)``
+
+    The Mahalanobis distances are computed with the Cholesky
+    factors of the precision matrices, ``prec_chol``, in the format
+    which scikit-learn uses for each covariance type.
+    """
+    n_pts,n_dim=x.shape
+    n_comp=means.shape[0]
+    
+    if covariance_type=='full':
+        maha=numpy.zeros((n_pts,n_comp))
+        log_det=numpy.zeros((n_comp))
+        for k in range(0,n_comp):
+            y=x@prec_chol[k]-means[k]@prec_chol[k]
+            maha[:,k]=numpy.sum(y*y,axis=1)
+            log_det[k]=numpy.sum(numpy.log(numpy.diag(prec_chol[k])))
+    elif covariance_type=='tied':
+        maha=numpy.zeros((n_pts,n_comp))
+        xp=x@prec_chol
+        mp=means@prec_chol
+        for k in range(0,n_comp):
+            y=xp-mp[k]
+            maha[:,k]=numpy.sum(y*y,axis=1)
+        log_det=numpy.sum(numpy.log(numpy.diag(prec_chol)))
+    elif covariance_type=='diag':
+        prec=prec_chol**2
+        maha=(numpy.sum(means**2*prec,axis=1)-2.0*(x@(means*prec).T)+
+              (x**2)@prec.T)
+        log_det=numpy.sum(numpy.log(prec_chol),axis=1)
+    else:
+        prec=prec_chol**2
+        maha=(numpy.sum(means**2,axis=1)*prec-2.0*(x@means.T)*prec+
+              numpy.outer(numpy.einsum('ij,ij->i',x,x),prec))
+        log_det=n_dim*numpy.log(prec_chol)
+
+    return (numpy.log(weights)+log_det-
+            0.5*(n_dim*numpy.log(2.0*numpy.pi)+maha))
+
+def _components_list(mix,v,n_dim,covariance_type,chunk_size,log,
+                     normalize):
+    """Evaluate the per-component densities of the fitted scikit-learn
+    mixture ``mix`` at the points in ``v`` in chunks of
+    ``chunk_size`` points, for :meth:`gmm_sklearn.components_list`
+    and :meth:`bgmm_sklearn.components_list`.
+    """
+    from scipy.special import logsumexp
+
+    x=numpy.asarray(v,dtype=numpy.float64)
+    if x.ndim==1:
+        x=x.reshape(1,-1)
+    if x.shape[1]!=n_dim:
+        raise ValueError('Points have dimension '+str(x.shape[1])+
+                         ' but the mixture has dimension '+
+                         str(n_dim)+'.')
+    n=x.shape[0]
+    res=numpy.zeros((n,len(mix.weights_)))
+    for i in range(0,n,chunk_size):
+        lp=_component_log_dens(x[i:i+chunk_size],mix.weights_,
+                               mix.means_,mix.precisions_cholesky_,
+                               covariance_type)
+        if normalize:
+            lp-=logsumexp(lp,axis=1,keepdims=True)
+        if log:
+            res[i:i+chunk_size]=lp
+        else:
+            res[i:i+chunk_size]=numpy.exp(lp)
+    return res
+
+def _full_mixture_arrays(mix,n_dim,covariance_type):
+    """Return the weights, means, covariance matrices and Cholesky
+    factors of the precision matrices of the fitted scikit-learn
+    mixture ``mix`` as C-contiguous float64 arrays of shape
+    ``(n_components)``, ``(n_components,n_dim)``,
+    ``(n_components,n_dim,n_dim)``, and ``(n_components,n_dim,n_dim)``,
+    expanding the tied, diagonal and spherical covariance types to
+    full matrices.
+    """
+    n_comp=len(mix.weights_)
+    if covariance_type=='full':
+        covs=mix.covariances_
+        prec_chol=mix.precisions_cholesky_
+    elif covariance_type=='tied':
+        covs=numpy.broadcast_to(mix.covariances_,(n_comp,n_dim,n_dim))
+        prec_chol=numpy.broadcast_to(mix.precisions_cholesky_,
+                                     (n_comp,n_dim,n_dim))
+    else:
+        diag_c=mix.covariances_
+        diag_p=mix.precisions_cholesky_
+        if covariance_type=='spherical':
+            diag_c=numpy.repeat(diag_c[:,numpy.newaxis],n_dim,axis=1)
+            diag_p=numpy.repeat(diag_p[:,numpy.newaxis],n_dim,axis=1)
+        covs=numpy.zeros((n_comp,n_dim,n_dim))
+        prec_chol=numpy.zeros((n_comp,n_dim,n_dim))
+        ix=numpy.arange(n_dim)
+        covs[:,ix,ix]=diag_c
+        prec_chol[:,ix,ix]=diag_p
+    return (numpy.ascontiguousarray(mix.weights_,dtype=numpy.float64),
+            numpy.ascontiguousarray(mix.means_,dtype=numpy.float64),
+            numpy.ascontiguousarray(covs,dtype=numpy.float64),
+            numpy.ascontiguousarray(prec_chol,dtype=numpy.float64))
+
+def _table_columns(amp,cols,cmd):
+    """Return the columns ``cols`` of the table in the
+    :class:`acol_manager` pointer ``amp`` as a two-dimensional numpy
+    array, or None if the current object is not a table
+    """
+    from o2sclpy.hdf import acol_manager
+    
+    amt=acol_manager(amp)
+    curr_type=amt.get_type()
+    if curr_type!=b'table':
+        print("Command '"+cmd+"' not supported for type",
+              curr_type,".")
+        return None
+    
+    tab=amt.get_table_obj()
+    n_l=tab.get_nlines()
+    # Each column is a view of the table's memory, so the only copy
+    # is into the output array
+    return numpy.column_stack([tab[col][0:n_l] for col in cols])
+
+def _chunk_stats(x,log_resp,shift,covariance_type):
+    """Return the sufficient statistics of one chunk of data for the
+    M-step, the sum of the responsibilities and the sums of the
+    responsibility-weighted first and second moments of ``x-shift``
+    for each component.
+    """
+    resp=numpy.exp(log_resp)
+    xc=x-shift
+    nk=resp.sum(axis=0)
+    s1=resp.T@xc
+    if covariance_type=='full' or covariance_type=='tied':
+        s2=numpy.zeros((resp.shape[1],x.shape[1],x.shape[1]))
+        for k in range(0,resp.shape[1]):
+            s2[k]=(xc*resp[:,k:k+1]).T@xc
+    else:
+        s2=resp.T@(xc*xc)
+    return [nk,s1,s2]
+
+def _stats_to_params(nk,s1,s2,shift,covariance_type,reg_covar):
+    """Convert the sufficient statistics to the component sizes,
+    means and covariances in scikit-learn's format, with
+    ``reg_covar`` added to the diagonal of the covariances.
+    """
+    nk=nk+10.0*numpy.finfo(numpy.float64).eps
+    dm=s1/nk[:,numpy.newaxis]
+    n_dim=s1.shape[1]
+    if covariance_type=='full':
+        covs=(s2/nk[:,numpy.newaxis,numpy.newaxis]-
+              numpy.einsum('ki,kj->kij',dm,dm))
+        covs+=reg_covar*numpy.eye(n_dim)
+    elif covariance_type=='tied':
+        covs=((numpy.sum(s2,axis=0)-(nk[:,numpy.newaxis]*dm).T@dm)/
+              numpy.sum(nk))
+        covs+=reg_covar*numpy.eye(n_dim)
+    else:
+        covs=s2/nk[:,numpy.newaxis]-dm*dm+reg_covar
+        if covariance_type=='spherical':
+            covs=covs.mean(axis=1)
+    return nk,shift+dm,covs
+
+def _precision_cholesky(covs,covariance_type):
+    """Return the Cholesky factors of the precision matrices for the
+    covariances ``covs`` in scikit-learn's format
+    """
+    from scipy.linalg import cholesky, solve_triangular
+    
+    if covariance_type=='full':
+        prec_chol=numpy.zeros_like(covs)
+        for k in range(0,covs.shape[0]):
+            chol=cholesky(covs[k],lower=True)
+            prec_chol[k]=solve_triangular(chol,numpy.eye(covs.shape[1]),
+                                          lower=True).T
+        return prec_chol
+    elif covariance_type=='tied':
+        chol=cholesky(covs,lower=True)
+        return solve_triangular(chol,numpy.eye(covs.shape[0]),
+                                lower=True).T
+    return 1.0/numpy.sqrt(covs)
+
+def _stream_em(source,chunk_size,col_names,first,e_step,m_step,
+               covariance_type,reg_covar,max_iter,tol,mode,shift,
+               verbose,name):
+    """Run expectation maximization over the chunks of ``source``,
+    for :meth:`gmm_sklearn.set_data_stream` and
+    :meth:`bgmm_sklearn.set_data_stream`
+
+    The function ``e_step`` takes a chunk and returns the log of
+    the mixture density and the log responsibilities at each point,
+    and ``m_step`` takes the output of :func:`_stats_to_params`.
+    The array ``first`` is the first chunk, which has already been
+    read from ``source``. Returns the number of passes over the
+    data, whether the average log density has converged to within
+    ``tol``, and the final average log density.
+    """
+    import itertools
+    
+    re_iterable=(isinstance(source,numpy.ndarray) or
+                 hasattr(source,'get_nlines') or
+                 iter(source) is not source)
+    if not re_iterable:
+        if mode=='batch':
+            raise ValueError('Batch mode requires a re-iterable data '+
+                             'source in '+name+'::set_data_stream().')
+        max_iter=1
+    
+    prev=None
+    converged=False
+    stats=None
+    n_step=0
+    n_scale=0
+    for it in range(0,max_iter):
+        if re_iterable:
+            chunks=_iter_chunks(source,chunk_size,col_names)
+        else:
+            chunks=itertools.chain([first],
+                                   _iter_chunks(source,chunk_size,
+                                                col_names))
+        total=None
+        n_pts=0
+        ll_sum=0.0
+        for x in chunks:
+            log_prob_norm,log_resp=e_step(x)
+            cs=_chunk_stats(x,log_resp,shift,covariance_type)
+            ll_sum+=numpy.sum(log_prob_norm)
+            n_pts+=x.shape[0]
+            if mode=='batch':
+                if total is None:
+                    total=cs
+                else:
+                    for j in range(0,3):
+                        total[j]+=cs[j]
+            else:
+                # Stepwise EM, averaging the statistics per point
+                # with a decreasing step size
+                gamma=(n_step+2.0)**(-0.6)
+                cs=[c/x.shape[0] for c in cs]
+                if stats is None:
+                    stats=cs
+                else:
+                    stats=[(1.0-gamma)*stats[j]+gamma*cs[j]
+                           for j in range(0,3)]
+                n_step+=1
+                if it==0:
+                    n_scale=n_pts
+                m_step(*_stats_to_params(*[c*n_scale for c in stats],
+                                         shift,covariance_type,reg_covar))
+        if mode=='batch':
+            m_step(*_stats_to_params(*total,shift,covariance_type,
+                                     reg_covar))
+            
+        ll=ll_sum/n_pts
+        if verbose>0:
+            print(name+'::set_data_stream(): pass,points,ll:',
+                  it,n_pts,ll)
+        if prev is not None and abs(ll-prev)<tol:
+            converged=True
+            break
+        prev=ll
+
+    return it+1,converged,ll
 
 class gmm_sklearn:
     """
@@ -38,6 +305,7 @@ class gmm_sklearn:
         self.n_dim=0
         self.convariance_type=0
         self.gm=0
+        self.chunk_size=100000
 
     def set_data(self,in_data,verbose=0,n_components=2,
                  covariance_type='full',tol=0.001,reg_covar=1.0e-6,
@@ -79,6 +347,114 @@ class gmm_sklearn:
 
         return
 
+    def set_data_stream(self,source,verbose=0,n_components=2,
+                        covariance_type='full',tol=0.001,reg_covar=1.0e-6,
+                        max_iter=100,n_init=1,chunk_size=100000,
+                        col_names=None,mode='batch',warm_start=False):
+        """
+        Fit the mixture model using data which is read in chunks of
+        at most ``chunk_size`` points, so that the full data set
+        never needs to be stored in memory. The source may be a
+        numpy array, an O2scl :class:`table` (using the columns in
+        ``col_names``), or an iterable of arrays such as
+        :class:`interpm_hdf_source`.
+
+        If ``mode`` is ``'batch'``, each of at most ``max_iter``
+        passes over the data accumulates the sufficient statistics of
+        the E-step over all chunks before a single M-step, which
+        gives the same result as expectation maximization on the full
+        data. This requires a source which can be iterated more than
+        once. If ``mode`` is ``'online'``, then the parameters are
+        updated after every chunk with stepwise EM, which also works
+        with a generator, read in a single pass. Iteration stops when
+        the average log density changes by less than ``tol``.
+
+        If ``warm_start`` is True, the fit starts from the current
+        parameters, otherwise the parameters are initialized by a
+        fit to the first chunk using the remaining keyword arguments.
+        """
+
+        if verbose>0:
+            print('gmm_sklearn::set_data_stream():')
+            print('  verbose:',verbose)
+            print('  n_components:',n_components)
+            print('  covariance_type:',covariance_type)
+            print('  chunk_size:',chunk_size)
+            print('  mode:',mode)
+            print('  warm_start:',warm_start)
+            print('')
+
+        if mode!='batch' and mode!='online':
+            raise ValueError('Mode '+str(mode)+' not supported in '+
+                             'gmm_sklearn::set_data_stream().')
+            
+        from sklearn.mixture import GaussianMixture
+        from scipy.special import logsumexp
+
+        first=next(_iter_chunks(source,chunk_size,col_names))
+        self.verbose=verbose
+        
+        try:
+            if warm_start:
+                if self.gm==0 or self.n_dim!=first.shape[1]:
+                    raise ValueError('Warm start requires a previous '+
+                                     'fit with the same dimension.')
+            else:
+                self.n_components=n_components
+                self.covariance_type=covariance_type
+                self.n_dim=first.shape[1]
+                self.gm=GaussianMixture(n_components=n_components,
+                                        covariance_type=covariance_type,
+                                        tol=tol,reg_covar=reg_covar,
+                                        max_iter=max_iter,
+                                        n_init=n_init).fit(first)
+        except Exception as e:
+            print('Exception in gmm_sklearn::set_data_stream()',
+                  'Gaussian mixture initialization failed.\n  ',e)
+            raise
+
+        gm=self.gm
+        ct=self.covariance_type
+        shift=numpy.average(gm.means_,axis=0,weights=gm.weights_)
+        
+        def e_step(x):
+            log_dens=_component_log_dens(x,gm.weights_,gm.means_,
+                                         gm.precisions_cholesky_,ct)
+            log_prob_norm=logsumexp(log_dens,axis=1)
+            return log_prob_norm,log_dens-log_prob_norm[:,numpy.newaxis]
+
+        def m_step(nk,means,covs):
+            gm.weights_=nk/numpy.sum(nk)
+            gm.means_=means
+            gm.covariances_=covs
+            gm.precisions_cholesky_=_precision_cholesky(covs,ct)
+            if ct=='full':
+                gm.precisions_=numpy.einsum('kij,klj->kil',
+                                            gm.precisions_cholesky_,
+                                            gm.precisions_cholesky_)
+            elif ct=='tied':
+                gm.precisions_=(gm.precisions_cholesky_@
+                                gm.precisions_cholesky_.T)
+            else:
+                gm.precisions_=gm.precisions_cholesky_**2
+            return
+
+        try:
+            n_iter,converged,ll=_stream_em(source,chunk_size,col_names,
+                                           first,e_step,m_step,ct,
+                                           gm.reg_covar,max_iter,tol,mode,
+                                           shift,verbose,'gmm_sklearn')
+        except Exception as e:
+            print('Exception in gmm_sklearn::set_data_stream()',
+                  'Gaussian mixture fit failed.\n  ',e)
+            raise
+            
+        gm.n_iter_=n_iter
+        gm.converged_=converged
+        gm.lower_bound_=ll
+        
+        return
+
     def get_data(self):
         """
         Return the properties of the Gaussian mixture model as contiguous
@@ -139,36 +515,40 @@ class gmm_sklearn:
                 numpy.ascontiguousarray(ptemp),
                 numpy.ascontiguousarray(pctemp))
 
+    def get_data_full(self):
+        """
+        Return the properties of the Gaussian mixture model, in a
+        single call, as four C-contiguous float64 numpy arrays: the
+        weights, of shape ``(n_components)``, the means, of shape
+        ``(n_components,n_dim)``, and the covariance matrices and the
+        Cholesky factors of the precision matrices, both of shape
+        ``(n_components,n_dim,n_dim)``. Unlike :meth:`get_data`,
+        the tied, diagonal, and spherical covariance types are
+        expanded to full matrices, so the arrays have the layout of
+        O2scl's ``prob_dens_mdim_gmm`` for any covariance type and
+        can be passed to it without further conversion.
+        """
+        ret=_full_mixture_arrays(self.gm,self.n_dim,self.covariance_type)
+        if self.verbose>1:
+            print('gmm_sklearn::get_data_full(): shapes:',
+                  [numpy.shape(a) for a in ret])
+        return ret
+
     def o2graph_to_gmm(self,o2scl,amp,link,args):
         """
         The function providing the 'to-gmm' command for 
         o2graph.
         """
         
-        curr_type=o2scl_get_type(o2scl,amp,link)
-        amt=acol_manager(link,amp)
-
         n_g=int(args[0])
         cols=args[1:]
-        print('otg',n_g,cols)
-        n_c=len(cols)
+        if self.verbose>0:
+            print('gmm_sklearn::o2graph_to_gmm():',n_g,cols)
 
-        if curr_type!=b'table':
-            print("Command 'to-gmm' not supported for type",
-                  curr_type,".")
+        x=_table_columns(amp,cols,'to-gmm')
+        if x is None:
             return
-            
-        n_l=amt.table_obj.get_nlines()
-        x=numpy.zeros((n_l,n_c))
-        for i in range(0,n_c):
-            for j in range(0,n_l):
-                x[j,i]=amt.table_obj.get(cols[i],j)
-        gs.set_data(x,'n_components='+str(n_g))
-
-        means=numpy.reshape(self.gm.means_,
-                            (self.n_dim*self.n_components))
-        covars=numpy.reshape(self.gm.covariances_,
-                            (self.n_dim*self.n_dim*self.n_components))
+        self.set_data(x,n_components=n_g,verbose=self.verbose)
         
         return
     
@@ -292,6 +672,33 @@ class gmm_sklearn:
                    type(yp),yp)
         return numpy.ascontiguousarray(yp)
         
+
+    def components_list(self,v,chunk_size=0,log=False,normalize=True):
+        """
+        For the array of points ``v`` of shape ``(n_points,n_dim)``,
+        return an array of shape ``(n_points,n_components)``
+        containing the weighted density of each component. If
+        ``normalize`` is True, each row is divided by its sum, giving
+        the probability that the point belongs to each component. If
+        ``log`` is True, the natural logarithm of these values is
+        returned instead.
+
+        The densities are computed from the Cholesky factors of the
+        precision matrices which were computed during the fit, using
+        the log-sum-exp trick for the normalization, in chunks of
+        ``chunk_size`` points (or ``self.chunk_size`` points if
+        ``chunk_size`` is zero). With the default values, the output is equal to
+        that of :meth:`components` for each point.
+        """
+        if chunk_size<=0:
+            chunk_size=self.chunk_size
+        res=_components_list(self.gm,v,self.n_dim,self.covariance_type,
+                             chunk_size,log,normalize)
+        if self.verbose>1:
+            print('gmm_sklearn::components_list(): shape:',
+                  numpy.shape(res))
+        return res
+
 class bgmm_sklearn:
     """
     Use scikit-learn to generate a Bayesian Gaussian mixture model of a 
@@ -307,6 +714,7 @@ class bgmm_sklearn:
         self.n_dim=0
         self.convariance_type=0
         self.bgm=0
+        self.chunk_size=100000
 
     def set_data(self,in_data,verbose=0,n_components=2,
                  covariance_type='full',tol=0.001,reg_covar=1.0e-6,
@@ -352,6 +760,85 @@ class bgmm_sklearn:
         
         return
 
+    def set_data_stream(self,source,verbose=0,n_components=2,
+                        covariance_type='full',tol=0.001,reg_covar=1.0e-6,
+                        max_iter=100,n_init=1,chunk_size=100000,
+                        col_names=None,mode='batch',warm_start=False):
+        """
+        Fit the mixture model using data which is read in chunks of
+        at most ``chunk_size`` points. The arguments are the same as
+        in :meth:`gmm_sklearn.set_data_stream`. The variational
+        updates use scikit-learn's internal functions for the
+        E-step and for the weight, mean and precision updates, with
+        the sufficient statistics accumulated over the chunks. When
+        ``warm_start`` is False, the priors are set by the fit to
+        the first chunk.
+        """
+
+        if verbose>0:
+            print('bgmm_sklearn::set_data_stream():')
+            print('  verbose:',verbose)
+            print('  n_components:',n_components)
+            print('  covariance_type:',covariance_type)
+            print('  chunk_size:',chunk_size)
+            print('  mode:',mode)
+            print('  warm_start:',warm_start)
+            print('')
+
+        if mode!='batch' and mode!='online':
+            raise ValueError('Mode '+str(mode)+' not supported in '+
+                             'bgmm_sklearn::set_data_stream().')
+            
+        from sklearn.mixture import BayesianGaussianMixture
+
+        first=next(_iter_chunks(source,chunk_size,col_names))
+        self.verbose=verbose
+        
+        try:
+            if warm_start:
+                if self.bgm==0 or self.n_dim!=first.shape[1]:
+                    raise ValueError('Warm start requires a previous '+
+                                     'fit with the same dimension.')
+            else:
+                self.n_components=n_components
+                self.covariance_type=covariance_type
+                self.n_dim=first.shape[1]
+                self.bgm=BayesianGaussianMixture(
+                    n_components=n_components,
+                    covariance_type=covariance_type,tol=tol,
+                    reg_covar=reg_covar,max_iter=max_iter,
+                    n_init=n_init).fit(first)
+        except Exception as e:
+            print('Exception in bgmm_sklearn::set_data_stream()',
+                  'Gaussian mixture initialization failed.\n  ',e)
+            raise
+
+        bgm=self.bgm
+        shift=numpy.average(bgm.means_,axis=0,weights=bgm.weights_)
+
+        def m_step(nk,means,covs):
+            bgm._estimate_weights(nk)
+            bgm._estimate_means(nk,means)
+            bgm._estimate_precisions(nk,means,covs)
+            return
+
+        try:
+            n_iter,converged,ll=_stream_em(source,chunk_size,col_names,
+                                           first,
+                                           bgm._estimate_log_prob_resp,
+                                           m_step,self.covariance_type,
+                                           bgm.reg_covar,max_iter,tol,mode,
+                                           shift,verbose,'bgmm_sklearn')
+        except Exception as e:
+            print('Exception in bgmm_sklearn::set_data_stream()',
+                  'Gaussian mixture fit failed.\n  ',e)
+            raise
+            
+        bgm.n_iter_=n_iter
+        bgm.converged_=converged
+        
+        return
+
     def get_data(self):
         """
         Return the properties of the Gaussian mixture model as contiguous
@@ -369,78 +856,82 @@ class bgmm_sklearn:
             print('  Chol. decomp.:',self.bgm.precisions_cholesky_)
             print('')
 
-            if self.covariance_type=='full':
-                mtemp=numpy.reshape(self.bgm.means_,
-                                    (self.n_dim*self.n_components))
-                ctemp=numpy.reshape(self.bgm.covariances_,
-                                    (self.n_dim*self.n_dim*self.n_components))
-                ptemp=numpy.reshape(self.bgm.precisions_,
-                                    (self.n_dim*self.n_dim*self.n_components))
-                pctemp=numpy.reshape(self.bgm.precisions_cholesky_,
-                                     (self.n_dim*self.n_dim*self.n_components))
-            elif self.covariance_type=='diag':
-                mtemp=numpy.reshape(self.bgm.means_,
-                                    (self.n_dim*self.n_components))
-                ctemp=numpy.reshape(self.bgm.covariances_,
-                                    (self.n_dim*self.n_components))
-                ptemp=numpy.reshape(self.bgm.precisions_,
-                                    (self.n_dim*self.n_components))
-                pctemp=numpy.reshape(self.bgm.precisions_cholesky_,
-                                     (self.n_dim*self.n_components))
-            elif self.covariance_type=='tied':
-                mtemp=numpy.reshape(self.bgm.means_,
-                                    (self.n_dim*self.n_components))
-                ctemp=numpy.reshape(self.bgm.covariances_,
-                                    (self.n_dim*self.n_dim))
-                ptemp=numpy.reshape(self.bgm.precisions_,
-                                    (self.n_dim*self.n_dim))
-                pctemp=numpy.reshape(self.bgm.precisions_cholesky_,
-                                     (self.n_dim*self.n_dim))
-            elif self.covariance_type=='spherical':
-                mtemp=numpy.reshape(self.bgm.means_,
-                                    (self.n_dim*self.n_components))
-                ctemp=numpy.reshape(self.bgm.covariances_,
-                                    (self.n_components))
-                ptemp=numpy.reshape(self.bgm.precisions_,
-                                    (self.n_components))
-                pctemp=numpy.reshape(self.bgm.precisions_cholesky_,
-                                     (self.n_components))
+        if self.covariance_type=='full':
+            mtemp=numpy.reshape(self.bgm.means_,
+                                (self.n_dim*self.n_components))
+            ctemp=numpy.reshape(self.bgm.covariances_,
+                                (self.n_dim*self.n_dim*self.n_components))
+            ptemp=numpy.reshape(self.bgm.precisions_,
+                                (self.n_dim*self.n_dim*self.n_components))
+            pctemp=numpy.reshape(self.bgm.precisions_cholesky_,
+                                 (self.n_dim*self.n_dim*self.n_components))
+        elif self.covariance_type=='diag':
+            mtemp=numpy.reshape(self.bgm.means_,
+                                (self.n_dim*self.n_components))
+            ctemp=numpy.reshape(self.bgm.covariances_,
+                                (self.n_dim*self.n_components))
+            ptemp=numpy.reshape(self.bgm.precisions_,
+                                (self.n_dim*self.n_components))
+            pctemp=numpy.reshape(self.bgm.precisions_cholesky_,
+                                 (self.n_dim*self.n_components))
+        elif self.covariance_type=='tied':
+            mtemp=numpy.reshape(self.bgm.means_,
+                                (self.n_dim*self.n_components))
+            ctemp=numpy.reshape(self.bgm.covariances_,
+                                (self.n_dim*self.n_dim))
+            ptemp=numpy.reshape(self.bgm.precisions_,
+                                (self.n_dim*self.n_dim))
+            pctemp=numpy.reshape(self.bgm.precisions_cholesky_,
+                                 (self.n_dim*self.n_dim))
+        elif self.covariance_type=='spherical':
+            mtemp=numpy.reshape(self.bgm.means_,
+                                (self.n_dim*self.n_components))
+            ctemp=numpy.reshape(self.bgm.covariances_,
+                                (self.n_components))
+            ptemp=numpy.reshape(self.bgm.precisions_,
+                                (self.n_components))
+            pctemp=numpy.reshape(self.bgm.precisions_cholesky_,
+                                 (self.n_components))
         return (numpy.ascontiguousarray(self.bgm.weights_),
                 numpy.ascontiguousarray(mtemp),
                 numpy.ascontiguousarray(ctemp),
                 numpy.ascontiguousarray(ptemp),
                 numpy.ascontiguousarray(pctemp))
 
+    def get_data_full(self):
+        """
+        Return the properties of the Gaussian mixture model, in a
+        single call, as four C-contiguous float64 numpy arrays: the
+        weights, of shape ``(n_components)``, the means, of shape
+        ``(n_components,n_dim)``, and the covariance matrices and the
+        Cholesky factors of the precision matrices, both of shape
+        ``(n_components,n_dim,n_dim)``. Unlike :meth:`get_data`,
+        the tied, diagonal, and spherical covariance types are
+        expanded to full matrices, so the arrays have the layout of
+        O2scl's ``prob_dens_mdim_gmm`` for any covariance type and
+        can be passed to it without further conversion.
+        """
+        ret=_full_mixture_arrays(self.bgm,self.n_dim,self.covariance_type)
+        if self.verbose>1:
+            print('bgmm_sklearn::get_data_full(): shapes:',
+                  [numpy.shape(a) for a in ret])
+        return ret
+
     def o2graph_to_bgmm(self,o2scl,amp,link,args):
         """
         The function providing the 'to-bgmm' command for 
         o2graph.
         """
         
-        curr_type=o2scl_get_type(o2scl,amp,link)
-        amt=acol_manager(link,amp)
-
         n_g=int(args[0])
         cols=args[1:]
-        print('otg',n_g,cols)
-        n_c=len(cols)
+        if self.verbose>0:
+            print('bgmm_sklearn::o2graph_to_bgmm():',n_g,cols)
 
-        if curr_type!=b'table':
-            print("Command 'to-bgmm' not supported for type",
-                  curr_type,".")
+        x=_table_columns(amp,cols,'to-bgmm')
+        if x is None:
             return
-            
-        n_l=amt.table_obj.get_nlines()
-        x=numpy.zeros((n_l,n_c))
-        for i in range(0,n_c):
-            for j in range(0,n_l):
-                x[j,i]=amt.table_obj.get(cols[i],j)
-        gs.set_data(x,'n_components='+str(n_g))
-
-        means=numpy.reshape(self.bgm.means_,
-                            (self.n_dim*self.n_components))
-        covars=numpy.reshape(self.bgm.covariances_,
-                            (self.n_dim*self.n_dim*self.n_components))
+        self.set_data(x,n_components=n_g,verbose=self.verbose)
         
         return
     
@@ -563,3 +1054,32 @@ class bgmm_sklearn:
             print('gmm_sklearn::components(): type(yp),yp:',
                    type(yp),yp)
         return numpy.ascontiguousarray(yp)
+
+    def components_list(self,v,chunk_size=0,log=False,normalize=True):
+        """
+        For the array of points ``v`` of shape ``(n_points,n_dim)``,
+        return an array of shape ``(n_points,n_components)``
+        containing the weighted density of each component. If
+        ``normalize`` is True, each row is divided by its sum, giving
+        the probability that the point belongs to each component. If
+        ``log`` is True, the natural logarithm of these values is
+        returned instead.
+
+        The densities are computed from the Cholesky factors of the
+        precision matrices which were computed during the fit, using
+        the log-sum-exp trick for the normalization, in chunks of
+        ``chunk_size`` points (or ``self.chunk_size`` points if
+        ``chunk_size`` is zero). Note that the densities are computed with the
+        point estimates of the weights, means, and covariances, so
+        the normalized values differ slightly from those of
+        :meth:`components`, which uses scikit-learn's variational
+        expectations.
+        """
+        if chunk_size<=0:
+            chunk_size=self.chunk_size
+        res=_components_list(self.bgm,v,self.n_dim,self.covariance_type,
+                             chunk_size,log,normalize)
+        if self.verbose>1:
+            print('bgmm_sklearn::components_list(): shape:',
+                  numpy.shape(res))
+        return res
@@ -21,7 +21,8 @@
 #  ───────────────────────────────────────────────────────────────────
 
 import numpy
-from o2sclpy.utils import string_to_dict2
+from o2sclpy.utils import string_to_dict2, _replay_mix
+from o2sclpy.utils import _flatten_tree, _tree_walk
 from o2sclpy.hdf import *
 from o2sclpy.doc_data import version
 # for deepcopy
@@ -520,6 +521,15 @@ class interpm_sklearn_dtr:
     scikit-learn's decision tree regression.
 
     See https://scikit-learn.org/stable/modules/generated/sklearn.tree.DecisionTreeRegressor.html .
+
+    After fitting (or loading), the tree is flattened into the
+    contiguous arrays ``tree_feature``, ``tree_threshold``,
+    ``tree_children``, and ``tree_value``, and
+    :meth:`eval()` and :meth:`eval_list()` traverse those arrays
+    directly rather than calling the scikit-learn ``predict()``
+    function. The traversal for many points at once is vectorized
+    over the points, so it is fastest to use :meth:`eval_list()`
+    or :meth:`eval_array()` when evaluating large batches.
     """
 
     verbose=0
@@ -545,10 +555,50 @@ class interpm_sklearn_dtr:
         self.nd_in=0
         self.nd_out=0
         
+        self.tree_feature=None
+        self.tree_threshold=None
+        self.tree_children=None
+        self.tree_value=None
+        self.tree_depth=0
+        
         import sklearn.preprocessing as preprocessing
         self.pp=preprocessing
         
         return
+
+    def _flatten_tree(self):
+        """
+        Copy the fitted tree into compact contiguous arrays which
+        can be traversed without scikit-learn, using
+        :func:`o2sclpy.utils._flatten_tree`.
+        """
+        (self.tree_feature,self.tree_threshold,self.tree_children,
+         self.tree_depth)=_flatten_tree(self.dtr.tree_)
+        # The regressor values have shape (n_nodes,n_outputs,1)
+        self.tree_value=numpy.ascontiguousarray(
+            self.dtr.tree_.value[:,:,0],dtype=numpy.float64)
+
+        if self.verbose>1:
+            print('interpm_sklearn_dtr::_flatten_tree():',
+                  'nodes,depth:',len(self.tree_feature),self.tree_depth)
+        
+        return
+
+    def _tree_predict(self,x):
+        """
+        Traverse the flattened tree for all of the points in the
+        two-dimensional array ``x`` simultaneously.
+
+        The return value has the same shape as the output of
+        ``DecisionTreeRegressor.predict()``.
+        """
+        node=_tree_walk(self.tree_feature,self.tree_threshold,
+                        self.tree_children,self.tree_depth,x)
+        yp=self.tree_value[node]
+            
+        if yp.shape[1]==1:
+            return yp[:,0]
+        return yp
     
     def set_data(self,in_data,out_data,outformat='numpy',verbose=0,
                  test_size=0.0,criterion='squared_error',splitter='best',
@@ -634,6 +684,8 @@ class interpm_sklearn_dtr:
                   'at model fitting.',e)
             raise
 
+        self._flatten_tree()
+
         if test_size>0.0:
             return self.score
         return
@@ -668,9 +720,9 @@ class interpm_sklearn_dtr:
                       e)
                 raise
         else:
-            v_trans=v.reshape(1,-1)
+            v_trans=numpy.asarray(v).reshape(1,-1)
 
-        yp=self.dtr.predict(v_trans)
+        yp=self._tree_predict(v_trans)
         
         if self.transform_out!='none':
             try:
@@ -720,7 +772,7 @@ class interpm_sklearn_dtr:
             raise
 
         try:
-            yp=self.dtr.predict(v_trans)
+            yp=self._tree_predict(v_trans)
         except Exception as e:
             print(('Exception at prediction '+
                    'in interpm_sklearn_dtr::eval_list():'),e)
@@ -754,6 +806,38 @@ class interpm_sklearn_dtr:
                   type(yp_trans),v,yp_trans)
         return numpy.ascontiguousarray(yp_trans)
 
+    def eval_array(self,v,out=None):
+        """
+        Evaluate the regression at the points in the two-dimensional
+        array ``v`` and return a two-dimensional numpy array of shape
+        ``(n_points,nd_out)``, ignoring the value of ``outformat``.
+
+        If ``out`` is specified, it must be a numpy array of the
+        correct shape and the results are stored there instead of
+        in a new array.
+        """
+        v=numpy.asarray(v)
+        if v.ndim==1:
+            v=v.reshape(1,-1)
+        if v.shape[1]!=self.nd_in:
+            raise ValueError('Input array has '+str(v.shape[1])+
+                             ' columns but expected '+str(self.nd_in)+
+                             ' in interpm_sklearn_dtr::eval_array().')
+
+        if self.transform_in!='none':
+            v=self.SS1.transform(v)
+
+        yp=self._tree_predict(v)
+        if yp.ndim==1:
+            yp=yp.reshape(-1,1)
+        if self.transform_out!='none':
+            yp=self.SS2.inverse_transform(yp)
+
+        if out is None:
+            return numpy.ascontiguousarray(yp)
+        out[:,:]=yp
+        return out
+
     def save(self,filename,obj_name):
         """
         Save the interpolation settings to an HDF5 file
@@ -807,6 +891,9 @@ class interpm_sklearn_dtr:
         self.SS2=loc_dct["SS2"]
 
         self.dtr=tup[1]
+        self.nd_in=self.dtr.n_features_in_
+        self.nd_out=self.dtr.n_outputs_
+        self._flatten_tree()
         
         return
         
@@ -839,6 +926,9 @@ class interpm_sklearn_mlpr:
         self.SS2=0
         self.nd_in=0
         self.nd_out=0
+        self.in_data=None
+        self.out_data=None
+        self.n_seen=0
         
         import sklearn.preprocessing as preprocessing
         self.pp=preprocessing
@@ -863,6 +953,9 @@ class interpm_sklearn_mlpr:
         self.transform_out=transform_out
         self.nd_in=numpy.shape(in_data)[1]
         self.nd_out=numpy.shape(out_data)[1]
+        self.in_data=in_data
+        self.out_data=out_data
+        self.n_seen=numpy.shape(in_data)[0]
         
         if self.verbose>0:
             print('interpm_sklearn_mlpr::set_data():')
@@ -946,6 +1039,88 @@ class interpm_sklearn_mlpr:
 
         return
     
+    def add_data(self,in_data,out_data,epochs=10,n_replay=None,
+                 update_scalers=True,n_reservoir=100000):
+        """Add new training data and update the interpolator
+        starting from the current weights rather than retraining
+        from scratch.
+
+        The new points are combined with ``n_replay`` points chosen
+        randomly (by default, the same number as the number of new
+        points) from a reservoir which holds a uniform random sample
+        of at most ``n_reservoir`` of the previous training points,
+        and then ``MLPRegressor.fit()`` is warm-started from the
+        current weights with at most ``epochs`` iterations over the
+        combined data. The cost and memory of this function thus
+        scale with the size of the new data rather than the total
+        size of the training data.
+
+        If ``update_scalers`` is True, then the 'moto' and
+        'standard' transformations are updated with the new data.
+        The 'quant' transformation cannot be updated incrementally
+        and is left unchanged.
+        """
+        if self.mlpr==0:
+            raise RuntimeError('No model in interpm_sklearn_mlpr::'+
+                               'add_data(). Call set_data() first.')
+        if (numpy.shape(in_data)[1]!=self.nd_in or
+            numpy.shape(out_data)[1]!=self.nd_out):
+            raise ValueError('Data has wrong number of columns in '+
+                             'interpm_sklearn_mlpr::add_data().')
+
+        # After load(), the previous training data is not available
+        n_new=numpy.shape(in_data)[0]
+        n_old=0
+        if self.in_data is not None:
+            n_old=numpy.shape(self.in_data)[0]
+        if n_replay is None:
+            n_replay=n_new
+        n_replay=min(n_replay,n_old)
+        
+        if self.verbose>0:
+            print('interpm_sklearn_mlpr::add_data():')
+            print('  new points:',n_new)
+            print('  reservoir points:',n_old)
+            print('  replayed points:',n_replay)
+            print('  epochs:',epochs)
+
+        if update_scalers:
+            if self.transform_in=='moto' or self.transform_in=='standard':
+                self.SS1.partial_fit(in_data)
+            if (self.transform_out=='moto' or
+                self.transform_out=='standard'):
+                self.SS2.partial_fit(out_data)
+
+        (in_train,out_train,self.in_data,self.out_data,
+         self.n_seen)=_replay_mix(self.in_data,self.out_data,
+                                  self.n_seen,in_data,out_data,
+                                  n_replay,n_reservoir)
+        
+        if self.transform_in!='none':
+            in_train=self.SS1.transform(in_train)
+        if self.transform_out!='none':
+            out_train=self.SS2.transform(out_train)
+        if self.nd_out==1:
+            out_train=out_train.ravel()
+
+        # Temporarily switch to a warm start with a bounded number
+        # of iterations
+        max_iter=self.mlpr.max_iter
+        self.mlpr.set_params(warm_start=True,max_iter=epochs)
+        try:
+            self.mlpr.fit(in_train,out_train)
+        except Exception as e:
+            print('Exception in interpm_sklearn_mlpr::add_data()',
+                  'at fit().',e)
+            raise
+        finally:
+            self.mlpr.set_params(warm_start=False,max_iter=max_iter)
+
+        if self.verbose>0:
+            print('  loss:',self.mlpr.loss_)
+            
+        return
+    
     def set_data_str(self,in_data,out_data,options):
         """
         Set the input and output data to train the interpolator,
@@ -1134,6 +1309,8 @@ class interpm_sklearn_mlpr:
         self.SS2=loc_dct["SS2"]
         
         self.mlpr=tup[1]
+        self.nd_in=self.mlpr.n_features_in_
+        self.nd_out=self.mlpr.n_outputs_
 
         return
         
@@ -1455,6 +1632,54 @@ class interpm_sklearn_adaboost:
 
         return
         
+class interpm_hdf_source:
+    """A re-iterable source of training data stored as O2scl
+    tables in one or more HDF5 files, for use with
+    :meth:`interpm_torch_dnn.set_data()`.
+
+    The files are read one at a time through :class:`hdf_file`, so
+    only one table is stored in memory at any time. Each iteration
+    over this object yields tuples ``(in_chunk,out_chunk)`` of
+    two-dimensional numpy arrays with at most ``chunk_size`` rows
+    (or the full table if ``chunk_size`` is zero) containing the
+    columns in ``in_cols`` and ``out_cols``.
+    """
+
+    def __init__(self,filenames,in_cols,out_cols,obj_name='',
+                 chunk_size=0):
+        if isinstance(filenames,str):
+            filenames=[filenames]
+        self.filenames=filenames
+        self.in_cols=in_cols
+        self.out_cols=out_cols
+        self.obj_name=obj_name
+        self.chunk_size=chunk_size
+        return
+
+    def __iter__(self):
+        for fname in self.filenames:
+            hf=o2sclpy.hdf_file()
+            hf.open(fname)
+            tab=o2sclpy.table()
+            hdf_input_table(hf,tab,self.obj_name)
+            hf.close()
+
+            n_lines=tab.get_nlines()
+            in_chunk=numpy.empty((n_lines,len(self.in_cols)))
+            out_chunk=numpy.empty((n_lines,len(self.out_cols)))
+            for i in range(0,len(self.in_cols)):
+                in_chunk[:,i]=tab[self.in_cols[i]][0:n_lines]
+            for i in range(0,len(self.out_cols)):
+                out_chunk[:,i]=tab[self.out_cols[i]][0:n_lines]
+            del tab
+
+            step=self.chunk_size
+            if step<=0:
+                step=max(n_lines,1)
+            for j in range(0,n_lines,step):
+                yield (in_chunk[j:j+step],out_chunk[j:j+step])
+        return
+        
 class interpm_torch_dnn:
     """Interpolate one or many multidimensional data sets using
     PyTorch.
@@ -1466,7 +1691,6 @@ class interpm_torch_dnn:
               * 'native' output format
               * partial derivatives inefficient because always computes
                 gradient
-              * add_data() for successive improvements
               * Allow user to control CPU vs. GPU
     """
 
@@ -1491,6 +1715,10 @@ class interpm_torch_dnn:
         self.activation=None
         self.hlayers=None
         self.layer_norm=None
+        self.opt=None
+        self.in_data=None
+        self.out_data=None
+        self.n_seen=0
 
         # Import torch only once
         import torch
@@ -1526,10 +1754,33 @@ class interpm_torch_dnn:
                  hlayers=[8,8],epochs=100,transform_in='none',
                  transform_out='none',test_size=0.0,activation='relu',
                  patience=20,device=None,seed=None,
-                 layer_norm=True):
+                 layer_norm=True,batch_size=1024,buffer_size=100000):
         """Early stopping is set with patience, and if patience is 0
         then the training never stops early.
-        """
+
+        If ``out_data`` is None, then ``in_data`` is a re-iterable
+        source (for example a list or an :class:`interpm_hdf_source`
+        object) which yields tuples of input and output arrays, and
+        the data is never stored in memory at once. In this case,
+        the statistics for the 'moto' and 'standard' transformations
+        are computed in a first pass over the source (the 'quant'
+        transformation is not supported), and then in each epoch
+        the chunks are collected into a buffer of about
+        ``buffer_size`` points, which is shuffled and used for
+        minibatch training with ``batch_size`` points per step. The
+        fraction ``test_size`` of each chunk is held out and used to
+        compute the test loss. The parameters ``batch_size`` and
+        ``buffer_size`` are ignored when the data are given as
+        arrays.
+        """
+
+        if out_data is None:
+            self._set_data_stream(in_data,outformat,verbose,hlayers,
+                                  epochs,transform_in,transform_out,
+                                  test_size,activation,patience,
+                                  device,seed,layer_norm,batch_size,
+                                  buffer_size)
+            return
 
         if verbose>0:
             print('interpm_torch_dnn::set_data():')
@@ -1552,6 +1803,9 @@ class interpm_torch_dnn:
         self.hlayers=hlayers
         self.activation=activation
         self.layer_norm=layer_norm
+        self.in_data=in_data
+        self.out_data=out_data
+        self.n_seen=numpy.shape(in_data)[0]
 
         # ----------------------------------------------------------
         
@@ -1633,35 +1887,255 @@ class interpm_torch_dnn:
         else:
             x_train=in_data_trans
             y_train=out_data_trans
+            x_test=None
+            y_test=None
 
         n_pts=numpy.shape(x_train)[0]
         self.nd_in=numpy.shape(x_train)[1]
         self.nd_out=numpy.shape(y_train)[1]
 
+        self._build_dnn()
+
+        print('interpm_torch_dnn::set_data():')
+        
+        self._train(x_train,y_train,x_test,y_test,epochs,patience)
+            
+        return
+
+    def _build_dnn(self):
+        """
+        Create the network and the optimizer from the values of
+        ``nd_in``, ``nd_out``, ``hlayers``, ``activation``, and
+        ``layer_norm``.
+        """
+        hlayers=self.hlayers
         act=self._string_to_activation(self.activation)
         
         layers2=[]
         layers2.append(self.nn.Linear(self.nd_in,hlayers[0]))
-        if layer_norm==True:
+        if self.layer_norm==True:
             layers2.append(self.nn.LayerNorm(hlayers[0]))
         layers2.append(act)
         for k in range(0,len(hlayers)-1):
             layers2.append(self.nn.Linear(hlayers[k],hlayers[k+1]))
-            if layer_norm==True:
+            if self.layer_norm==True:
                 layers2.append(self.nn.LayerNorm(hlayers[k+1]))
             layers2.append(act)
         layers2.append(self.nn.Linear(hlayers[len(hlayers)-1],
                                       self.nd_out))
         self.dnn=self.nn.Sequential(*layers2).to(self.device)
+        self.opt=self.optim.Adam(self.dnn.parameters(),lr=0.01)
         
-        # Convert numpy to torch, there's probably a better way...
-        ten_in=self.torch.from_numpy(x_train).float().to(self.device)
-        ten_out=self.torch.from_numpy(y_train).float().to(self.device)
-        test_in=self.torch.from_numpy(x_test).float().to(self.device)
-        test_out=self.torch.from_numpy(y_test).float().to(self.device)
+        return
 
+    def _set_data_stream(self,source,outformat,verbose,hlayers,epochs,
+                         transform_in,transform_out,test_size,
+                         activation,patience,device,seed,layer_norm,
+                         batch_size,buffer_size):
+        """
+        Train the network from a re-iterable source of chunks
+        of data, see :meth:`set_data()`.
+        """
+        if iter(source) is source:
+            raise ValueError('Source must be re-iterable (not a '+
+                             'generator) in interpm_torch_dnn::'+
+                             'set_data().')
+        if transform_in=='quant' or transform_out=='quant':
+            raise ValueError('Transformation quant not supported '+
+                             'for data sources in interpm_torch_dnn::'+
+                             'set_data().')
+        
+        self.outformat=outformat
+        self.verbose=verbose
+        self.transform_in=transform_in
+        self.transform_out=transform_out
+        self.hlayers=hlayers
+        self.activation=activation
+        self.layer_norm=layer_norm
+        # The training data is not stored, so add_data() can only
+        # use the new data
+        self.in_data=None
+        self.out_data=None
+        self.n_seen=0
+        
+        if seed is not None:
+            numpy.random.seed(seed)
+            self.torch.manual_seed(seed)
+
+        if device is None:
+            self.device=self.torch.device('cuda'
+                                          if self.torch.cuda.is_available()
+                                          else 'cpu')
+        else:
+            self.device=self.torch.device(device)
+
+        # ----------------------------------------------------------
+        # First pass: compute the transformation statistics
+        
+        if self.transform_in=='moto':
+            self.SS1=self.pp.MinMaxScaler(feature_range=(-1,1))
+        elif self.transform_in=='standard':
+            self.SS1=self.pp.StandardScaler()
+        if self.transform_out=='moto':
+            self.SS2=self.pp.MinMaxScaler(feature_range=(-1,1))
+        elif self.transform_out=='standard':
+            self.SS2=self.pp.StandardScaler()
+            
+        n_pts=0
+        n_chunks=0
+        for in_chunk,out_chunk in source:
+            if n_chunks==0:
+                self.nd_in=numpy.shape(in_chunk)[1]
+                self.nd_out=numpy.shape(out_chunk)[1]
+            if self.transform_in!='none':
+                self.SS1.partial_fit(in_chunk)
+            if self.transform_out!='none':
+                self.SS2.partial_fit(out_chunk)
+            n_pts+=numpy.shape(in_chunk)[0]
+            n_chunks+=1
+
+        if n_pts==0:
+            raise ValueError('Source is empty in interpm_torch_dnn::'+
+                             'set_data().')
+        
+        if self.verbose>0:
+            print('interpm_torch_dnn::set_data():')
+            print('  streaming',n_pts,'points in',n_chunks,'chunks')
+            print('  nd_in,nd_out:',self.nd_in,self.nd_out)
+            print('  transform_in:',transform_in)
+            print('  transform_out:',transform_out)
+            print('  batch_size,buffer_size:',batch_size,buffer_size)
+            
+        self._build_dnn()
         crit=self.nn.MSELoss()
-        opt=self.optim.Adam(self.dnn.parameters(),lr=0.01)
+        
+        def train_buffer(buf_in,buf_out):
+            # Shuffle the buffer and then take optimizer steps
+            # with minibatches
+            x=numpy.concatenate(buf_in)
+            y=numpy.concatenate(buf_out)
+            perm=numpy.random.permutation(len(x))
+            ten_in=self.torch.from_numpy(x[perm]).float().to(self.device)
+            ten_out=self.torch.from_numpy(y[perm]).float().to(self.device)
+            total=0.0
+            self.dnn.train()
+            for j in range(0,len(x),batch_size):
+                self.opt.zero_grad()
+                loss=crit(self.dnn(ten_in[j:j+batch_size]),
+                          ten_out[j:j+batch_size])
+                loss.backward()
+                self.opt.step()
+                total+=loss.item()*len(ten_in[j:j+batch_size])
+            return total
+        
+        # ----------------------------------------------------------
+        # Subsequent passes: training
+        
+        best_loss=0
+        best_model=0
+        trigger=0
+        
+        for epoch in range(0,epochs):
+
+            buf_in=[]
+            buf_out=[]
+            n_buf=0
+            train_loss=0.0
+            n_train=0
+            test_loss=0.0
+            n_test=0
+            i_chunk=0
+            
+            for in_chunk,out_chunk in source:
+                
+                if self.transform_in!='none':
+                    in_chunk=self.SS1.transform(in_chunk)
+                if self.transform_out!='none':
+                    out_chunk=self.SS2.transform(out_chunk)
+
+                # Hold out the same points in every epoch
+                if test_size>0.0:
+                    rng=numpy.random.default_rng(i_chunk)
+                    mask=rng.random(len(in_chunk))<test_size
+                    if numpy.any(mask):
+                        self.dnn.eval()
+                        with self.torch.no_grad():
+                            t_in=self.torch.from_numpy(
+                                numpy.asarray(in_chunk[mask])).float()
+                            t_out=self.torch.from_numpy(
+                                numpy.asarray(out_chunk[mask])).float()
+                            t_loss=crit(self.dnn(t_in.to(self.device)),
+                                        t_out.to(self.device))
+                        test_loss+=t_loss.item()*int(numpy.sum(mask))
+                        n_test+=int(numpy.sum(mask))
+                    in_chunk=in_chunk[~mask]
+                    out_chunk=out_chunk[~mask]
+                i_chunk+=1
+
+                buf_in.append(in_chunk)
+                buf_out.append(out_chunk)
+                n_buf+=len(in_chunk)
+                if n_buf>=buffer_size:
+                    train_loss+=train_buffer(buf_in,buf_out)
+                    n_train+=n_buf
+                    buf_in=[]
+                    buf_out=[]
+                    n_buf=0
+
+            if n_buf>0:
+                train_loss+=train_buffer(buf_in,buf_out)
+                n_train+=n_buf
+
+            train_loss/=max(n_train,1)
+            if n_test>0:
+                test_loss/=n_test
+            else:
+                test_loss=train_loss
+
+            if self.verbose>0:
+                print('  Epoch:',str(epoch+1)+'/'+str(epochs),
+                      ('loss: %7.6e, best_loss: %7.6e, '+
+                       'test_loss: %7.6e') %
+                      (train_loss,best_loss,test_loss))
+
+            if epoch==0 or test_loss<best_loss:
+                best_loss=test_loss
+                best_model=copy.deepcopy(self.dnn.state_dict())
+                trigger=0
+            elif patience>0:
+                # (Disable early stopping if patience is 0)
+                trigger+=1
+                if trigger>=patience:
+                    if self.verbose>0:
+                        print('  Stopping early.')
+                    break
+
+        if epochs>0:
+            self.dnn.load_state_dict(best_model)
+        self.dnn.eval()
+        
+        return
+
+    def _train(self,x_train,y_train,x_test,y_test,epochs,patience):
+        """
+        Train the network, starting from the current weights
+        and optimizer state, on already transformed data. If
+        ``x_test`` is None, the training loss is used to select
+        the best model.
+        """
+        
+        ten_in=self.torch.from_numpy(
+            numpy.asarray(x_train)).float().to(self.device)
+        ten_out=self.torch.from_numpy(
+            numpy.asarray(y_train)).float().to(self.device)
+        if x_test is not None:
+            test_in=self.torch.from_numpy(
+                numpy.asarray(x_test)).float().to(self.device)
+            test_out=self.torch.from_numpy(
+                numpy.asarray(y_test)).float().to(self.device)
+
+        crit=self.nn.MSELoss()
+        opt=self.opt
         
         best_loss=0
         trigger=0
@@ -1669,8 +2143,6 @@ class interpm_torch_dnn:
         done=False
         epoch=0
 
-        print('interpm_torch_dnn::set_data():')
-        
         while done==False and epoch<epochs:
             
             self.dnn.train()
@@ -1682,15 +2154,15 @@ class interpm_torch_dnn:
 
             self.dnn.eval()
 
-            if test_size>0.0:
+            if x_test is not None:
                 with self.torch.no_grad():
                     test_pred=self.dnn(test_in)
                     test_loss=crit(test_pred,test_out)
             else:
-                test_loss=loss
+                test_loss=loss.detach()
                 
             if self.verbose>0:
-                if test_size>0.0:
+                if x_test is not None:
                     print('  Epoch:',str(epoch+1)+'/'+str(epochs),
                           ('loss: %7.6e, best_loss: %7.6e, '+
                            'test_loss: %7.6e') %
@@ -1715,9 +2187,76 @@ class interpm_torch_dnn:
             
             epoch+=1
 
-        self.dnn.load_state_dict(best_model)
+        if epoch>0:
+            self.dnn.load_state_dict(best_model)
             
         return
+
+    def add_data(self,in_data,out_data,epochs=20,n_replay=None,
+                 update_scalers=True,patience=0,n_reservoir=100000):
+        """Add new training data and continue training the network
+        from its current weights and optimizer state.
+
+        The new points are combined with ``n_replay`` points chosen
+        randomly (by default, the same number as the number of new
+        points) from a reservoir which holds a uniform random sample
+        of at most ``n_reservoir`` of the previous training points,
+        and at most ``epochs`` epochs are run on the combined data,
+        so the cost and memory scale with the size of the new data
+        rather than the total size of the training data.
+
+        If ``update_scalers`` is True, then the 'moto' and
+        'standard' transformations are updated with the new data.
+        The 'quant' transformation cannot be updated incrementally
+        and is left unchanged.
+        """
+        if self.dnn is None:
+            raise RuntimeError('No model in interpm_torch_dnn::'+
+                               'add_data(). Call set_data() first.')
+        if (numpy.shape(in_data)[1]!=self.nd_in or
+            numpy.shape(out_data)[1]!=self.nd_out):
+            raise ValueError('Data has wrong number of columns in '+
+                             'interpm_torch_dnn::add_data().')
+        
+        # After load(), the previous training data is not available
+        n_new=numpy.shape(in_data)[0]
+        n_old=0
+        if self.in_data is not None:
+            n_old=numpy.shape(self.in_data)[0]
+        if n_replay is None:
+            n_replay=n_new
+        n_replay=min(n_replay,n_old)
+
+        if self.verbose>0:
+            print('interpm_torch_dnn::add_data():')
+            print('  new points:',n_new)
+            print('  reservoir points:',n_old)
+            print('  replayed points:',n_replay)
+            print('  epochs:',epochs)
+        
+        if update_scalers:
+            if self.transform_in=='moto' or self.transform_in=='standard':
+                self.SS1.partial_fit(in_data)
+            if (self.transform_out=='moto' or
+                self.transform_out=='standard'):
+                self.SS2.partial_fit(out_data)
+
+        (in_train,out_train,self.in_data,self.out_data,
+         self.n_seen)=_replay_mix(self.in_data,self.out_data,
+                                  self.n_seen,in_data,out_data,
+                                  n_replay,n_reservoir)
+            
+        if self.transform_in!='none':
+            in_train=self.SS1.transform(in_train)
+        if self.transform_out!='none':
+            out_train=self.SS2.transform(out_train)
+
+        if self.opt is None:
+            self.opt=self.optim.Adam(self.dnn.parameters(),lr=0.01)
+            
+        self._train(in_train,out_train,None,None,epochs,patience)
+        
+        return
     
     def eval(self,v):
         """
@@ -1801,7 +2340,8 @@ class interpm_torch_dnn:
         #print('el,v_trans',v_trans)
 
         try:
-            ten_in=self.torch.from_numpy(v).float()
+            ten_in=self.torch.from_numpy(
+                numpy.asarray(v_trans)).float().to(self.device)
             self.dnn.eval()
             with self.torch.no_grad():
                 pred=self.dnn(ten_in).cpu()
@@ -19,6 +19,7 @@
 #  
 #  ───────────────────────────────────────────────────────────────────
 
+import math
 import numpy
 
 from o2sclpy.utils import string_to_dict2
@@ -50,13 +51,106 @@ class kde_sklearn:
         self.kernel=0
         self.SS1=0
         self.data=0
+        self.chunk_size=10000
+        self.cv_bw=0
+        self.cv_scores=0
+
+    def _cv_bandwidth(self,in_data_trans,bw_array,kernel,cv,n_jobs,
+                      cache_dir):
+        """Select the bandwidth from ``bw_array`` which maximizes the
+        cross-validated log likelihood and return it
+
+        This gives the same result as scikit-learn's
+        ``GridSearchCV`` with ``cv`` unshuffled folds, but one
+        KD-tree is built for each fold and shared by all of the
+        bandwidths. The (fold,bandwidth) pairs are evaluated in a pool
+        of ``n_jobs`` threads (one per core if ``n_jobs`` is -1).
+
+        If ``cache_dir`` is not empty, the bandwidths and their
+        scores are stored in a JSON file in that directory, whose
+        name contains a hash of the data and the search settings,
+        and are read from there on later calls with the same data.
+        """
+        import os
+        import json
+        import hashlib
+        from sklearn.model_selection import KFold
+        from sklearn.neighbors import KDTree
 
+        bw_list=[float(bw) for bw in bw_array]
+        
+        if len(cache_dir)>0:
+            h=hashlib.sha256()
+            h.update(numpy.ascontiguousarray(in_data_trans,
+                                             dtype=numpy.float64).tobytes())
+            h.update(json.dumps([list(numpy.shape(in_data_trans)),
+                                 kernel,cv,bw_list]).encode())
+            cache_file=os.path.join(cache_dir,'kde_sklearn_cv_'+
+                                    h.hexdigest()[0:20]+'.json')
+            if os.path.exists(cache_file):
+                with open(cache_file,'r') as f:
+                    dct=json.load(f)
+                self.cv_bw=numpy.array(dct["bw"])
+                self.cv_scores=numpy.array(dct["scores"])
+                if self.verbose>0:
+                    print('kde_sklearn::set_data(): Read bandwidth',
+                          dct["bandwidth"],'from',cache_file)
+                return dct["bandwidth"]
+
+        folds=list(KFold(n_splits=cv).split(in_data_trans))
+        trees=[KDTree(in_data_trans[train]) for train,test in folds]
+        scores=numpy.zeros((len(folds),len(bw_list)))
+
+        def score_one(task):
+            i,j=task
+            train,test=folds[i]
+            log_dens=trees[i].kernel_density(in_data_trans[test],
+                                             h=bw_list[j],kernel=kernel,
+                                             return_log=True)
+            scores[i,j]=numpy.sum(log_dens)-len(test)*numpy.log(len(train))
+            return
+
+        tasks=[(i,j) for i in range(0,len(folds))
+               for j in range(0,len(bw_list))]
+        if n_jobs==1:
+            for task in tasks:
+                score_one(task)
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            
+            if n_jobs<=0:
+                n_jobs=os.cpu_count()
+            with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+                list(pool.map(score_one,tasks))
+
+        self.cv_bw=numpy.array(bw_list)
+        self.cv_scores=numpy.mean(scores,axis=0)
+        bandwidth=bw_list[int(numpy.argmax(self.cv_scores))]
+        
+        if len(cache_dir)>0:
+            os.makedirs(cache_dir,exist_ok=True)
+            with open(cache_file,'w') as f:
+                json.dump({"bandwidth": bandwidth,"bw": bw_list,
+                           "scores": self.cv_scores.tolist()},f)
+            if self.verbose>0:
+                print('kde_sklearn::set_data(): Wrote bandwidth',
+                      bandwidth,'to',cache_file)
+                
+        return bandwidth
+    
     def set_data(self,in_data,bw_array,verbose=0,kernel='gaussian',
                  metric='euclidean',outformat='numpy',
-                 transform='unit',bandwidth='none'):
+                 transform='unit',bandwidth='none',cv=5,n_jobs=1,
+                 cache_dir=''):
         """
         Fit the mixture model with the specified input data, 
         a numpy array of shape (n_samples,n_coordinates)
+
+        If ``bandwidth`` is ``'none'``, then the bandwidth is chosen
+        from ``bw_array`` by ``cv``-fold cross-validation, using
+        ``n_jobs`` threads, and cached in ``cache_dir`` if it is not
+        empty (see :meth:`_cv_bandwidth`). The bandwidths and their
+        mean scores are stored in ``cv_bw`` and ``cv_scores``.
         """
 
         if verbose>0:
@@ -69,7 +163,6 @@ class kde_sklearn:
             print('')
 
         from sklearn.neighbors import KernelDensity
-        from sklearn.model_selection import GridSearchCV
         import numpy
 
         self.verbose=verbose
@@ -91,10 +184,10 @@ class kde_sklearn:
         try:
 
             if bandwidth=='none' or bandwidth=='None':
-                grid=GridSearchCV(KernelDensity(kernel=kernel),
-                                  {"bandwidth": bw_array})
-                grid.fit(in_data_trans)
-                self.kde=grid.best_estimator_
+                bw=self._cv_bandwidth(in_data_trans,bw_array,kernel,
+                                      cv,n_jobs,cache_dir)
+                self.kde=KernelDensity(kernel=kernel,
+                                       bandwidth=bw).fit(in_data_trans)
             else:
                 if bandwidth!='scott' and bandwidth!='silverman':
                     bandwidth=float(bandwidth)
@@ -128,7 +221,8 @@ class kde_sklearn:
         """
 
         try:
-            dct=string_to_dict2(options,list_of_ints=['verbose'])
+            dct=string_to_dict2(options,list_of_ints=['verbose','cv',
+                                                      'n_jobs'])
             if self.verbose>1:
                 print('String:',options,'Dictionary:',dct)
                   
@@ -140,12 +234,42 @@ class kde_sklearn:
 
         return
 
-    def sample(self,n_samples=1):
+    def sample(self,n_samples=1,out=None,chunk_size=0,random_state=None):
         """
         Sample the Gaussian mixture model
+
+        If ``out`` is specified, it must be a numpy array of shape
+        ``(n_points,n_dim)``. It is then filled with ``n_points``
+        samples, generated in chunks of ``chunk_size`` points (or
+        ``self.chunk_size`` points if ``chunk_size`` is zero) and
+        inverse-transformed in place, and returned. The value of
+        ``random_state`` is passed to scikit-learn to seed the
+        sampling.
         """
+
+        if out is not None:
+            from sklearn.utils import check_random_state
+            
+            if (not isinstance(out,numpy.ndarray) or out.ndim!=2 or
+                out.shape[1]!=self.n_dim):
+                raise ValueError('Array out must have shape (n,'+
+                                 str(self.n_dim)+') in '+
+                                 'kde_sklearn::sample().')
+            if chunk_size<=0:
+                chunk_size=self.chunk_size
+            rng=check_random_state(random_state)
+            n=out.shape[0]
+            for i in range(0,n,chunk_size):
+                block=out[i:i+chunk_size]
+                block[:]=self.kde.sample(n_samples=block.shape[0],
+                                         random_state=rng)
+                if self.transform!='none':
+                    # The inverse of the MinMaxScaler transformation
+                    block-=self.SS1.min_
+                    block/=self.SS1.scale_
+            return out
         
-        out=self.kde.sample(n_samples=n_samples)
+        out=self.kde.sample(n_samples=n_samples,random_state=random_state)
         
         #print('out:',type(out),numpy.shape(out),out)
         
@@ -167,17 +291,71 @@ class kde_sklearn:
             return out_trans.tolist()
 
         return numpy.ascontiguousarray(out_trans)
+
+    def log_pdf_batch(self,x,chunk_size=0,n_jobs=1):
+        """
+        Return the log likelihood at each of the points in the
+        array ``x`` of shape ``(n_points,n_dim)``
+
+        The points are transformed and evaluated with scikit-learn's
+        ``score_samples()`` in chunks of ``chunk_size`` points (or
+        ``self.chunk_size`` points if ``chunk_size`` is zero). If
+        ``n_jobs`` is larger than one, the chunks are evaluated in a
+        pool of that many threads, and if ``n_jobs`` is -1, one
+        thread is used for each core. The output is a list or numpy
+        array, depending on the value of ``outformat``.
+        """
+        xa=numpy.asarray(x,dtype=numpy.float64)
+        if xa.ndim!=2 or xa.shape[1]!=self.n_dim:
+            raise ValueError('Array x must have shape (n,'+
+                             str(self.n_dim)+') in '+
+                             'kde_sklearn::log_pdf_batch().')
+        if chunk_size<=0:
+            chunk_size=self.chunk_size
+        n=xa.shape[0]
+        res=numpy.zeros((n))
+
+        def eval_chunk(i):
+            if self.transform!='none':
+                x_trans=self.SS1.transform(xa[i:i+chunk_size])
+            else:
+                x_trans=xa[i:i+chunk_size]
+            res[i:i+chunk_size]=self.kde.score_samples(x_trans)
+            return
+
+        starts=range(0,n,chunk_size)
+        if n_jobs==1 or len(starts)==1:
+            for i in starts:
+                eval_chunk(i)
+        else:
+            import os
+            from concurrent.futures import ThreadPoolExecutor
+            
+            if n_jobs<=0:
+                n_jobs=os.cpu_count()
+            with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+                list(pool.map(eval_chunk,starts))
+
+        if self.outformat=='list':
+            return res.tolist()
+        
+        return res
         
     def log_pdf(self,x):
         """
         Return the log likelihood 
+
+        If ``x`` is a two-dimensional array of points, then this
+        function returns the result of :meth:`log_pdf_batch`.
         """
+        if numpy.ndim(x)==2:
+            return self.log_pdf_batch(x)
         if self.transform!='none':
             x_trans=self.SS1.transform([x])
         else:
             x_trans=[x]
         #print('x,x_trans:',x,x_trans)
-        res=self.kde.score(x_trans)
+        res=self.kde.score_samples(x_trans)[0]
         return res
 
     def pdf(self,x):
@@ -185,6 +363,134 @@ class kde_sklearn:
         Return the likelihood 
         """
         return numpy.exp(self.log_pdf(x))
+
+    def _pdf_grid_fft(self,grids_trans,bin_frac,cut,max_bins):
+        """Return the likelihood on the mesh of the uniformly spaced
+        transformed grids in ``grids_trans`` using linear binning and
+        an FFT convolution, or None if the binning grid would have
+        more than ``max_bins`` points
+        """
+        from scipy.signal import fftconvolve
+
+        h=self.kde.bandwidth_
+        data=numpy.asarray(self.kde.tree_.data)
+        n_data=data.shape[0]
+
+        # The binning grid in each dimension is a refinement of the
+        # evaluation grid by an integer factor, so that its spacing
+        # is at most bin_frac times the bandwidth, padded on both
+        # sides by the range of the kernel
+        lo=[]
+        dx=[]
+        step=[]
+        pad=[]
+        shape=[]
+        for g in grids_trans:
+            if len(g)>1:
+                m=max(int(math.ceil((g[1]-g[0])/(bin_frac*h))),1)
+                d=(g[1]-g[0])/m
+            else:
+                m=1
+                d=bin_frac*h
+            p=int(math.ceil(cut*h/d))
+            lo.append(g[0]-p*d)
+            dx.append(d)
+            step.append(m)
+            pad.append(p)
+            shape.append((len(g)-1)*m+1+2*p)
+        if numpy.prod(shape,dtype=numpy.float64)>max_bins:
+            return None
+
+        # Linearly bin the data, distributing the weight of each
+        # point over the 2^n_dim nearest grid points
+        u=(data-numpy.array(lo))/numpy.array(dx)
+        i0=numpy.floor(u).astype(numpy.int64)
+        frac=u-i0
+        inside=numpy.all((i0>=0) & (i0<numpy.array(shape)-1),axis=1)
+        i0=i0[inside]
+        frac=frac[inside]
+        n_bins=int(numpy.prod(shape))
+        counts=numpy.zeros(n_bins)
+        for corner in range(0,2**self.n_dim):
+            w=numpy.ones(len(i0))
+            flat=numpy.zeros(len(i0),dtype=numpy.int64)
+            for j in range(0,self.n_dim):
+                bit=(corner>>j)&1
+                if bit==1:
+                    w*=frac[:,j]
+                else:
+                    w*=1.0-frac[:,j]
+                flat=flat*shape[j]+i0[:,j]+bit
+            counts+=numpy.bincount(flat,weights=w,minlength=n_bins)
+        counts=counts.reshape(shape)
+
+        # The normalized Gaussian kernel on the binning grid
+        kern=numpy.ones(())
+        for j in range(0,self.n_dim):
+            off=numpy.arange(-pad[j],pad[j]+1)*dx[j]/h
+            kern=numpy.multiply.outer(kern,numpy.exp(-0.5*off**2))
+        kern/=(2.0*math.pi)**(self.n_dim/2.0)*h**self.n_dim*n_data
+        
+        dens=fftconvolve(counts,kern,mode='same')
+        sl=tuple(slice(pad[j],shape[j]-pad[j],step[j])
+                 for j in range(0,self.n_dim))
+        return numpy.maximum(dens[sl],0.0)
+        
+    def pdf_grid(self,grids,method='auto',bin_frac=0.125,cut=6.0,
+                 max_bins=2**24):
+        """
+        Return the likelihood on the mesh defined by the list
+        ``grids`` of one-dimensional arrays, one for each dimension,
+        as a numpy array of shape ``(len(grids[0]),len(grids[1]),...)``
+
+        If ``method`` is ``'fft'``, the data is linearly binned onto
+        a grid with a spacing of at most ``bin_frac`` times the
+        bandwidth and convolved with the kernel, truncated at ``cut``
+        bandwidths, using an FFT. This requires the Gaussian kernel
+        and uniformly spaced grids. If ``method`` is ``'exact'``, all
+        of the mesh points are evaluated with :meth:`log_pdf_batch`.
+        If ``method`` is ``'auto'``, the FFT is used when possible
+        and when the binning grid has at most ``max_bins`` points.
+        """
+        if method not in ['auto','fft','exact']:
+            raise ValueError('Method '+str(method)+' not supported in '+
+                             'kde_sklearn::pdf_grid().')
+        if len(grids)!=self.n_dim:
+            raise ValueError('Expected '+str(self.n_dim)+' grids in '+
+                             'kde_sklearn::pdf_grid().')
+        grids=[numpy.asarray(g,dtype=numpy.float64) for g in grids]
+
+        if method!='exact':
+            if self.transform!='none':
+                grids_trans=[g*self.SS1.scale_[j]+self.SS1.min_[j]
+                             for j,g in enumerate(grids)]
+            else:
+                grids_trans=grids
+            uniform=all(len(g)<3 or
+                        numpy.allclose(numpy.diff(g),g[1]-g[0],
+                                       rtol=1.0e-6,atol=0.0)
+                        for g in grids_trans)
+            fft_ok=(self.kernel=='gaussian' and uniform and
+                    all(len(g)==1 or g[1]>g[0] for g in grids_trans))
+            if method=='fft' and fft_ok==False:
+                raise ValueError('Method fft requires the gaussian '+
+                                 'kernel and increasing, uniformly '+
+                                 'spaced grids in '+
+                                 'kde_sklearn::pdf_grid().')
+            if fft_ok==True:
+                if method=='fft':
+                    max_bins=numpy.inf
+                res=self._pdf_grid_fft(grids_trans,bin_frac,cut,max_bins)
+                if res is not None:
+                    return res
+                if self.verbose>0:
+                    print('kde_sklearn::pdf_grid(): Binning grid too',
+                          'large, using exact method.')
+
+        mesh=numpy.meshgrid(*grids,indexing='ij')
+        pts=numpy.column_stack([m.ravel() for m in mesh])
+        res=numpy.exp(numpy.asarray(self.log_pdf_batch(pts)))
+        return res.reshape(mesh[0].shape)
         
 class kde_scipy:
     """
@@ -201,6 +507,14 @@ class kde_scipy:
         self.outformat='numpy'
         self.transform=0
         self.SS1=0
+        self.method='exact'
+        self.rtol=1.0e-4
+        self.chunk_size=10000
+        self.max_pairs=2**21
+        self.max_frac=0.1
+        self.tree=0
+        self.chol=0
+        self.log_norm=0
 
     def string_to_dict(self,s):
         """
@@ -237,6 +551,8 @@ class kde_scipy:
 
             if arr2[0]=='verbose':
                 arr2[1]=int(arr2[1])
+            if arr2[0]=='rtol':
+                arr2[1]=float(arr2[1])
                     
             dct[arr2[0]]=arr2[1]
 
@@ -244,18 +560,46 @@ class kde_scipy:
     
     def set_data(self,in_data,verbose=0,weights=None,
                  outformat='numpy',bw_method=None,
-                 transform='unit'):
+                 transform='unit',method='exact',rtol=1.0e-4):
         """
         Fit the mixture model with the specified input data, 
         a numpy array of shape (n_samples,n_coordinates)
+
+        If ``method`` is ``'exact'``, then :meth:`log_pdf` and
+        :meth:`pdf` use scipy's brute-force sum over all of the data
+        points. If ``method`` is ``'tree'``, then the data is
+        whitened with the Cholesky factor of the kernel covariance
+        and stored in a KD-tree. The density is then summed only
+        over the data points within a finite radius of each
+        evaluation point, found with a dual-tree search. The
+        (weighted) contribution of the neglected points is bounded
+        above, and any point for which this bound exceeds ``rtol``
+        times the computed density is evaluated exactly, so the
+        relative error in the density is at most ``rtol``.
+
+        The tree search is only faster when the radius contains a
+        small fraction of the data. If more than ``self.max_frac``
+        (default 0.1) of the data is estimated to be within the
+        radius of a typical evaluation point, then the exact method
+        is used instead. Otherwise, the evaluation points are
+        processed in blocks so that at most about ``self.max_pairs``
+        (default 2**21) pairs of points are stored at once.
         """
 
         if verbose>0:
             print('kde_scipy::set_data():')
             print('  verbose:',verbose)
             print('  transform:',transform)
+            print('  method:',method)
+            print('  rtol:',rtol)
             print('')
 
+        if method!='exact' and method!='tree':
+            raise ValueError('Method '+str(method)+' not supported '+
+                             'in kde_scipy::set_data().')
+        self.method=method
+        self.rtol=rtol
+
         try:
             from scipy import stats
             import numpy
@@ -297,8 +641,112 @@ class kde_scipy:
                   'KDE failed.\n  ',e)
             raise
 
+        if self.method=='tree':
+            try:
+                from scipy.spatial import cKDTree
+                from scipy.linalg import cholesky, solve_triangular
+                
+                self.chol=cholesky(self.kde.covariance,lower=True)
+                white=solve_triangular(self.chol,self.kde.dataset,
+                                       lower=True).transpose()
+                self.tree=cKDTree(white)
+                self.log_norm=(-0.5*self.n_dim*numpy.log(2.0*numpy.pi)-
+                               numpy.sum(numpy.log(numpy.diag(self.chol))))
+            except Exception as e:
+                print('Exception in kde_scipy::set_data()',
+                      'at tree construction.\n  ',e)
+                raise
+
         return
 
+    def _tree_log_pdf(self,x_trans):
+        """Compute the log of the density at the points in the
+        array ``x_trans`` of shape ``(n_points,n_dim)``, which have
+        already been transformed, using the KD-tree
+        """
+        from scipy.spatial import cKDTree
+        from scipy.linalg import solve_triangular
+
+        w=self.kde.weights
+        # Points outside this radius (in whitened coordinates)
+        # contribute at most rtol times their total weight. We try
+        # the minimum radius and then twice that radius before
+        # evaluating the remaining points exactly.
+        r2_min=-2.0*numpy.log(self.rtol)
+        r2_list=[r2_min,4.0*r2_min]
+        y=solve_triangular(self.chol,numpy.transpose(x_trans),
+                           lower=True).transpose()
+        n=y.shape[0]
+        n_data=self.tree.n
+
+        # Estimate the number of data points within each radius
+        # using a sample of the evaluation points. This only counts
+        # the neighbors, so it does not store any pairs.
+        ix=numpy.unique(numpy.linspace(0,n-1,min(n,256)).astype(int))
+        def count(r2):
+            cnt=self.tree.query_ball_point(y[ix],numpy.sqrt(r2),
+                                           return_length=True)
+            return max(1.0,numpy.mean(cnt))
+
+        # If the smallest radius contains a large fraction of the
+        # data, then the tree does not help
+        counts=[count(r2_list[0])]
+        if counts[0]>self.max_frac*n_data:
+            if self.verbose>1:
+                print('kde_scipy::_tree_log_pdf(): Radius contains',
+                      counts[0]/n_data,'of the data, using exact',
+                      'method.')
+            return self.kde.logpdf(numpy.transpose(x_trans))
+        counts+=[count(r2) for r2 in r2_list[1:]]
+
+        # The number of evaluation points in each block, so that
+        # the number of pairs is at most about max_pairs
+        n_block=[max(1,int(self.max_pairs/c)) for c in counts]
+        if self.verbose>1:
+            print('kde_scipy::_tree_log_pdf(): Neighbors,',
+                  'block sizes:',counts,n_block)
+        
+        res=numpy.zeros((n))
+        
+        for start in range(0,n,self.chunk_size):
+            yc=y[start:start+self.chunk_size]
+            nc=yc.shape[0]
+            sums=numpy.zeros((nc))
+            todo=numpy.arange(nc)
+            
+            for k in range(0,len(r2_list)):
+                r2=r2_list[k]
+                ok_all=numpy.zeros((len(todo)),dtype=bool)
+                for b in range(0,len(todo),n_block[k]):
+                    tb=todo[b:b+n_block[k]]
+                    qtree=cKDTree(yc[tb])
+                    pairs=qtree.sparse_distance_matrix(
+                        self.tree,numpy.sqrt(r2),output_type='ndarray')
+                    wj=w[pairs['j']]
+                    s_in=numpy.bincount(pairs['i'],minlength=len(tb),
+                                        weights=wj*numpy.exp
+                                        (-0.5*pairs['v']**2))
+                    w_in=numpy.bincount(pairs['i'],weights=wj,
+                                        minlength=len(tb))
+                    del pairs,wj
+                    ok=((1.0-w_in)*numpy.exp(-0.5*r2)<=self.rtol*s_in)
+                    sums[tb[ok]]=s_in[ok]
+                    ok_all[b:b+len(tb)]=ok
+                todo=todo[~ok_all]
+                if len(todo)==0:
+                    break
+                
+            res[start:start+nc]=self.log_norm+numpy.log(
+                numpy.where(sums>0.0,sums,1.0))
+            if len(todo)>0:
+                if self.verbose>1:
+                    print('kde_scipy::_tree_log_pdf(): Evaluating',
+                          len(todo),'points exactly.')
+                res[start+todo]=self.kde.logpdf(
+                    numpy.transpose(x_trans[start+todo]))
+            
+        return res
+
     def get_bandwidth(self):
         """
         Return the bandwidth
@@ -354,25 +802,33 @@ class kde_scipy:
     def log_pdf(self,x):
         """
         Return the log likelihood 
+
+        The value ``x`` can be a single point or a two-dimensional
+        array of points, in which case a numpy array is returned.
         """
+        xa=numpy.asarray(x,dtype=numpy.float64)
+        single=(xa.ndim==1)
+        if single:
+            xa=xa.reshape(1,-1)
         if self.transform!='none':
-            x_trans=self.SS1.transform([x])
+            x_trans=self.SS1.transform(xa)
         else:
-            x_trans=[x]
+            x_trans=xa
         #print('x,x_trans:',x,x_trans)
-        res=self.kde.logpdf(x_trans)[0]
+        if self.method=='tree':
+            res=self._tree_log_pdf(x_trans)
+        else:
+            res=self.kde.logpdf(numpy.transpose(x_trans))
+        if single:
+            return res[0]
         
         return res
 
     def pdf(self,x):
         """
         Return the likelihood 
+
+        The value ``x`` can be a single point or a two-dimensional
+        array of points, in which case a numpy array is returned.
         """
-        if self.transform!='none':
-            x_trans=self.SS1.transform([x])
-        else:
-            x_trans=[x]
-        #print('x,x_trans:',x,x_trans)
-        res=self.kde.pdf(x_trans)[0]
-        return res
-    
+        return numpy.exp(self.log_pdf(x))
@@ -49,17 +49,86 @@ class nflows_nsf:
         self.device=0
         self.adam_lr=0
         self.adam_decay=0
+        self.chunk_size=100000
+        self._eval_ctx=None
+
+    def _save_checkpoint(self,filename,optimizer,it):
+        """Write the model, optimizer and scaler state after
+        iteration ``it`` to the file ``filename``. The checkpoint
+        is first written to a temporary file and then renamed, so
+        that an interrupted write does not destroy the previous
+        checkpoint.
+        """
+        import os
+        import torch
+
+        ckpt={"n_dim": self.n_dim,
+              "num_layers": self.num_layers,
+              "num_hidden_channels": self.num_hidden_channels,
+              "iteration": it,
+              "model": self.model.state_dict(),
+              "optimizer": optimizer.state_dict(),
+              "SS1": self.SS1,
+              "rng_state": torch.get_rng_state()}
+        torch.save(ckpt,filename+'.tmp')
+        os.replace(filename+'.tmp',filename)
+        if self.verbose>0:
+            print('nflows_nsf::set_data(): Wrote checkpoint at',
+                  'iteration',it,'to',filename)
+        return
 
+    def _load_checkpoint(self,filename,optimizer):
+        """Restore the model, optimizer and scaler state from the
+        checkpoint in ``filename`` and return the number of
+        iterations which were completed.
+        """
+        import torch
+
+        ckpt=torch.load(filename,map_location=self.device,
+                        weights_only=False)
+        if (ckpt["n_dim"]!=self.n_dim or
+            ckpt["num_layers"]!=self.num_layers or
+            ckpt["num_hidden_channels"]!=self.num_hidden_channels):
+            print('Checkpoint',filename,'does not match the flow',
+                  'in nflows_nsf::set_data().')
+            raise ValueError('Checkpoint '+filename+' does not match '+
+                             'the flow in nflows_nsf::set_data().')
+        self.model.load_state_dict(ckpt["model"])
+        optimizer.load_state_dict(ckpt["optimizer"])
+        self.SS1=ckpt["SS1"]
+        torch.set_rng_state(ckpt["rng_state"])
+        if self.verbose>0:
+            print('nflows_nsf::set_data(): Resuming from',filename,
+                  'after iteration',ckpt["iteration"])
+        return ckpt["iteration"]+1
+    
     def set_data(self,in_data,verbose=0,
                  num_layers=20,num_hidden_channels=128,
                  max_iter=20000,outformat='numpy',adam_lr=1.0e-4,
-                 adam_decay=1.0e-4):
+                 adam_decay=1.0e-4,checkpoint_file='',
+                 checkpoint_every=0,resume=False,n_threads=0,
+                 n_interop_threads=0,batch_size=0,num_workers=0):
         """
         Fit the mixture model with the specified input data, 
         a numpy array of shape (n_samples,n_coordinates)
 
         adam_lr is Adam learning rate (pytorch default is 1.0e-3)
         adam_decay is the Adam weight decay (pytorch default is 0)
+
+        If ``checkpoint_file`` is not empty, then the model, optimizer
+        and scaler state are written to that file every
+        ``checkpoint_every`` iterations (if ``checkpoint_every`` is
+        positive) and at the end of training. If ``resume`` is True
+        and the checkpoint file exists, training continues from the
+        iteration after the checkpoint, so that a job which was
+        interrupted can be restarted with the same arguments.
+
+        If ``n_threads`` or ``n_interop_threads`` are positive, they
+        set the number of threads torch uses within and between
+        operations. If ``batch_size`` is positive, then each
+        iteration uses a shuffled minibatch of that size from a
+        torch ``DataLoader`` with ``num_workers`` worker processes,
+        rather than the full data set.
         """
 
         if verbose>0:
@@ -71,6 +140,11 @@ class nflows_nsf:
             print('  num_hidden_channels:',num_hidden_channels)
             print('  adam_lr:',adam_lr)
             print('  adam_decay:',adam_decay)
+            print('  checkpoint_file:',checkpoint_file)
+            print('  checkpoint_every:',checkpoint_every)
+            print('  resume:',resume)
+            print('  batch_size:',batch_size)
+            print('  num_workers:',num_workers)
             print('')
 
         self.verbose=verbose
@@ -83,21 +157,36 @@ class nflows_nsf:
         self.num_hidden_channels=num_hidden_channels
         self.adam_lr=adam_lr
         self.adam_decay=adam_decay
+        self._eval_ctx=None
         
         # Move model on GPU if available
+        import os
         import torch
+
+        if n_threads>0:
+            torch.set_num_threads(n_threads)
+        if n_interop_threads>0:
+            try:
+                torch.set_num_interop_threads(n_interop_threads)
+            except RuntimeError as e:
+                # Torch only allows this before any parallel work
+                print('Could not set the number of interop threads',
+                      'in nflows_nsf::set_data().',e)
         
         enable_cuda=True
         self.device=torch.device('cuda' if torch.cuda.is_available() and
                             enable_cuda else 'cpu')
         if self.verbose>0:
             print('nflows_nsf::set_data(): Device:',self.device)
+            print('nflows_nsf::set_data(): Threads:',
+                  torch.get_num_threads(),
+                  torch.get_num_interop_threads())
 
         from sklearn.preprocessing import StandardScaler
         
         try:
             self.SS1=StandardScaler()
-            in_data_trans=self.SS1.fit_transform(in_data)
+            self.SS1.fit(in_data)
         except Exception as e:
             print('Exception at transform in nflows_nsf::set_data().',e)
             raise
@@ -106,17 +195,6 @@ class nflows_nsf:
         
         try:
 
-            if False:
-                #ten_in=torch.from_numpy(in_data_trans).float()
-                ten_in=torch.tensor(in_data_trans,dtype=torch.float32)
-                ten_in.to(self.device)
-            else:
-                # Convert numpy to torch, there's probably a better way...
-                ten_in=torch.zeros((self.n_pts,self.n_dim),device=self.device)
-                for i in range(0,self.n_pts):
-                    for j in range(0,self.n_dim):
-                        ten_in[i,j]=in_data_trans[i,j]
-                    
             self.base=normflows.distributions.base.DiagGaussian(self.n_dim)
 
             # Create normalizing flow
@@ -139,10 +217,41 @@ class nflows_nsf:
                                        lr=self.adam_lr,
                                        weight_decay=self.adam_decay)
 
-            for it in range(0,self.max_iter):
+            start_it=0
+            if (resume and len(checkpoint_file)>0 and
+                os.path.exists(checkpoint_file)):
+                start_it=self._load_checkpoint(checkpoint_file,optimizer)
+
+            # Transform the data with the (possibly restored) scaler
+            # and pass it to torch without copying
+            in_data_trans=self.SS1.transform(in_data)
+            ten_cpu=torch.from_numpy(numpy.ascontiguousarray
+                                     (in_data_trans,dtype=numpy.float32))
+            ten_in=ten_cpu.to(self.device)
+
+            if batch_size>0:
+                loader=torch.utils.data.DataLoader(
+                    torch.utils.data.TensorDataset(ten_cpu),
+                    batch_size=batch_size,shuffle=True,
+                    num_workers=num_workers,
+                    persistent_workers=(num_workers>0),
+                    pin_memory=(self.device.type=='cuda'))
+                batches=iter(loader)
+
+            for it in range(start_it,self.max_iter):
+
+                if batch_size>0:
+                    try:
+                        batch=next(batches)[0]
+                    except StopIteration:
+                        batches=iter(loader)
+                        batch=next(batches)[0]
+                    batch=batch.to(self.device,non_blocking=True)
+                else:
+                    batch=ten_in
                 
                 optimizer.zero_grad()
-                loss=self.model.forward_kld(ten_in)
+                loss=self.model.forward_kld(batch)
 
                 if ~(torch.isnan(loss) | torch.isinf(loss)):
                     loss.backward()
@@ -152,6 +261,14 @@ class nflows_nsf:
                     print(('nflows_nsf::set_data(): '+
                            'it,max_iter,loss: %d %d %7.6e') %
                           (it,max_iter,loss.to('cpu').data.numpy()))
+
+                if (len(checkpoint_file)>0 and checkpoint_every>0 and
+                    (it+1)%checkpoint_every==0 and it+1<self.max_iter):
+                    self._save_checkpoint(checkpoint_file,optimizer,it)
+
+            if len(checkpoint_file)>0 and start_it<self.max_iter:
+                self._save_checkpoint(checkpoint_file,optimizer,
+                                      self.max_iter-1)
                 
         except Exception as e:
             print('Exception in nflows_nsf::set_data()',
@@ -170,8 +287,14 @@ class nflows_nsf:
             dct=string_to_dict2(options,list_of_ints=['verbose',
                                                       'num_layers',
                                                       'num_hidden_channels',
-                                                      'max_iter'],
-                                list_of_floats=['adam_lr','adam_decay'])
+                                                      'max_iter',
+                                                      'checkpoint_every',
+                                                      'n_threads',
+                                                      'n_interop_threads',
+                                                      'batch_size',
+                                                      'num_workers'],
+                                list_of_floats=['adam_lr','adam_decay'],
+                                list_of_bools=['resume'])
             if self.verbose>1:
                 print('String:',options,'Dictionary:',dct)
                   
@@ -183,6 +306,87 @@ class nflows_nsf:
 
         return
 
+    def sample_chunks(self,n_samples,chunk_size=0):
+        """Generate ``n_samples`` samples from the distribution in
+        blocks of at most ``chunk_size`` points (or ``self.chunk_size``
+        points if ``chunk_size`` is zero)
+
+        This function is a generator which yields float64 numpy
+        arrays of shape ``(n_block,n_dim)``. Each block is moved to
+        the CPU and the inverse of the input scaling is applied in
+        double precision, so only one block is held in memory at a
+        time.
+        """
+        torch,mean,scale=self._eval_context()
+        if chunk_size<=0:
+            chunk_size=self.chunk_size
+        for i in range(0,n_samples,chunk_size):
+            n_block=min(chunk_size,n_samples-i)
+            # Do not yield inside the no_grad() context, since the
+            # caller's code would otherwise also run without gradients
+            with torch.no_grad():
+                z,log_q=self.model.sample(n_block)
+                block=z.cpu().numpy().astype(numpy.float64)
+            block*=scale
+            block+=mean
+            if self.verbose>1:
+                print('nflows_nsf::sample_chunks(): Block',i,n_block)
+            yield block
+
+    def sample_fill(self,out,n_samples=0,col_names=None,chunk_size=0):
+        """Sample the distribution directly into ``out``, which is
+        either a numpy array of shape ``(n_points,n_dim)`` or an
+        O2scl :class:`table` object, and return ``out``
+
+        For a numpy array, the first ``n_samples`` rows are filled,
+        or all of the rows if ``n_samples`` is zero. For a table,
+        ``n_samples`` must be positive, the number of lines in the
+        table is set to ``n_samples``, and the samples are stored in
+        the columns named in ``col_names`` (default ``x0``, ``x1``,
+        ...), which are created if necessary. In both cases the
+        samples are generated in blocks by :meth:`sample_chunks`.
+        """
+        if isinstance(out,numpy.ndarray):
+            if out.ndim!=2 or out.shape[1]!=self.n_dim:
+                print('Buffer does not have correct shape',
+                      'in nflows_nsf::sample_fill().')
+                raise ValueError(('Buffer does not have correct '+
+                                  'shape in nflows_nsf::sample_fill().'))
+            if n_samples==0:
+                n_samples=out.shape[0]
+            if n_samples>out.shape[0]:
+                raise ValueError('Buffer has too few rows in '+
+                                 'nflows_nsf::sample_fill().')
+            cols=None
+        else:
+            if n_samples<=0:
+                raise ValueError('Number of samples must be positive '+
+                                 'in nflows_nsf::sample_fill().')
+            if col_names is None:
+                col_names=['x'+str(k) for k in range(0,self.n_dim)]
+            if len(col_names)!=self.n_dim:
+                raise ValueError('Number of column names must be '+
+                                 str(self.n_dim)+' in '+
+                                 'nflows_nsf::sample_fill().')
+            for name in col_names:
+                if not out.is_column(name):
+                    out.new_column(name)
+            out.set_nlines(n_samples)
+            # Zero-copy views of the table columns
+            cols=[out[name] for name in col_names]
+            
+        i=0
+        for block in self.sample_chunks(n_samples,chunk_size):
+            n_block=block.shape[0]
+            if cols is None:
+                out[i:i+n_block,:]=block
+            else:
+                for k in range(0,self.n_dim):
+                    cols[k][i:i+n_block]=block[:,k]
+            i=i+n_block
+            
+        return out
+    
     def sample(self,n_samples=1):
         """Sample the distribution
 
@@ -190,17 +394,11 @@ class nflows_nsf:
         was specified to set_data() or set_data_str(). The list or
         numpy array is only one-dimensional if ``n_samples`` is 1.
         """
-        
-        out,out_prob=self.model.sample(n_samples)
-        if self.device!='cpu':
-            out=out.to('cpu')
-        out=out.detach().numpy()
-        
-        if n_samples==1:
-            out_trans=self.SS1.inverse_transform(out)[0]
-        else:
-            out_trans=self.SS1.inverse_transform(out)
 
+        out_trans=self.sample_fill(numpy.zeros((n_samples,self.n_dim)))
+        if n_samples==1:
+            out_trans=out_trans[0]
+        
         if self.verbose>2:
             print('out_trans:',type(out_trans),numpy.shape(out_trans),
                   out_trans,self.outformat)
@@ -208,13 +406,24 @@ class nflows_nsf:
         if self.outformat=='list':
             return out_trans.tolist()
 
-        na=numpy.zeros(len(out_trans))
-        for i in range(0,len(na)):
-            na[i]=out_trans[i]
-
-        return na
+        return out_trans
         
-    def log_pdf(self,x):
+    def _eval_context(self):
+        """Return the ``torch`` module and the mean and scale of the
+        input transformation as float64 numpy arrays. These are
+        created once after each call to set_data() and then reused,
+        so that evaluations do not repeat the import. The scaling is
+        always applied in double precision, since the data may have
+        a large offset relative to its spread.
+        """
+        if self._eval_ctx is None:
+            import torch
+            mean=numpy.asarray(self.SS1.mean_,dtype=numpy.float64)
+            scale=numpy.asarray(self.SS1.scale_,dtype=numpy.float64)
+            self._eval_ctx=(torch,mean,scale)
+        return self._eval_ctx
+    
+    def log_pdf(self,x,chunk_size=0):
         """Return the log likelihood
 
         The value ``x`` can be a single point, expressed as a
@@ -224,55 +433,45 @@ class nflows_nsf:
         If ``x`` contains only one point, then only a single floating
         point value is returned. Otherwise, the return type is a list
         or numpy array, depending on the value of ``outformat``.
+
+        The flow is evaluated without gradients in chunks of
+        ``chunk_size`` points (or ``self.chunk_size`` points if
+        ``chunk_size`` is zero), so that large inputs are evaluated
+        in bounded memory. Each chunk is standardized in double
+        precision and then converted to float32 for the flow.
         """
-        import torch
+        torch,mean,scale=self._eval_context()
 
         # Validate input
-        if isinstance(x,list):
-            if isinstance(x[0],list):
-                if len(x[0])!=self.n_dim:
-                    print('List does not have correct dimension',
-                          'in nflows_nsf::log_pdf().')
-                    raise ValueError(('List does not have correct '+
-                                      'dimension in nflows_nsf::log_pdf().'))
-                x_trans=self.SS1.transform(x)
-            else:
-                if len(x)!=self.n_dim:
-                    print('Single point (list) does not have correct',
-                          'dimension in nflows_nsf::log_pdf().')
-                    raise ValueError(('Single point (list) does not '+
-                                      'have correct dimension '+
-                                      'in nflows_nsf::log_pdf().'))
-                x_trans=self.SS1.transform([x])
-        else:
-            if len(x.shape)==2:
-                if x.shape[1]!=self.n_dim:
-                    print('Array does not have correct dimension',
-                          'in nflows_nsf::log_pdf().')
-                    raise ValueError(('Array does not have correct '+
-                                      'dimension in nflows_nsf::log_pdf().'))
-                x_trans=self.SS1.transform(x)
-            else:
-                if x.shape[0]!=self.n_dim:
-                    print('Single point (numpy) does not have correct',
-                          'dimension in nflows_nsf::log_pdf().')
-                    raise ValueError(('Single point (numpy) does not '+
-                                      'have correct dimension '+
-                                      'in nflows_nsf::log_pdf().'))
-                x_trans=self.SS1.transform([x])
+        xa=numpy.asarray(x,dtype=numpy.float64)
+        if xa.ndim==1:
+            if xa.shape[0]!=self.n_dim:
+                print('Single point does not have correct',
+                      'dimension in nflows_nsf::log_pdf().')
+                raise ValueError(('Single point does not '+
+                                  'have correct dimension '+
+                                  'in nflows_nsf::log_pdf().'))
+            xa=xa.reshape(1,-1)
+        elif xa.ndim!=2 or xa.shape[1]!=self.n_dim:
+            print('Array does not have correct dimension',
+                  'in nflows_nsf::log_pdf().')
+            raise ValueError(('Array does not have correct '+
+                              'dimension in nflows_nsf::log_pdf().'))
             
         if self.verbose>2:
-            print('x,x_trans:',x,x_trans,type(x_trans))
-        x2=torch.zeros((x_trans.shape[0],
-                        self.n_dim),device=self.device)
-        for j in range(0,x_trans.shape[0]):
-            for i in range(0,self.n_dim):
-                x2[j,i]=x_trans[j,i]
-            
-        res=self.model.log_prob(x2)
-        if self.device!='cpu':
-            res=res.to('cpu')
-        res=res.detach().numpy()
+            print('x,xa:',x,xa,type(xa))
+
+        if chunk_size<=0:
+            chunk_size=self.chunk_size
+        n=xa.shape[0]
+        res=numpy.zeros((n))
+        with torch.no_grad():
+            for i in range(0,n,chunk_size):
+                xs=((xa[i:i+chunk_size]-mean)/scale).astype(
+                    numpy.float32)
+                x2=torch.from_numpy(xs).to(self.device)
+                lp=self.model.log_prob(x2)
+                res[i:i+chunk_size]=lp.cpu().numpy()
         
         if self.verbose>2:
             print(type(res),res)
@@ -42,6 +42,8 @@ from o2sclpy.utils import is_number, arrow, icosphere
 from o2sclpy.utils import length_without_colors, wrap_line, screenify_py
 from o2sclpy.utils import string_equal_dash, latex_to_png
 from o2sclpy.utils import force_string, remove_spaces
+from o2sclpy.utils import ffmpeg_sink, _ffmpeg_output_args, binned_hist
+from o2sclpy.utils import _bin_indices
 from o2sclpy.plot_base import plot_base
 from o2sclpy.yt_plot_base import yt_plot_base
 from o2sclpy.td_plot_base import td_plot_base, o2scl_get_type
@@ -93,7 +95,9 @@ base_list=[
     ["gltf","Produce a GLTF file (experimental)\n\n"+
      "Produce a GLTF file with the current set of 3D objects."+
      "\n\n<file name>\n\n"+
-     "Desc."],
+     "If the file name ends in '.glb', then a single binary "+
+     "GLTF file is written, otherwise a '.gltf' file and a '.bin' "+
+     "file are written."],
     ["image","Documentation for image\n\n"+
      "Plot a png file in a matplotlib window.\n\n"+
      "<png file>\n\n"+
@@ -189,6 +193,7 @@ extra_list=[
     ["int[]","plot1",0],
     ["prob_dens_mdim_amr","plot",0],
     ["size_t[]","plot1",0],
+    ["table","corner",0],
     ["table","errorbar",0],
     ["table","hist-plot",0],
     ["table","hist2d-plot",0],
@@ -217,6 +222,9 @@ extra_list=[
 ]
 
 param_list=[
+    ["blit",("If true, plots, scatter plots, and density plots which "+
+             "are updated using the 'name' kwarg are redrawn using "+
+             "blitting (default False).")],
     ["colbar","If true, den-plot adds a color legend (default False)."],
     ["editor","If true, open the plot editor."],
     ["fig_dict",("Dictionary for figure properties. The default value is "+
@@ -238,6 +246,16 @@ param_list=[
                  "when the first object is added to the plot) in order "+
                  "to have any effect.")],
     ["font","Font scaling for text objects (default 16)."],
+    ["lod_dpi",("Resolution at which plots decimated because of "+
+                "lod_max are indistinguishable from the full plots, "+
+                "or if zero, the larger of the figure and savefig "+
+                "resolutions (default 0).")],
+    ["lod_max",("If greater than zero, plot and scatter decimate data "+
+                "sets with more than this number of points, keeping "+
+                "the minimum and maximum in each pixel for lines and "+
+                "one rasterized point per sub-pixel cell for scatter "+
+                "plots (default 0). The lod kwarg overrides this "+
+                "value for one command.")],
     ["logx","If true, use a logarithmic x-axis (default False)."],
     ["logy","If true, use a logarithmic y-axis (default False)."],
     ["logz","If true, use a logarithmic z-axis (default False)."],
@@ -632,6 +650,181 @@ def table_get_column(amp,name,return_pointer=False):
 
     return col
 
+_kde_fit_cache={}
+"""
+Cache of the fitted :class:`kde_sklearn` objects used by the
+``kde-plot`` and ``kde-2d-plot`` commands, indexed by a hash of the
+data and the KDE keyword arguments
+"""
+
+_kde_grid_cache={}
+"""
+Cache of the KDE values computed by the ``kde-plot`` and
+``kde-2d-plot`` commands, indexed by a hash of the data, the kernel,
+the transformation, the bandwidth, and the evaluation grid
+"""
+
+_kde_cache_max=4
+"""
+The maximum number of entries in each of the KDE caches
+"""
+
+def _kde_cache_store(cache,key,value):
+    """Store ``value`` in ``cache``, removing the oldest entry if
+    the cache is full
+    """
+    if key not in cache and len(cache)>=_kde_cache_max:
+        del cache[next(iter(cache))]
+    cache[key]=value
+    return
+
+_hist_cache={}
+"""
+Cache of the base histograms computed by the ``hist-plot`` and
+``hist2d-plot`` commands, indexed by the key from
+:meth:`o2graph_plotter._hist_key()`
+"""
+
+_hist_cache_max=4
+"""
+The maximum number of entries in the histogram cache
+"""
+
+_quantile_cache={}
+"""
+Cache of the cumulative distributions of table columns used by the
+``corner`` command to compute quantiles, indexed in the same way as
+:data:`_hist_cache`
+"""
+
+_quantile_cache_max=64
+"""
+The maximum number of entries in the quantile cache
+"""
+
+_dpa_state={}
+"""
+The state of the ``den-plot-anim`` frame renderer in the current
+process, set by :func:`_dpa_init()`
+"""
+
+def _dpa_init(fig_bytes,ax_index,arr,index,reverse,n_frames,
+              logz,zset,zlo,zhi,vmin,vmax):
+    """Initialize a ``den-plot-anim`` frame renderer
+
+    This unpickles a copy of the figure, attaches an Agg canvas to it,
+    and stores the figure, the image, and a reference to the tensor
+    data in :data:`_dpa_state`. It is used as the initializer for
+    the processes in the rendering pool. The tensor data ``arr`` is
+    either a numpy array or a tuple of the name, shape and data type
+    of a shared memory block created by :func:`_dpa_frames()`.
+    """
+    import pickle
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    fig=pickle.loads(fig_bytes)
+    FigureCanvasAgg(fig)
+    im=fig.axes[ax_index].images[-1]
+
+    shm=None
+    if isinstance(arr,tuple):
+        from multiprocessing import shared_memory
+        shm=shared_memory.SharedMemory(name=arr[0])
+        arr=numpy.ndarray(arr[1],dtype=arr[2],buffer=shm.buf)
+    
+    _dpa_state.clear()
+    _dpa_state.update({'fig': fig,'im': im,'shm': shm,
+                       'cbar': getattr(im,'colorbar',None),
+                       'arr': arr,'index': index,'reverse': reverse,
+                       'n_frames': n_frames,'logz': logz,'zset': zset,
+                       'zlo': zlo,'zhi': zhi,'vmin': vmin,
+                       'vmax': vmax,'warned': False})
+    return
+
+def _dpa_slice(arr,index,k,logz,zset,zlo,zhi):
+    """Return a copy of slice ``k`` along tensor index ``index`` of
+    ``arr``, transposed for ``imshow()``, with the log and the z
+    range applied, and a flag which is True if a non-positive value
+    was set to zero when taking the log
+    """
+    sl=numpy.take(arr,k,axis=index).transpose()
+    fail_found=False
+    if logz==True:
+        pos=sl>0.0
+        fail_found=not numpy.all(pos)
+        sl=numpy.where(pos,numpy.log10(numpy.where(pos,sl,1.0)),0.0)
+        
+    # If the z range was specified, truncate all values outside
+    # that range (this truncation is done after the application of
+    # the log above)
+    if zset==True:
+        sl=numpy.clip(sl,zlo,zhi)
+    return sl,fail_found
+
+def _dpa_render(k):
+    """Render frame ``k`` of a ``den-plot-anim`` animation using the
+    state in :data:`_dpa_state` and return the RGB pixels as an
+    array of shape ``(height,width,3)``
+    """
+    st=_dpa_state
+    kk=k
+    if st['reverse']==True:
+        kk=st['n_frames']-1-k
+    sl,fail_found=_dpa_slice(st['arr'],st['index'],kk,st['logz'],
+                             st['zset'],st['zlo'],st['zhi'])
+    if fail_found==True and st['warned']==False:
+        print('Failed to take log of values in frame',k,
+              '. Setting points to zero and suppressing future',
+              'warnings.')
+        st['warned']=True
+        
+    st['im'].set_data(sl)
+    vmin=st['vmin']
+    vmax=st['vmax']
+    if vmin is None:
+        vmin=numpy.min(sl)
+    if vmax is None:
+        vmax=numpy.max(sl)
+    st['im'].set_clim(vmin,vmax)
+    if st['cbar'] is not None:
+        st['cbar'].update_normal(st['im'])
+        
+    st['fig'].canvas.draw()
+    buf=numpy.asarray(st['fig'].canvas.buffer_rgba())
+    return numpy.ascontiguousarray(buf[:,:,0:3])
+
+def _dpa_frames(init_args,n_jobs,start_method=None):
+    """Render the ``den-plot-anim`` frames in a pool of ``n_jobs``
+    processes and yield them in order
+
+    The arguments ``init_args`` are those of :func:`_dpa_init()`. The
+    tensor data is copied once to a shared memory block which the
+    processes attach to, so that it is not pickled for each process
+    when the start method (``start_method``, or the default for the
+    platform if it is None) is 'spawn' or 'forkserver'.
+    """
+    import multiprocessing
+    from multiprocessing import shared_memory
+
+    arr=init_args[2]
+    shm=shared_memory.SharedMemory(create=True,size=max(arr.nbytes,1))
+    try:
+        shm_arr=numpy.ndarray(arr.shape,dtype=arr.dtype,buffer=shm.buf)
+        shm_arr[...]=arr
+        del shm_arr
+        shm_args=(init_args[0:2]+((shm.name,arr.shape,arr.dtype.str),)+
+                  init_args[3:])
+        ctx=multiprocessing.get_context(start_method)
+        with ctx.Pool(n_jobs,initializer=_dpa_init,
+                      initargs=shm_args) as pool:
+            for frame in pool.imap(_dpa_render,
+                                   range(0,init_args[5])):
+                yield frame
+    finally:
+        shm.close()
+        shm.unlink()
+    return
+
 class o2graph_plotter(td_plot_base):
     """
     A plotting class for the o2graph script. This class is a child of the
@@ -652,6 +845,15 @@ class o2graph_plotter(td_plot_base):
     Colorbar object
     """
 
+    data_gen=0
+    """The number of ``acol`` commands which have been run, used in
+    the keys of :data:`_hist_cache` and :data:`_quantile_cache`
+
+    Python code which modifies the columns of the current table in
+    place, rather than with an ``acol`` command, should increment
+    this so that the cached histograms are recomputed.
+    """
+
     def __init__(self):
         """
         Desc
@@ -686,6 +888,8 @@ class o2graph_plotter(td_plot_base):
                 line[2]=o2graph_plotter.den_plot_rgb_o2graph.__doc__
             elif line[1]=="den-plot-anim":
                 line[2]=o2graph_plotter.den_plot_anim.__doc__
+            elif line[1]=="corner":
+                line[2]=o2graph_plotter.corner.__doc__
             elif line[1]=="errorbar":
                 line[2]=o2graph_plotter.errorbar.__doc__
             elif line[1]=="hist-plot":
@@ -901,6 +1105,9 @@ class o2graph_plotter(td_plot_base):
             
         amt=acol_manager(amp)
         amt.parse_vec_string(vs)
+
+        # The command may have modified or replaced the table
+        self.data_gen+=1
         
         # End of function o2graph_plotter::gen_acol()
         return
@@ -958,28 +1165,26 @@ class o2graph_plotter(td_plot_base):
         if output[-4:]!='.mp4':
             output=output+'.mp4'
 
-        # See https://trac.ffmpeg.org/wiki/StreamingGuide. The x264
-        # video codec and yuv420p pixel format are recommended for
-        # wide compatibility.
-        
         # -y means overwrite output without asking
         # -r 10 means set the framerate to 10 frames per second
-
-        # The Constant Rate Factor (CRF) is the default quality (and
-        # rate control) setting for the x264 and x265 encoders.
-        # See https://trac.ffmpeg.org/wiki/Encode/H.264
             
-        cmd=('ffmpeg -y -r '+str(fps)+' -f image2 -i '+pattern+
-             ' -vcodec libx264')
-        if vf!='':
-            cmd=cmd+' -vf '+vf
+        import subprocess
+        
+        cmd=['ffmpeg','-y','-r',str(fps),'-f','image2','-i',pattern]
         if loop==True:
-            cmd=cmd+' -stream_loop -1'
-            
-        cmd=cmd+' -crf 25 -pix_fmt yuv420p '+output
+            cmd=cmd+['-stream_loop','-1']
+        cmd=cmd+_ffmpeg_output_args(output,vf)
         
-        print('o2graph_plottter::mp4(): Executing "'+cmd+'".')
-        os.system(cmd)
+        print('o2graph_plottter::mp4(): Executing "'+' '.join(cmd)+'".')
+        try:
+            ret=subprocess.run(cmd).returncode
+        except FileNotFoundError:
+            print('o2graph_plotter::mp4(): Could not find ffmpeg.')
+            return 2
+        if ret!=0:
+            print('o2graph_plotter::mp4(): ffmpeg failed with return',
+                  'code',ret,'.')
+            return 1
         
         return 0
         
@@ -1605,10 +1810,12 @@ class o2graph_plotter(td_plot_base):
         Command-line arguments: ``<prefix>``
 
         Write a GLTF file from 3D objects to the file called
-        ``prefix.gltf``. The user should consider modifying the
-        working directory for 3D objects first, using ``-set td_wdir
-        <dir>``. This command only constructs the GLTF file and thus
-        does not require Blender.
+        ``prefix.gltf``, with the binary data in ``prefix.bin``. If
+        the prefix ends in ``.glb``, then a single binary GLTF file
+        called ``prefix`` is written instead. The user should
+        consider modifying the working directory for 3D objects
+        first, using ``-set td_wdir <dir>``. This command only
+        constructs the GLTF file and thus does not require Blender.
         """
         prefix=args[0]
         if len(args)>=2:
@@ -1683,6 +1890,14 @@ class o2graph_plotter(td_plot_base):
         Command-line arguments: ``<column patterns>
         <kwargs or "None">``
 
+        Compute the t-SNE embedding of the columns matching the
+        patterns and store it in new columns. Useful kwargs are
+        n_components=2, perplexity=30, method='auto' (or 'exact',
+        'barnes_hut', or 'fft'), n_jobs=1, out_prefix='tsne_',
+        cache=True, and cache_dir=''. The embedding is cached, so
+        repeating the command with the same columns and parameters
+        (for example after changing the plot style) does not
+        recompute it.
         """
         curr_type=o2scl_get_type(amp)
         
@@ -1732,6 +1947,107 @@ class o2graph_plotter(td_plot_base):
         # End of function o2graph_plotter::tsne()
         return
     
+    def _kde_grid(self,x,grids,kde_opts):
+        """Return the KDE of the data in ``x``, an array of shape
+        ``(n_samples,n_dim)``, on the mesh defined by the list
+        ``grids`` of one-dimensional arrays
+
+        The :class:`kde_sklearn` object is fit using the keyword
+        arguments in the string ``kde_opts``. The fitted object and
+        the result are stored in :data:`_kde_fit_cache` and
+        :data:`_kde_grid_cache`.
+        """
+        import hashlib
+
+        h=hashlib.sha256()
+        h.update(numpy.ascontiguousarray(x,dtype=numpy.float64).tobytes())
+        h.update(str(numpy.shape(x)).encode())
+        data_hash=h.hexdigest()
+
+        fit_key=(data_hash,kde_opts)
+        if fit_key in _kde_fit_cache:
+            k=_kde_fit_cache[fit_key]
+            if self.verbose>1:
+                print('o2graph_plotter::_kde_grid(): Using cached KDE.')
+        else:
+            # Use sklearn and a reasonable guess for the bandwidth,
+            # between 1.0e-2 and 1.0e+2. Note that the KDE is
+            # rescaled by default. 
+            k=kde_sklearn()
+            bw_array=[10**(float(i)/4.0-2.0) for i in range(0,17)]
+            k.set_data_str(x,bw_array,kde_opts)
+            _kde_cache_store(_kde_fit_cache,fit_key,k)
+
+        grid_key=(data_hash,k.kernel,k.transform,
+                  float(k.get_bandwidth()),
+                  tuple((float(g[0]),float(g[-1]),len(g)) for g in grids))
+        if grid_key in _kde_grid_cache:
+            if self.verbose>1:
+                print('o2graph_plotter::_kde_grid(): Using cached',
+                      'grid.')
+            return _kde_grid_cache[grid_key]
+        
+        res=k.pdf_grid(grids)
+        _kde_cache_store(_kde_grid_cache,grid_key,res)
+        return res
+    
+    def _hist_key(self,cols,names):
+        """Return a key for :data:`_hist_cache` and
+        :data:`_quantile_cache` for the one-dimensional arrays in
+        ``cols`` with the column names in ``names``
+
+        The key contains the column names, the number of rows, the
+        address and stride of the memory of each column, and
+        :py:attr:`data_gen`. Table columns are views of the memory in
+        the O2scl table, and every ``acol`` command increments
+        :py:attr:`data_gen`, so the key changes whenever a command
+        modifies or replaces the table. Computing the key does not
+        read the data, so rebinning a cached histogram takes a time
+        which is independent of the number of rows. The trade-off is
+        that a change to the data in place by Python code is not
+        detected unless that code increments :py:attr:`data_gen`.
+        The arrays are stored with the cached result by
+        :meth:`_hist_counts()` and :meth:`_column_quantiles()`, so
+        that their memory cannot be reused by other arrays while the
+        key is in the cache.
+        """
+        addr=tuple((c.__array_interface__['data'][0],c.strides)
+                   for c in cols)
+        return (tuple(names),len(cols[0]),addr,self.data_gen)
+    
+    def _hist_counts(self,cols,names,n_bins):
+        """Return the counts and the bin edges for a histogram of the
+        one-dimensional arrays in ``cols`` with ``n_bins`` bins in
+        each dimension
+
+        The base histogram is stored in :data:`_hist_cache`, indexed
+        by the key from :meth:`_hist_key()`, so later calls with a
+        different number of bins do not need to bin the data again.
+        """
+        cols=[numpy.asarray(c) for c in cols]
+        key=self._hist_key(cols,names)
+
+        if key in _hist_cache:
+            bh=_hist_cache[key][0]
+            if self.verbose>1:
+                print('o2graph_plotter::_hist_counts(): Using cached',
+                      'base histogram.')
+        else:
+            bh=binned_hist(n_dim=len(cols),n_jobs=-1,verbose=self.verbose)
+            bh.fill(*cols)
+            if key not in _hist_cache and len(_hist_cache)>=_hist_cache_max:
+                del _hist_cache[next(iter(_hist_cache))]
+            _hist_cache[key]=(bh,cols)
+
+        if bh.can_rebin(n_bins):
+            return bh.rebin(n_bins)
+        
+        # If the number of bins does not divide the base histogram,
+        # then bin the data again with the same limits
+        bh2=binned_hist(n_dim=len(cols),n_base=n_bins,n_jobs=-1)
+        bh2.fill(*cols,lo=bh.lo,hi=bh.hi)
+        return bh2.rebin(n_bins)
+    
     def kde_plot(self,amp,args):
         """Documentation for o2graph command ``kde-plot``:
 
@@ -1760,6 +2076,10 @@ class o2graph_plotter(td_plot_base):
         transform='unit', and bandwidth='none'. The bandwidth can be
         either 'scott', 'silverman' or a floating point number.
 
+        The KDE is evaluated on the full grid at once, using an FFT
+        of the binned data for the Gaussian kernel. The fitted KDE and
+        the result are cached, so repeating the command with the same
+        column and KDE kwargs does not refit or reevaluate the KDE.
         """
         curr_type=o2scl_get_type(amp)
 
@@ -1769,9 +2089,8 @@ class o2graph_plotter(td_plot_base):
             tab=amt.get_table_obj()
 
             # Copy the table data to a 2D numpy array
-            x=numpy.zeros((tab.get_nlines(),1))
-            for i in range(0,tab.get_nlines()):
-                x[i,0]=tab.get(args[0],i)
+            x=numpy.array(tab[force_bytes(args[0])][0:tab.get_nlines()],
+                          dtype=numpy.float64).reshape(-1,1)
 
             # Set defaults
             x_min=0
@@ -1803,13 +2122,8 @@ class o2graph_plotter(td_plot_base):
             if x_min>=x_max:
                 if self.xset==False:
                     # Determine min and max of data
-                    x_min=x[0,0]
-                    x_max=x[0,0]
-                    for i in range(1,tab.get_nlines()):
-                        if x[i,0]<x_min:
-                            x_min=x[i,0]
-                        if x[i,0]>x_max:
-                            x_max=x[i,0]
+                    x_min=numpy.min(x[:,0])
+                    x_max=numpy.max(x[:,0])
                 else:
                     x_min=self.xlo
                     x_max=self.xhi
@@ -1820,26 +2134,12 @@ class o2graph_plotter(td_plot_base):
                        '%7.6e %7.6e %d %7.6e') % (x_min,x_max,n_points,
                                                   y_mult))
 
-            # Use sklearn and a reasonable guess for the bandwidth,
-            # between 1.0e-2 and 1.0e+2. Note that the KDE is
-            # rescaled by default. 
-            k=kde_sklearn()
-            bw_array=[10**(float(i)/4.0-2.0) for i in range(0,17)]
-
-            # Set the KDE
+            # Use the KDE to create x and y-arrays
+            xa=numpy.linspace(x_min,x_max,n_points)
+            kde_opts=''
             if len(args)>=3:
-                k.set_data_str(x,bw_array,args[2])
-            else:
-                k.set_data_str(x,bw_array,'')
-
-            # Use the new KDE to create x and y-arrays
-            xa=[]
-            ya=[]
-            xp=x_min
-            for i in range(0,n_points):
-                xa.append(xp)
-                ya.append(k.pdf([xp])*y_mult)
-                xp=xp+(x_max-x_min)/float(n_points-1)
+                kde_opts=args[2]
+            ya=self._kde_grid(x,[xa],kde_opts)*y_mult
 
             # Plot
             if len(args)<2:
@@ -1881,7 +2181,9 @@ class o2graph_plotter(td_plot_base):
         multiplied by y_mult before plotting.
 
         Useful KDE kwargs are kernel='gaussian', metric='euclidean',
-        transform='unit', and bandwidth='none'.
+        transform='unit', and bandwidth='none'. As for ``kde-plot``,
+        the KDE is evaluated on the full grid at once and the result
+        is cached.
         """
         curr_type=o2scl_get_type(amp)
 
@@ -1891,10 +2193,9 @@ class o2graph_plotter(td_plot_base):
             tab=amt.get_table_obj()
 
             # Copy the table data to a numpy array
-            x=numpy.zeros((tab.get_nlines(),2))
-            for i in range(0,tab.get_nlines()):
-                x[i,0]=tab.get(args[0],i)
-                x[i,1]=tab.get(args[1],i)
+            nlines=tab.get_nlines()
+            x=numpy.column_stack((tab[force_bytes(args[0])][0:nlines],
+                                  tab[force_bytes(args[1])][0:nlines]))
 
             # Set defaults
             x_min=0
@@ -1926,13 +2227,8 @@ class o2graph_plotter(td_plot_base):
             if x_min>=x_max:
                 if self.xset==False:
                     # Determine min and max of data
-                    x_min=x[0,0]
-                    x_max=x[0,0]
-                    for i in range(1,tab.get_nlines()):
-                        if x[i,0]<x_min:
-                            x_min=x[i,0]
-                        if x[i,0]>x_max:
-                            x_max=x[i,0]
+                    x_min=numpy.min(x[:,0])
+                    x_max=numpy.max(x[:,0])
                 else:
                     x_min=self.xlo
                     x_max=self.xhi
@@ -1940,13 +2236,8 @@ class o2graph_plotter(td_plot_base):
             if y_min>=y_max:
                 if self.yset==False:
                     # Determine min and max of data
-                    y_min=x[0,1]
-                    y_max=x[0,1]
-                    for i in range(1,tab.get_nlines()):
-                        if x[i,1]<y_min:
-                            y_min=x[i,1]
-                        if x[i,1]>y_max:
-                            y_max=x[i,1]
+                    y_min=numpy.min(x[:,1])
+                    y_max=numpy.max(x[:,1])
                 else:
                     y_min=self.ylo
                     y_max=self.yhi
@@ -1957,28 +2248,12 @@ class o2graph_plotter(td_plot_base):
                        '%7.6e %7.6e\n  %7.6e %7.6e %d %7.6e') %
                       (x_min,x_max,y_min,y_max,n_points,z_mult))
 
-            k=kde_sklearn()
-            bw_array=[10**(float(i)/4.0-2.0) for i in range(0,17)]
-
-            if len(args)>4:
-                k.set_data_str(x,bw_array,args[3])
-            else:
-                k.set_data_str(x,bw_array,'')
-
-            x0a=[]
-            x0p=x_min
-            for i in range(0,n_points):
-                x0a.append(x0p)
-                x0p=x0p+(x_max-x_min)/float(n_points-1)
-            x1a=[]
-            x1p=y_min
-            for i in range(0,n_points):
-                x1a.append(x1p)
-                x1p=x1p+(y_max-y_min)/float(n_points-1)
-            z=numpy.zeros((n_points,n_points))
-            for i in range(0,n_points):
-                for j in range(0,n_points):
-                    z[i,j]=k.pdf([x0a[i],x1a[j]])*z_mult
+            x0a=numpy.linspace(x_min,x_max,n_points)
+            x1a=numpy.linspace(y_min,y_max,n_points)
+            kde_opts=''
+            if len(args)>=4:
+                kde_opts=args[3]
+            z=self._kde_grid(x,[x0a,x1a],kde_opts)*z_mult
 
             if len(args)<3:
                 self.den_plot([x0a,x1a,z])
@@ -2016,6 +2291,13 @@ class o2graph_plotter(td_plot_base):
         for information and keyword arguments. This command does not
         yet support the matplotlib format parameter.
 
+        If the kwarg name is given, for example "name=chain", and a
+        line with that name was already plotted in the current
+        figure, then the data in that line is replaced instead of
+        creating a new line. The same kwarg is supported by the
+        scatter and den-plot commands. If the parameter blit is
+        true, the updated lines are redrawn using blitting.
+
         For objects of type ``vec_vec_double``:
 
         Plot one or two columns.
@@ -2561,9 +2843,12 @@ class o2graph_plotter(td_plot_base):
         Command-line arguments: ``<col> [kwargs]``
 
         For a table, create a histogram plot from the specified
-        column. This command uses matplotlib to construct the
-        histogram rather than using O2scl to create a histogram
-        object. Some useful kwargs are bins, color, edgecolor(ec),
+        column. This command uses matplotlib to plot the histogram
+        rather than using O2scl to create a histogram object. When
+        bins is an integer, the counts are computed from a fine base
+        histogram which is cached, so that replotting the same column
+        with a different number of bins does not require binning the
+        data again. Some useful kwargs are bins, color, edgecolor(ec),
         facecolor (fc), fill, hatch, and zorder. This command uses the
         matplotlib hist() function, see
         https://matplotlib.org/stable/api/_as_gen/matplotlib.pyplot.hist.html
@@ -2606,10 +2891,22 @@ class o2graph_plotter(td_plot_base):
         
                 if self.canvas_flag==False:
                     self.canvas()
-                if len(args)<2:
-                    self.axes.hist(xv)
+                dct={}
+                if len(args)>=2:
+                    dct=string_to_dict(args[1])
+                    
+                # Compute the counts with binned_hist unless the bins,
+                # range, or weights are specified in a way which
+                # requires matplotlib
+                import matplotlib
+                bins=dct.pop('bins',matplotlib.rcParams['hist.bins'])
+                if (isinstance(bins,int) and 'range' not in dct and
+                    'weights' not in dct):
+                    counts,edges=self._hist_counts([xv],[args[0]],bins)
+                    self.axes.hist(edges[0][:-1],bins=edges[0],
+                                   weights=counts,**dct)
                 else:
-                    self.axes.hist(xv,**string_to_dict(args[1]))
+                    self.axes.hist(xv,bins=bins,**dct)
 
         elif curr_type==b'hist':
                     
@@ -2662,8 +2959,10 @@ class o2graph_plotter(td_plot_base):
         Command-line arguments: ``<col x> <col y> [kwargs]``
 
         Create a 2D histogram plot from the specified columns. This
-        command uses matplotlib to construct the histogram rather than
-        using O2scl to create a hist object.
+        command uses matplotlib to plot the histogram rather than
+        using O2scl to create a hist object. As for ``hist-plot``,
+        when bins is an integer the counts are computed from a cached
+        base histogram.
         """
 
         import matplotlib.pyplot as plot
@@ -2683,11 +2982,27 @@ class o2graph_plotter(td_plot_base):
         
                 if self.canvas_flag==False:
                     self.canvas()
-                if len(args)<3:
-                    c,x,y,self.last_image=self.axes.hist2d(xv,yv)
+                dct={}
+                if len(args)>=3:
+                    dct=string_to_dict(args[2])
+
+                # Compute the counts with binned_hist unless the bins,
+                # range, or weights are specified in a way which
+                # requires matplotlib
+                bins=dct.pop('bins',10)
+                if (isinstance(bins,int) and 'range' not in dct and
+                    'weights' not in dct):
+                    counts,edges=self._hist_counts([xv,yv],
+                                                   [args[0],args[1]],bins)
+                    xc=(edges[0][:-1]+edges[0][1:])/2.0
+                    yc=(edges[1][:-1]+edges[1][1:])/2.0
+                    xm,ym=numpy.meshgrid(xc,yc,indexing='ij')
+                    c,x,y,self.last_image=self.axes.hist2d(
+                        xm.ravel(),ym.ravel(),bins=edges,
+                        weights=counts.ravel(),**dct)
                 else:
-                    c,x,y,self.last_image=self.axes.hist2d(xv,yv,
-                                                           **string_to_dict(args[2]))
+                    c,x,y,self.last_image=self.axes.hist2d(xv,yv,bins=bins,
+                                                           **dct)
                 
                 if self.colbar==True:
                     cbar=plot.colorbar(self.last_image,ax=self.axes)
@@ -2709,6 +3024,243 @@ class o2graph_plotter(td_plot_base):
         # End of function o2graph_plotter::hist2d_plot()
         return
                                  
+    def _column_quantiles(self,col,name,qs):
+        """Return the quantiles ``qs`` of the finite values in the
+        one-dimensional array ``col`` from the table column ``name``
+
+        The quantiles are interpolated from the cumulative
+        distribution of a :class:`binned_hist` base histogram, which
+        is stored in :data:`_quantile_cache`, so they are accurate to
+        a small fraction of the range of the data.
+        """
+        col=numpy.asarray(col)
+        key=self._hist_key([col],[name])
+        if key in _quantile_cache:
+            lo,hi,cdf=_quantile_cache[key][0:3]
+        else:
+            bh=binned_hist()
+            bh.fill(col)
+            cdf=numpy.concatenate(([0.0],numpy.cumsum(bh.counts)))
+            if cdf[-1]>0:
+                cdf/=cdf[-1]
+            lo=bh.lo[0]
+            hi=bh.hi[0]
+            if (key not in _quantile_cache and
+                len(_quantile_cache)>=_quantile_cache_max):
+                del _quantile_cache[next(iter(_quantile_cache))]
+            _quantile_cache[key]=(lo,hi,cdf,col)
+        return numpy.interp(qs,cdf,numpy.linspace(lo,hi,len(cdf)))
+    
+    def corner(self,amp,input_col_patterns,kwarg_str):
+        """Documentation for o2graph command ``corner``:
+
+        For objects of type ``table``:
+
+        Create a corner plot of several columns
+
+        Command-line arguments: ``<column patterns> <kwargs or
+        "None">``
+
+        Create a new figure with a triangle of panels showing the
+        one-dimensional histogram of each column which matches one of
+        the patterns along the diagonal, and the two-dimensional
+        histogram of each pair of columns below the diagonal. The
+        histograms of all of the panels are computed in a single pass
+        over the rows of the table, in chunks of chunk_size rows,
+        with the panels of each chunk computed in a pool of n_jobs
+        threads (one per core if n_jobs is -1).
+
+        The kwargs are bins=40, the number of bins in each dimension,
+        range_q=0, which, if nonzero, limits the range of each column
+        to the range between the quantiles range_q and 1-range_q,
+        smooth=0, the width in bins of a Gaussian used to smooth the
+        histograms, show_q=True, which shows the 16%, 50% and 84%
+        quantiles of each column as dashed lines, cmap='Greys',
+        chunk_size=262144, and n_jobs=-1. The quantiles are computed
+        from cached cumulative distributions, so repeated corner
+        plots of the same columns do not need to recompute them.
+        """
+        curr_type=o2scl_get_type(amp)
+
+        if curr_type!=b'table':
+            print("Command 'corner' not supported for type",
+                  curr_type,".")
+            return
+        
+        amt=acol_manager(amp)
+        tab=amt.get_table_obj()
+
+        dct=string_to_dict2(kwarg_str,list_of_ints=['bins','chunk_size',
+                                                    'n_jobs'],
+                            list_of_floats=['range_q','smooth'],
+                            list_of_bools=['show_q'])
+        bins=dct.pop('bins',40)
+        range_q=dct.pop('range_q',0.0)
+        smooth=dct.pop('smooth',0.0)
+        show_q=dct.pop('show_q',True)
+        cmap=dct.pop('cmap','Greys')
+        chunk_size=dct.pop('chunk_size',262144)
+        n_jobs=dct.pop('n_jobs',-1)
+        if len(dct)>0:
+            print('o2graph_plotter::corner(): Ignoring unknown kwargs',
+                  list(dct.keys()),'.')
+
+        import fnmatch
+        
+        names=[]
+        for i in range(0,tab.get_ncolumns()):
+            found=False
+            for j in range(0,len(input_col_patterns)):
+                if fnmatch.fnmatch(tab.get_column_name(i),
+                                   force_bytes(input_col_patterns[j])):
+                    found=True
+            if found==True:
+                names.append(tab.get_column_name(i))
+        n_cols=len(names)
+        if n_cols==0:
+            print('o2graph_plotter::corner(): No columns matched.')
+            return
+        
+        nlines=tab.get_nlines()
+        cols=[tab[name][0:nlines] for name in names]
+        self._corner_plot(names,cols,bins,range_q,smooth,show_q,cmap,
+                          chunk_size,n_jobs)
+        
+        # End of function o2graph_plotter::corner()
+        return
+
+    def _corner_plot(self,names,cols,bins=40,range_q=0.0,smooth=0.0,
+                     show_q=True,cmap='Greys',chunk_size=262144,
+                     n_jobs=-1):
+        """Create the corner plot for :meth:`corner()` from the
+        one-dimensional arrays in ``cols`` with the column names in
+        ``names``
+        """
+        import matplotlib.pyplot as plot
+
+        n_cols=len(cols)
+        nlines=len(cols[0])
+        
+        # Determine the range of each column, and the quantiles to
+        # plot, from the cached cumulative distributions
+        lo=[]
+        hi=[]
+        qv=[]
+        for k in range(0,n_cols):
+            q=self._column_quantiles(cols[k],names[k],
+                                     [range_q,0.16,0.5,0.84,1.0-range_q])
+            lo.append(q[0])
+            hi.append(q[4])
+            if hi[k]<=lo[k]:
+                lo[k]-=0.5
+                hi[k]+=0.5
+            qv.append(q[1:4])
+            
+        if self.verbose>0:
+            print('o2graph_plotter::corner(): Computing',n_cols,
+                  'one-dimensional and',n_cols*(n_cols-1)//2,
+                  'two-dimensional histograms from',nlines,'rows.')
+
+        # Compute all of the histograms in one pass over the rows.
+        # The bin index of each column is computed once per chunk and
+        # shared by all of the panels which use that column. Points
+        # outside the range go in an extra bin which is removed at
+        # the end.
+        nb=bins+1
+        pairs=[(i,j) for i in range(1,n_cols) for j in range(0,i)]
+        h1=[numpy.zeros(nb) for k in range(0,n_cols)]
+        h2={pair: numpy.zeros(nb*nb) for pair in pairs}
+        
+        from concurrent.futures import ThreadPoolExecutor
+        
+        if n_jobs<=0:
+            n_jobs=os.cpu_count()
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            for start in range(0,nlines,chunk_size):
+                
+                def index_one(k):
+                    ix=_bin_indices(cols[k][start:start+chunk_size],
+                                    lo[k],hi[k],bins)
+                    h1[k]+=numpy.bincount(ix,minlength=nb)
+                    return ix
+                
+                ix=list(pool.map(index_one,range(0,n_cols)))
+                ixm=[v*nb for v in ix]
+                
+                def pair_one(pair):
+                    i,j=pair
+                    h2[pair]+=numpy.bincount(ixm[j]+ix[i],
+                                             minlength=nb*nb)
+                    return
+                
+                list(pool.map(pair_one,pairs))
+
+        hist1=[h[0:bins] for h in h1]
+        hist2={pair: h2[pair].reshape(nb,nb)[0:bins,0:bins]
+               for pair in pairs}
+        if smooth>0:
+            from scipy.ndimage import gaussian_filter
+            hist1=[gaussian_filter(h,smooth) for h in hist1]
+            hist2={pair: gaussian_filter(hist2[pair],smooth)
+                   for pair in pairs}
+
+        # Create the figure with canvas(), and then replace its axes
+        # with a grid of panels which fills the same area
+        self.canvas()
+        pos=self.axes.get_position()
+        self.fig.delaxes(self.axes)
+        del self.axes_dict['main']
+        gs=self.fig.add_gridspec(n_cols,n_cols,left=pos.x0,right=pos.x1,
+                                 bottom=pos.y0,top=pos.y1,wspace=0.05,
+                                 hspace=0.05)
+        axs=gs.subplots(squeeze=False)
+
+        def label(name):
+            lab=force_string(name)
+            if plot.rcParams['text.usetex']==True:
+                lab=lab.replace('_',r'\_')
+            return lab
+        
+        for i in range(0,n_cols):
+            for j in range(0,n_cols):
+                ax=axs[i][j]
+                if j>i:
+                    ax.set_visible(False)
+                    continue
+                if i==j:
+                    edges=numpy.linspace(lo[i],hi[i],bins+1)
+                    ax.stairs(hist1[i],edges,color='black')
+                    if show_q==True:
+                        for v in qv[i]:
+                            ax.axvline(v,color='black',ls='--',lw=0.5)
+                    ax.set_ylim(0,numpy.max(hist1[i])*1.1+1.0e-300)
+                    ax.set_yticks([])
+                else:
+                    ax.imshow(hist2[(i,j)].transpose(),origin='lower',
+                              extent=(lo[j],hi[j],lo[i],hi[i]),
+                              aspect='auto',cmap=cmap,
+                              interpolation='nearest')
+                    ax.set_ylim(lo[i],hi[i])
+                ax.set_xlim(lo[j],hi[j])
+                ax.tick_params(labelsize=self.font*0.5)
+                if i==n_cols-1:
+                    ax.set_xlabel(label(names[j]),fontsize=self.font*0.6)
+                    for tl in ax.get_xticklabels():
+                        tl.set_rotation(45)
+                else:
+                    ax.set_xticklabels([])
+                if j==0 and i>0:
+                    ax.set_ylabel(label(names[i]),fontsize=self.font*0.6)
+                elif i!=j:
+                    ax.set_yticklabels([])
+                self.axes_dict['corner_'+str(i)+'_'+str(j)]=ax
+
+        self.axes=axs[n_cols-1][0]
+        self.canvas_flag=True
+        
+        # End of function o2graph_plotter::_corner_plot()
+        return
+    
     def errorbar(self,amp,args):
         """Documentation for o2graph command ``errorbar``:
 
@@ -3129,7 +3681,11 @@ class o2graph_plotter(td_plot_base):
         print(' ')
         for line in param_list:
             if line[0]!='verbose':
-                if line[0]=='colbar':
+                if line[0]=='blit':
+                    print(force_string(amt.get_param_color())+line[0]+
+                          force_string(amt.get_default_color())+' '+
+                          str(self.blit))
+                elif line[0]=='colbar':
                     print(force_string(amt.get_param_color())+line[0]+
                           force_string(amt.get_default_color())+' '+
                           str(self.colbar))
@@ -3141,6 +3697,14 @@ class o2graph_plotter(td_plot_base):
                     print(force_string(amt.get_param_color())+line[0]+
                           force_string(amt.get_default_color())+' '+
                           str(self.font))
+                elif line[0]=='lod_dpi':
+                    print(force_string(amt.get_param_color())+line[0]+
+                          force_string(amt.get_default_color())+' '+
+                          str(self.lod_dpi))
+                elif line[0]=='lod_max':
+                    print(force_string(amt.get_param_color())+line[0]+
+                          force_string(amt.get_default_color())+' '+
+                          str(self.lod_max))
                 elif line[0]=='logx':
                     print(force_string(amt.get_param_color())+line[0]+
                           force_string(amt.get_default_color())+' '+
@@ -3545,6 +4109,13 @@ class o2graph_plotter(td_plot_base):
         corresponds to the largest value of the grid for the
         associated index.
 
+        In addition to the kwargs for imshow(), the kwargs n_jobs=1,
+        fps=10, and vf='' are allowed. The frames are rendered with
+        the Agg backend in a pool of ``n_jobs`` processes (one per
+        core if ``n_jobs`` is -1) and piped directly into ffmpeg
+        at ``fps`` frames per second, with ``vf`` as an optional
+        ffmpeg video filter.
+
         Experimental.
 
         This command requires the installation of ``ffmpeg``. 
@@ -3612,6 +4183,9 @@ class o2graph_plotter(td_plot_base):
             if len(args)>=5:
                 kwstring=args[4]
             dctt=string_to_dict(kwstring)
+            n_jobs=int(dctt.pop('n_jobs',1))
+            fps=int(dctt.pop('fps',10))
+            vf=dctt.pop('vf','')
                 
             if n_frames>9999:
                 print('Large number of frames (',n_frames,') not',
@@ -3672,137 +4246,95 @@ class o2graph_plotter(td_plot_base):
                 for i in range(0,len(ygrid)):
                     ygrid[i]=math.log(ygrid[i],10)
 
-            for k in range(0,n_frames):
-                if args[2]=='0':
-                    sl=arr[k,:,:]
-                elif args[2]=='0r':
-                    sl=arr[n_frames-1-k,:,:]
-                elif args[2]=='1':
-                    sl=arr[:,k,:]
-                elif args[2]=='0r':
-                    sl=arr[:,n_frames-1-k,:]
-                elif args[2]=='2':
-                    sl=arr[:,:,k]
-                elif args[2]=='2r':
-                    sl=arr[:,:,n_frames-1-k]
-                sl=sl.transpose()
- 
-                if self.logz==True:
-                    fail_found=False
-                    for i in range(0,len(ygrid)):
-                        for j in range(0,len(xgrid)):
-                            if sl[i][j]>0.0:
-                                sl[i][j]=math.log10(sl[i][j])
-                            else:
-                                if fail_found==False:
-                                    print('Failed to take log of',sl[i][j],
-                                          'at (i,j)=(',j,',',i,') or (',
-                                          xgrid[j],',',ygrid[i],
-                                          '). Setting point to zero and',
-                                          'suppressing future warnings.')
-                                fail_found=True
-                                sl[i][j]=0.0
-                                
-                # If the z range was specified, truncate all values
-                # outside that range (this truncation is done after
-                # the application of the log above)
-                if self.zset==True:
-                    for i in range(0,ny2):
-                        for j in range(0,nx2):
-                            if sl[i][j]>self.zhi:
-                                sl[i][j]=self.zhi
-                            elif sl[i][j]<self.zlo:
-                                sl[i][j]=self.zlo
-                            
-                diffs_x=[xgrid[i+1]-xgrid[i] for i in range(0,len(xgrid)-1)]
-                mean_x=numpy.mean(diffs_x)
-                std_x=numpy.std(diffs_x)
-                diffs_y=[ygrid[i+1]-ygrid[i] for i in range(0,len(ygrid)-1)]
-                mean_y=numpy.mean(diffs_y)
-                std_y=numpy.std(diffs_y)
+            diffs_x=[xgrid[i+1]-xgrid[i] for i in range(0,len(xgrid)-1)]
+            mean_x=numpy.mean(diffs_x)
+            std_x=numpy.std(diffs_x)
+            diffs_y=[ygrid[i+1]-ygrid[i] for i in range(0,len(ygrid)-1)]
+            mean_y=numpy.mean(diffs_y)
+            std_y=numpy.std(diffs_y)
             
-                if std_x/mean_x>1.0e-4 or std_x/mean_x>1.0e-4:
-                    print('Warning in o2graph::o2graph_plotter::'+
-                          'den_plot_anim():')
-                    print('  Nonlinearity of x or y grid is greater than '+
-                          '10^{-4}.')
-                    print('  Value of std(diff_x)/mean(diff_x): %7.6e .' %
-                          (std_x/mean_x))
-                    print('  Value of std(diff_y)/mean(diff_y): %7.6e .' %
-                          (std_y/mean_y))
-                    print('  The density plot may not be properly scaled.')
+            if std_x/mean_x>1.0e-4 or std_x/mean_x>1.0e-4:
+                print('Warning in o2graph::o2graph_plotter::'+
+                      'den_plot_anim():')
+                print('  Nonlinearity of x or y grid is greater than '+
+                      '10^{-4}.')
+                print('  Value of std(diff_x)/mean(diff_x): %7.6e .' %
+                      (std_x/mean_x))
+                print('  Value of std(diff_y)/mean(diff_y): %7.6e .' %
+                      (std_y/mean_y))
+                print('  The density plot may not be properly scaled.')
                 
-                tmp1=xgrid[0]-(xgrid[1]-xgrid[0])/2
-                tmp2=xgrid[nx2-1]+(xgrid[nx2-1]-xgrid[nx2-2])/2
-                tmp3=ygrid[0]-(ygrid[1]-ygrid[0])/2
-                tmp4=ygrid[ny2-1]+(ygrid[ny2-1]-ygrid[ny2-2])/2
+            tmp1=xgrid[0]-(xgrid[1]-xgrid[0])/2
+            tmp2=xgrid[nx2-1]+(xgrid[nx2-1]-xgrid[nx2-2])/2
+            tmp3=ygrid[0]-(ygrid[1]-ygrid[0])/2
+            tmp4=ygrid[ny2-1]+(ygrid[ny2-1]-ygrid[ny2-2])/2
+
+            # Create the image and colorbar once, using the last
+            # frame, and then update only the image data for each
+            # frame
+            index=int(args[2][0])
+            reverse=(args[2][-1:]=='r')
+            k_last=n_frames-1
+            if reverse==True:
+                k_last=0
+            sl,fail_found=_dpa_slice(arr,index,k_last,self.logz,
+                                     self.zset,self.zlo,self.zhi)
+            vmin=None
+            if 'vmin' in dctt:
+                vmin=float(dctt['vmin'])
+                dctt['vmin']=vmin
+            vmax=None
+            if 'vmax' in dctt:
+                vmax=float(dctt['vmax'])
+                dctt['vmax']=vmax
+
+            self.last_image=self.axes.imshow(sl,interpolation='nearest',
+                                             origin='lower',
+                                             extent=[tmp1,tmp2,
+                                                     tmp3,tmp4],
+                                             aspect='auto',**dctt)
                 
-                if k>0:
-                    # It's important to remove the last image and
-                    # colorbar to free up the space. We have to
-                    # remmove the colorbar first, then the image.
-                    if self.colbar==True:
-                        self.cbar.remove()
-                        del self.cbar
-                    self.last_image.remove()
-                    del self.last_image
-                        
-                self.last_image=self.axes.imshow(sl,interpolation='nearest',
-                                                 origin='lower',
-                                                 extent=[tmp1,tmp2,
-                                                         tmp3,tmp4],
-                                                 aspect='auto',**dctt)
+            if self.colbar==True:
+                dpa_cax2=self.fig.add_axes([1.0-rm*0.9,
+                                            bm,rm*0.3,
+                                            1.0-bm-tm])
+                self.cbar=self.fig.colorbar(self.last_image,
+                                            cax=dpa_cax2)
+                self.cbar.ax.tick_params('both',length=6,width=1,
+                                         which='major')
+                self.cbar.ax.tick_params(labelsize=self.font*0.8)
+
                 
-                if self.colbar==True:
-                    dpa_cax2=self.fig.add_axes([1.0-rm*0.9,
-                                                bm,rm*0.3,
-                                                1.0-bm-tm])
-                    self.cbar=self.fig.colorbar(self.last_image,
-                                                cax=dpa_cax2)
-                    self.cbar.ax.tick_params('both',length=6,width=1,
-                                             which='major')
-                    self.cbar.ax.tick_params(labelsize=self.font*0.8)
-                    
-                if n_frames<10:
-                    fname='/tmp/dpa_'+str(k)+'.png'
-                elif n_frames<100:
-                    if k<10:
-                        fname='/tmp/dpa_0'+str(k)+'.png'
-                    else:
-                        fname='/tmp/dpa_'+str(k)+'.png'
-                elif n_frames<1000:
-                    if k<10:
-                        fname='/tmp/dpa_00'+str(k)+'.png'
-                    elif k<100:
-                        fname='/tmp/dpa_0'+str(k)+'.png'
-                    else:
-                        fname='/tmp/dpa_'+str(k)+'.png'
-                elif n_frames<10000:
-                    if k<10:
-                        fname='/tmp/dpa_000'+str(k)+'.png'
-                    elif k<100:
-                        fname='/tmp/dpa_00'+str(k)+'.png'
-                    elif k<1000:
-                        fname='/tmp/dpa_0'+str(k)+'.png'
-                    else:
-                        fname='/tmp/dpa_'+str(k)+'.png'
-                print('Saving to',fname)
-                plot.savefig(fname)
-
-                # End of loop, continue to next frame
-
-            # Now after loop, compile frames into a movie
-            prefix='/tmp/dpa_'
-            suffix='.png'
-            mov_fname=args[3]
-            if n_frames>=1000:
-                self.mp4([prefix+'%04d'+suffix,mov_fname])
-            elif n_frames>=100:
-                self.mp4([prefix+'%03d'+suffix,mov_fname])
-            elif n_frames>=10:
-                self.mp4([prefix+'%02d'+suffix,mov_fname])
+            # The figure is pickled and rendered with the Agg backend
+            # in each process, while the tensor data is shared with
+            # the processes rather than copied to each of them
+            import pickle
+            
+            fig_bytes=pickle.dumps(self.fig)
+            init_args=(fig_bytes,self.fig.axes.index(self.axes),arr,
+                       index,reverse,n_frames,self.logz,self.zset,
+                       self.zlo,self.zhi,vmin,vmax)
+            if n_jobs<=0:
+                n_jobs=os.cpu_count()
+            n_jobs=min(n_jobs,n_frames)
+
+            sink=ffmpeg_sink(args[3],fps=fps,vf=vf,verbose=self.verbose)
+            if n_jobs==1:
+                _dpa_init(*init_args)
+                for k in range(0,n_frames):
+                    if self.verbose>0:
+                        print('o2graph_plotter::den_plot_anim(): Frame',k)
+                    sink.write(_dpa_render(k))
             else:
-                self.mp4([prefix+'%01d'+suffix,mov_fname])
+                k=0
+                for frame in _dpa_frames(init_args,n_jobs):
+                    if self.verbose>0:
+                        print('o2graph_plotter::den_plot_anim():',
+                              'Frame',k)
+                    sink.write(frame)
+                    k=k+1
+            _dpa_state.clear()
+            sink.close()
 
             # End of "if curr_type==b'tensor_grid':"
                 
@@ -5128,15 +5660,44 @@ class o2graph_plotter(td_plot_base):
         # End of function o2graph_plotter::commands()
         return
 
-    def yt_save_annotate(self,amp,fname):
+    def yt_save_annotate(self,amp,fname,sink=None):
         """
         Create a .png image, then add 2D annotations, 
         save to file named 'fname', and then apply any filters
-        
+
+        If ``sink`` is an :class:`ffmpeg_sink` object, then the image
+        is added to that movie. In that case, the image is only
+        written to the file if a filter has been set.
         """
         
         import matplotlib.pyplot as plot
         from yt.visualization._commons import get_canvas
+
+        if sink is not None and self.yt_filter=='':
+
+            # Render to a figure, add the annotations if necessary,
+            # and draw it to an Agg canvas which is sent to ffmpeg
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            
+            self.yt_scene.render()
+            fa=self.yt_scene._show_mpl
+            axt=fa(self.yt_scene._last_render.swapaxes(0,1),
+                   sigma_clip=self.yt_sigma_clip,dpi=100)
+            if len(self.yt_ann)>0:
+                self.yt_trans=self.yt_scene._render_figure.transFigure
+                self.axes=axt.axes
+                self.fig=self.yt_scene._render_figure
+                self.canvas_flag=True
+                self.parse_string_list(self.yt_ann,amp)
+                self.canvas_flag=False
+            fig=self.yt_scene._render_figure
+            fig.set_facecolor('black')
+            fig.subplots_adjust(left=0.0,bottom=0.0,right=1.0,top=1.0)
+            FigureCanvasAgg(fig)
+            if self.verbose>0:
+                print('o2graph:yt-render: Sending frame to ffmpeg.')
+            sink.write_canvas(fig)
+            return
         
         if len(self.yt_ann)==0:
             
@@ -5181,6 +5742,9 @@ class o2graph_plotter(td_plot_base):
 
         # After having saved the image, filter it
         self.filter_image(fname)
+
+        if sink is not None:
+            sink.write_file(fname)
             
         return
 
@@ -5383,9 +5947,10 @@ class o2graph_plotter(td_plot_base):
         Perform the volume rendering. If yt_path is empty, then the
         first argument is the filename. If yt_path is not empty then
         the first argument is a filename pattern containing * where
-        each frame will be stored. If yt_path is not empty and a movie
-        filename is given, then ffmpeg will be used to combine the
-        frames into an mp4 file.
+        each frame will be stored. If yt_path is not empty, then the
+        frames are sent directly to ffmpeg to create an mp4 file, and
+        the frame image files are only created if a filter has been
+        set with ``yt-filter`` or if ``loop`` is True.
 
         The keyword argument ``mov_fname`` specifies the output
         movie file (if an animation is specified with ``yt-path``).
@@ -5429,10 +5994,16 @@ class o2graph_plotter(td_plot_base):
                 n_frames=n_frames+int(self.yt_path[ip][1])
             print(n_frames,'total frames')
 
+            # Send the frames directly to ffmpeg unless the movie
+            # should loop, which requires the image files
+            sink=None
+            if loop==False:
+                sink=ffmpeg_sink(mov_fname,verbose=1)
+
             # Render initial frame
             i_frame=0
             fname2=self._make_fname(prefix,suffix,i_frame,n_frames)
-            self.yt_save_annotate(amp,fname2);
+            self.yt_save_annotate(amp,fname2,sink);
 
             # Loop over all movements
             for ip in range(0,len(self.yt_path)):
@@ -5507,7 +6078,7 @@ class o2graph_plotter(td_plot_base):
                         # Save new frame
                         fname2=self._make_fname(prefix,suffix,
                                                 i_frame,n_frames)
-                        self.yt_save_annotate(amp,fname2);
+                        self.yt_save_annotate(amp,fname2,sink);
                     
                         # End of 'for ifr in range(0,n_frames_move)'
                     
@@ -5547,7 +6118,7 @@ class o2graph_plotter(td_plot_base):
                         # Save new frame
                         fname2=self._make_fname(prefix,suffix,
                                                 i_frame,n_frames)
-                        self.yt_save_annotate(amp,fname2);
+                        self.yt_save_annotate(amp,fname2,sink);
                         
                         # End of 'for ifr in range(0,n_frames_move)'
 
@@ -5608,7 +6179,7 @@ class o2graph_plotter(td_plot_base):
                         # Save new frame
                         fname2=self._make_fname(prefix,suffix,
                                                 i_frame,n_frames)
-                        self.yt_save_annotate(amp,fname2);
+                        self.yt_save_annotate(amp,fname2,sink);
 
                         # End of 'for ifr in range(0,n_frames_move)'
                         
@@ -5669,7 +6240,7 @@ class o2graph_plotter(td_plot_base):
                         # Save new frame
                         fname2=self._make_fname(prefix,suffix,
                                                 i_frame,n_frames)
-                        self.yt_save_annotate(amp,fname2);
+                        self.yt_save_annotate(amp,fname2,sink);
 
                         # End of 'for ifr in range(0,n_frames_move)'
                         
@@ -5757,7 +6328,7 @@ class o2graph_plotter(td_plot_base):
                         # Save new frame
                         fname2=self._make_fname(prefix,suffix,
                                                 i_frame,n_frames)
-                        self.yt_save_annotate(amp,fname2);
+                        self.yt_save_annotate(amp,fname2,sink);
 
                         # End of 'for ifr in range(0,n_frames_move)'
                         
@@ -5769,7 +6340,9 @@ class o2graph_plotter(td_plot_base):
             # (15-25 recommended) -y forces overwrite of the movie
             # file if it already exists
             
-            if n_frames>=1000:
+            if sink is not None:
+                sink.close()
+            elif n_frames>=1000:
                 self.mp4([prefix+'%04d'+suffix,mov_fname],loop=loop)
             elif n_frames>=100:
                 self.mp4([prefix+'%03d'+suffix,mov_fname],loop=loop)
@@ -6387,7 +6960,9 @@ class o2graph_plotter(td_plot_base):
                                                           list_of_ints=
                                                           ['n_subdiv'],
                                                           list_of_floats=
-                                                          ['r']))
+                                                          ['r'],
+                                                          list_of_bools=
+                                                          ['instance']))
                     elif ix_next-ix==7:
                         self.td_scatter(amp,[strlist[ix+1],
                                                    strlist[ix+2],
@@ -6404,7 +6979,9 @@ class o2graph_plotter(td_plot_base):
                                                            list_of_ints=
                                                            ['n_subdiv'],
                                                            list_of_floats=
-                                                           ['r']))
+                                                           ['r'],
+                                                           list_of_bools=
+                                                           ['instance']))
                     else:
                         print('Not enough arguments for td-scatter.')
 
@@ -6705,6 +7282,22 @@ class o2graph_plotter(td_plot_base):
 
                     self.errorbar(amp,strlist[ix+1:ix_next])
 
+                elif cmd_name=='corner':
+
+                    if self.verbose>2:
+                        print('o2graph_plotter::parse_string_list():',
+                              'Process corner.')
+                        print('  args:',strlist[ix:ix_next])
+
+                    if ix_next-ix<3:
+                        print('Not enough parameters for corner.')
+                    else:
+                        if (strlist[ix_next-1]=="None" or
+                            strlist[ix_next-1]=="none"):
+                            strlist[ix_next-1]=""
+                        self.corner(amp,strlist[ix+1:ix_next-1],
+                                    strlist[ix_next-1])
+                                                    
                 elif cmd_name=='hist2d-plot':
                     
                     if self.verbose>2:
@@ -35,6 +35,79 @@ from o2sclpy.base import std_vector
 from o2sclpy.plot_info import cmap_list_func, cmaps_plot, xkcd_colors_list
 from o2sclpy.plot_info import colors_plot, color_list, colors_near
 
+def _lod_line_index(x,y,n_buckets,logx=False):
+    """Return the sorted indices of the points to keep when
+    decimating the line through ``(x,y)`` to ``n_buckets`` buckets
+    along the x axis, or None if ``x`` is not monotonic
+
+    In each bucket, the first and last points and the points with
+    the minimum and maximum y value are kept, so the decimated line
+    covers the same pixels as the full line when there is at least
+    one bucket per pixel.
+    """
+    if logx==True:
+        xt=numpy.log10(x)
+    else:
+        xt=x
+    d=numpy.diff(xt)
+    if not (numpy.all(d>=0) or numpy.all(d<=0)):
+        return None
+    
+    lo=numpy.min(xt)
+    hi=numpy.max(xt)
+    if hi>lo:
+        bucket=numpy.floor((xt-lo)/(hi-lo)*n_buckets)
+        bucket=numpy.clip(bucket,0,n_buckets-1).astype(numpy.int64)
+    else:
+        bucket=numpy.zeros(len(x),dtype=numpy.int64)
+
+    # Since x is monotonic, each bucket is a contiguous range
+    starts=numpy.flatnonzero(numpy.concatenate(([True],
+                                                bucket[1:]!=bucket[:-1])))
+    ends=numpy.concatenate((starts[1:],[len(x)]))-1
+    seg=numpy.repeat(numpy.arange(len(starts)),ends-starts+1)
+    
+    idx=[starts,ends]
+    for ext in [numpy.minimum.reduceat(y,starts),
+                numpy.maximum.reduceat(y,starts)]:
+        hit=numpy.flatnonzero(y==ext[seg])
+        first=numpy.concatenate(([True],seg[hit][1:]!=seg[hit][:-1]))
+        idx.append(hit[first])
+    return numpy.unique(numpy.concatenate(idx))
+
+def _lod_scatter_index(x,y,nx,ny,xlim,ylim,logx=False,logy=False):
+    """Return the sorted indices of the points to keep in a scatter
+    plot after binning the points into an ``nx`` by ``ny`` grid of
+    cells which spans ``xlim`` and ``ylim``, keeping the first point
+    in each cell
+    """
+    xt=x
+    x0=xlim[0]
+    x1=xlim[1]
+    if logx==True:
+        xt=numpy.log10(x)
+        x0=math.log10(x0)
+        x1=math.log10(x1)
+    yt=y
+    y0=ylim[0]
+    y1=ylim[1]
+    if logy==True:
+        yt=numpy.log10(y)
+        y0=math.log10(y0)
+        y1=math.log10(y1)
+    if x1==x0:
+        x1=x0+1.0
+    if y1==y0:
+        y1=y0+1.0
+        
+    # Points outside the limits are collected in the cells just
+    # outside the grid
+    ix=numpy.clip(numpy.floor((xt-x0)/(x1-x0)*nx),-1,nx).astype(numpy.int64)
+    iy=numpy.clip(numpy.floor((yt-y0)/(y1-y0)*ny),-1,ny).astype(numpy.int64)
+    key=(ix+1)*(ny+2)+(iy+1)
+    u,idx=numpy.unique(key,return_index=True)
+    return numpy.sort(idx)
+
 class plot_base:
     """
     This class currently has two goals: (i) some simplifications for
@@ -175,12 +248,39 @@ class plot_base:
     """
     If true, then use LaTeX for text objects (default True)
     """
+    lod_max=0
+    """
+    If greater than zero, then line and scatter plots with more than
+    this number of points are decimated before they are sent to
+    matplotlib (default 0)
+    """
+    lod_dpi=0
+    """
+    The resolution in dots per inch at which decimated plots are
+    indistinguishable from the full plots, or if zero, the larger of
+    the figure resolution and the ``savefig.dpi`` setting (default 0)
+    """
+    blit=False
+    """
+    If true, then named artists updated by plot(), scatter(), or
+    den_plot() are redrawn using blitting (default False)
+    """
+    artist_dict={}
+    """
+    Dictionary of named artists, created when the ``name`` keyword
+    argument is given to plot(), scatter(), or den_plot(), which are
+    updated in place by later calls with the same name
+    """
     
     def __init__(self):
-        """The plot_base init method, which only calls
-        plot_base::new_cmaps().
+        """The plot_base init method, which calls
+        plot_base::new_cmaps() and creates an empty dictionary of
+        named artists.
         """
         self.new_cmaps()
+        self.artist_dict={}
+        self._blit_bg=None
+        self._blit_fig=None
     
     def colors(self,args=[]):
         """Documentation for o2graph command ``colors``:
@@ -673,6 +773,15 @@ class plot_base:
                 self.colbar=False
             else:
                 self.colbar=True
+        elif name=='blit':
+            if value=='False' or value=='0':
+                self.blit=False
+            else:
+                self.blit=True
+        elif name=='lod_max':
+            self.lod_max=int(value)
+        elif name=='lod_dpi':
+            self.lod_dpi=float(value)
         elif name=='font':
             self.font=float(value)
         elif name=='fig_dict':
@@ -723,6 +832,12 @@ class plot_base:
         """
         if name=='colbar':
             print('The value of colbar is'+str(self.colbar)+'.')
+        if name=='blit':
+            print('The value of blit is'+str(self.blit)+'.')
+        if name=='lod_max':
+            print('The value of lod_max is'+str(self.lod_max)+'.')
+        if name=='lod_dpi':
+            print('The value of lod_dpi is'+str(self.lod_dpi)+'.')
         if name=='logx':
             print('The value of logx is'+str(self.logx)+'.')
         if name=='logy':
@@ -1547,7 +1662,17 @@ class plot_base:
         
         if self.verbose>0:
             print('Saving as',(filename+'.'))
+            
+        # Artists which are animated for blitting are skipped by
+        # savefig(), so temporarily turn off the animation
+        arts=[]
+        if self.canvas_flag==True:
+            arts=self._animated_artists()
+        for art in arts:
+            art.set_animated(False)
         plot.savefig(filename)
+        for art in arts:
+            art.set_animated(True)
         # End of function plot_base::save()
         return
 
@@ -2211,6 +2336,132 @@ class plot_base:
         # End of function plot_base::canvas()
         return
 
+    def _lod_pixels(self):
+        """Return the width and height of the current axes in pixels
+        at the resolution given by :py:attr:`lod_dpi`
+        """
+        import matplotlib
+        
+        dpi=self.lod_dpi
+        if dpi<=0:
+            dpi=self.fig.dpi
+            if isinstance(matplotlib.rcParams['savefig.dpi'],(int,float)):
+                dpi=max(dpi,matplotlib.rcParams['savefig.dpi'])
+        bbox=self.axes.get_position()
+        fig_w,fig_h=self.fig.get_size_inches()
+        return (max(int(bbox.width*fig_w*dpi),1),
+                max(int(bbox.height*fig_h*dpi),1))
+
+    def _named_artist(self,name,types):
+        """Return the artist named ``name`` if it is still part of the
+        current figure and is an instance of one of the classes in
+        ``types``, and None otherwise
+
+        Lines, scatter plots and density plots share the same names,
+        so if the artist has a different type (e.g. a name which was
+        used for a line is now used for a scatter plot), then the
+        name is removed from :py:attr:`artist_dict` and the caller
+        creates a new artist.
+        """
+        if name=='' or name not in self.artist_dict:
+            return None
+        art=self.artist_dict[name]
+        if (self.canvas_flag==False or art.axes is None or
+            art.figure is not self.fig):
+            del self.artist_dict[name]
+            return None
+        if not isinstance(art,types):
+            if self.verbose>0:
+                print('plot_base::_named_artist(): Artist named',name,
+                      'is a',type(art).__name__,'so creating a new',
+                      'artist.')
+            del self.artist_dict[name]
+            return None
+        return art
+
+    def _store_artist(self,name,art):
+        """Store the new artist ``art`` with name ``name``, marking
+        it as animated if blitting is enabled
+        """
+        if name=='':
+            return
+        if self.blit==True:
+            art.set_animated(True)
+            # Ensure the background is recaptured whenever the
+            # full figure is drawn
+            if self._blit_fig is not self.fig:
+                self.fig.canvas.mpl_connect('draw_event',
+                                            self._blit_on_draw)
+                self._blit_fig=self.fig
+            self._blit_bg=None
+        self.artist_dict[name]=art
+        return
+
+    def _animated_artists(self):
+        """Return the list of named artists in the current figure
+        which are drawn only by blitting
+        """
+        return [art for art in self.artist_dict.values() if
+                art.get_animated() and art.figure is self.fig]
+
+    def _blit_on_draw(self,event):
+        """After a full draw, store the background and draw the
+        animated artists on top of it
+        """
+        canvas=self.fig.canvas
+        self._blit_bg=canvas.copy_from_bbox(self.fig.bbox)
+        for art in self._animated_artists():
+            self.fig.draw_artist(art)
+        return
+        
+    def _autoscale_named(self,art):
+        """Update the axis limits after the data in the named artist
+        ``art`` has changed, unless the limits have been set
+        """
+        if self.xset==True and self.yset==True:
+            return
+        ax=art.axes
+        old=(ax.get_xlim(),ax.get_ylim())
+        # The relim() function ignores collections, so their
+        # offsets are added by hand
+        ax.relim()
+        for coll in ax.collections:
+            if len(coll.get_offsets())>0:
+                ax.update_datalim(coll.get_offsets())
+        ax.autoscale_view(scalex=(self.xset==False),
+                          scaley=(self.yset==False))
+        if (ax.get_xlim(),ax.get_ylim())!=old:
+            self._blit_bg=None
+        return
+    
+    def redraw(self):
+        """Redraw the figure after the named artists have been updated
+
+        If :py:attr:`blit` is True and the canvas supports it, then
+        only the named artists are redrawn on top of the stored
+        background. Otherwise, the full figure is redrawn.
+        """
+        if self.canvas_flag==False:
+            return
+        canvas=self.fig.canvas
+        arts=self._animated_artists()
+        if (self.blit==False or len(arts)==0 or
+            getattr(canvas,'supports_blit',False)==False):
+            canvas.draw_idle()
+            canvas.flush_events()
+            return
+        if self._blit_bg is None:
+            # This draw calls _blit_on_draw() which stores the
+            # background and draws the animated artists
+            canvas.draw()
+        else:
+            canvas.restore_region(self._blit_bg)
+            for art in arts:
+                self.fig.draw_artist(art)
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+        return
+
     # def move_labels(self):
     #     """
     #     Move tick labels
@@ -2232,11 +2483,19 @@ class plot_base:
         """
         Args either [table,xcol,ycol,...] or
         [xarray,yarray,...]
-        
+
+        If the keyword argument ``name`` is given and a scatter plot
+        with that name is already in the figure, then its points,
+        sizes, and colors are replaced and the figure is redrawn
+        with :py:func:`o2sclpy.plot_base.redraw()` rather than
+        creating a new scatter plot.
         """
 
         if self.verbose>1:
             print('In plot_base::scatter().')
+
+        name=kwargs.pop('name','')
+        lod=int(kwargs.pop('lod',self.lod_max))
         
         import matplotlib.pyplot as plot
         
@@ -2293,6 +2552,45 @@ class plot_base:
         if self.canvas_flag==False:
             self.canvas()
 
+        # For large data sets with a single marker size and color,
+        # keep only one point for each cell in a grid four times
+        # finer than the pixels. The markers are rasterized.
+        lod_flag=(lod>0 and len(xv)>lod)
+        if lod_flag==True and len(sv)==0 and len(cv)==0:
+            xv=numpy.asarray(xv,dtype=float)
+            yv=numpy.asarray(yv,dtype=float)
+            (nx,ny)=self._lod_pixels()
+            if self.xset==True:
+                xlim=(self.xlo,self.xhi)
+            else:
+                xlim=(numpy.nanmin(xv),numpy.nanmax(xv))
+            if self.yset==True:
+                ylim=(self.ylo,self.yhi)
+            else:
+                ylim=(numpy.nanmin(yv),numpy.nanmax(yv))
+            idx=_lod_scatter_index(xv,yv,nx*4,ny*4,xlim,ylim,
+                                   logx=self.logx,logy=self.logy)
+            if self.verbose>1:
+                print('plot_base::scatter(): Reduced',len(xv),
+                      'points to',len(idx),'.')
+            xv=xv[idx]
+            yv=yv[idx]
+            
+        # If the named artist exists, then update it in place
+        from matplotlib.collections import PathCollection
+        art=self._named_artist(name,PathCollection)
+        if art is not None:
+            art.set_offsets(numpy.column_stack((xv,yv)))
+            if len(sv)>0:
+                art.set_sizes(numpy.asarray(sv))
+            if len(cv)>0:
+                art.set_array(numpy.asarray(cv))
+                if 'vmin' not in kwargs and 'vmax' not in kwargs:
+                    art.autoscale()
+            self._autoscale_named(art)
+            self.redraw()
+            return
+
         # Function alias
         ft=self.axes.scatter
         
@@ -2334,6 +2632,11 @@ class plot_base:
             cbar.ax.tick_params('both',length=6,width=1,
                                 which='major')
             cbar.ax.tick_params(labelsize=self.font*0.8)
+
+        if lod_flag==True:
+            self.last_image.set_rasterized(True)
+            
+        self._store_artist(name,self.last_image)
                 
         # End of function plot_base::scatter()
         return
@@ -2353,8 +2656,18 @@ class plot_base:
         The documentation for the o2graph ``plot`` command is 
         in the docstring for
         :py:func:`o2sclpy.o2graph_plotter.plot_o2graph()`.
+
+        If the keyword argument ``name`` is given and a line with
+        that name is already in the figure, then its data is replaced
+        using ``set_data()`` and the figure is redrawn with
+        :py:func:`o2sclpy.plot_base.redraw()` rather than creating a
+        new line. If :py:attr:`blit` is True, then only the named
+        artists are redrawn.
         """
 
+        name=kwargs.pop('name','')
+        lod=int(kwargs.pop('lod',self.lod_max))
+        
         if len(args)<1:
             # Minimum number of arguments is 1, for an object
             # of type 'hist'.
@@ -2421,16 +2734,47 @@ class plot_base:
     
             if self.canvas_flag==False:
                 self.canvas()
+
+            # Decimate large data sets using four buckets for each
+            # pixel along the x axis, since thin antialiased lines
+            # leave gaps between the buckets if there is only one
+            if lod>0 and len(xv)>lod:
+                xv=numpy.asarray(xv,dtype=float)
+                yv=numpy.asarray(yv,dtype=float)
+                n_buckets=self._lod_pixels()[0]*4
+                idx=_lod_line_index(xv,yv,n_buckets,logx=self.logx)
+                if idx is not None:
+                    if self.verbose>1:
+                        print('plot_base::plot(): Decimated',len(xv),
+                              'points to',len(idx),'.')
+                    xv=xv[idx]
+                    yv=yv[idx]
+                elif self.verbose>0:
+                    print('plot_base::plot(): Not decimating because',
+                          'x values are not monotonic.')
+                
+            # If the named artist exists, then update it in place
+            from matplotlib.lines import Line2D
+            art=self._named_artist(name,Line2D)
+            if art is not None:
+                art.set_data(xv,yv)
+                if len(kwargs)>0:
+                    art.set(**kwargs)
+                self._autoscale_named(art)
+                self.redraw()
+                return
+                
             if self.logx==True:
                 if self.logy==True:
-                    self.axes.loglog(xv,yv,**kwargs)
+                    lines=self.axes.loglog(xv,yv,**kwargs)
                 else:
-                    self.axes.semilogx(xv,yv,**kwargs)
+                    lines=self.axes.semilogx(xv,yv,**kwargs)
             else:
                 if self.logy==True:
-                    self.axes.semilogy(xv,yv,**kwargs)
+                    lines=self.axes.semilogy(xv,yv,**kwargs)
                 else:
-                    self.axes.plot(xv,yv,**kwargs)
+                    lines=self.axes.plot(xv,yv,**kwargs)
+            self._store_artist(name,lines[0])
 
             # AWS, added 5/3/23, I think this should be here?
             if self.xset==True:
@@ -2453,12 +2797,20 @@ class plot_base:
 
         If a cmyt colormap is used, then the ``cmyt`` Python package is
         required.
+
+        If the keyword argument ``name`` is given and a density plot
+        with that name is already in the figure, then its data is
+        replaced and the figure is redrawn with
+        :py:func:`o2sclpy.plot_base.redraw()` rather than creating a
+        new image and colorbar.
         """
         
         if len(args)<1:
             print('Failed, not enough information to plot.')
             return
 
+        name=kwargs.pop('name','')
+
         val=kwargs.pop('pcm',None)
         if val==True:
             pcm=True
@@ -2649,6 +3001,24 @@ class plot_base:
 
         if self.canvas_flag==False:
             self.canvas()
+
+        # If the named artist exists, then update it in place
+        from matplotlib.collections import QuadMesh
+        from matplotlib.image import AxesImage
+        if pcm==True:
+            art=self._named_artist(name,QuadMesh)
+        else:
+            art=self._named_artist(name,AxesImage)
+        if art is not None:
+            if pcm==True:
+                art.set_array(sl)
+            else:
+                art.set_data(sl)
+                art.set_extent([extent1,extent2,extent3,extent4])
+            if 'vmin' not in kwargs and 'vmax' not in kwargs:
+                art.autoscale()
+            self.redraw()
+            return
             
         if pcm==True:
             
@@ -2684,6 +3054,8 @@ class plot_base:
             cbar=self.fig.colorbar(self.last_image,ax=self.axes)
             cbar.ax.tick_params('both',length=6,width=1,which='major')
             cbar.ax.tick_params(labelsize=self.font*0.8)
+
+        self._store_artist(name,self.last_image)
                 
         return
     
@@ -234,6 +234,27 @@ class mesh_object:
     Only 'triangles', 'lines', and 'points' are supported at present.
     """
 
+    inst_trans=[]
+    """The per-instance translations, an array of shape (N,3)
+
+    If this is non-empty, then the mesh is written to GLTF files once,
+    and drawn at each of these translations using the
+    ``EXT_mesh_gpu_instancing`` extension.
+    """
+
+    inst_scale=[]
+    """
+    The per-instance scale factors, an array of shape (N,3) (optional)
+    """
+
+    inst_color=[]
+    """The per-instance colors, an array of shape (N,3) or (N,4)
+    (optional)
+
+    These are written to the application-specific attribute
+    ``_COLOR_0``, which not all viewers support.
+    """
+
     def __init__(self, name: str, faces,
                  mat: str = '', obj_type: str = 'triangles'):
         """
@@ -249,6 +270,9 @@ class mesh_object:
         self.vert_list=[]
         self.vn_list=[]
         self.vt_list=[]
+        self.inst_trans=[]
+        self.inst_scale=[]
+        self.inst_color=[]
         return
 
     def sort_by_mat(self, verbose : int = 0):
@@ -903,16 +927,32 @@ class threed_objects:
 
     def write_gltf(self, wdir: str, prefix: str, verbose: int = 0,
                    rotate_zup: bool = True, zip_file=''):
-        """Write all objects to an '.gltf' file, creating a '.bin' file
+        """Write all objects to an '.gltf' file, creating a '.bin' file,
+        or, if ``prefix`` ends in '.glb', to a single binary '.glb'
+        file
+
+        The vertex, normal, texture coordinate, and index data for
+        each primitive are converted to numpy arrays and each
+        bufferView is padded to a multiple of four bytes. For '.glb'
+        output, the JSON and the binary data are written to the file
+        in one pass, without first constructing the full binary
+        buffer in memory.
         """
 
         import json
         from struct import pack
 
         # Remove suffix if it is present
-        if prefix[-5:]=='.gltf':
+        glb=False
+        if prefix[-4:]=='.glb':
+            glb=True
+            prefix=prefix[:-4]
+        elif prefix[-5:]=='.gltf':
             prefix=prefix[:-5]
-        gltf_file=wdir+"/"+prefix+'.gltf'
+        if glb:
+            gltf_file=wdir+"/"+prefix+'.glb'
+        else:
+            gltf_file=wdir+"/"+prefix+'.gltf'
         bin_file=wdir+"/"+prefix+'.bin'
 
         # If a zip file is to be created, then this is the list of
@@ -925,8 +965,11 @@ class threed_objects:
             # Begin the list of files to be included by adding
             # the base gltf and bin files. Texture files will be
             # added later if necessary.
-            zip_list.append(prefix+'.gltf')
-            zip_list.append(prefix+'.bin')
+            if glb:
+                zip_list.append(prefix+'.glb')
+            else:
+                zip_list.append(prefix+'.gltf')
+                zip_list.append(prefix+'.bin')
         
         nodes_list=[]
         for k in range(0,len(self.mesh_list)):
@@ -978,12 +1021,21 @@ class threed_objects:
         # section of the GLTF file
         img_json=[]
 
-        # Binary objects are written to this object
-        f2=open(bin_file,'wb')
-            
+        # The list of numpy arrays which make up the binary buffer,
+        # in order
+        bin_list=[]
+        
         texture_map=[-1]*len(self.mat_list)
         texture_index=0
 
+        # A map from material name to index, to avoid a linear
+        # search through the material list for each primitive. The
+        # first material with a given name takes precedence, as in
+        # get_mat_index().
+        mat_map={}
+        for i in range(len(self.mat_list)-1,-1,-1):
+            mat_map[self.mat_list[i].name]=i
+
         # Output all of the materials to the mat_json object
         for i in range(0,len(self.mat_list)):
 
@@ -1039,418 +1091,200 @@ class threed_objects:
 
             # Add this material JSON to the full material list
             mat_json.append(mat_dict)
-        
-        # Add each set of faces as a group
-
-        # Accessor index
-        acc_index=0
 
         # Current byte offset
         offset=0
 
+        # True if any mesh uses EXT_mesh_gpu_instancing
+        instancing=False
+
+        def add_accessor(arr,comp_type,acc_type,target,bounds=False):
+            """Add the numpy array ``arr`` to the binary buffer, padded
+            to a multiple of four bytes, with a new bufferView and
+            accessor, and return the accessor index
+            """
+            nonlocal offset
+            
+            # 5120 is signed byte
+            # 5121 is unsigned byte
+            # 5122 is signed short
+            # 5123 is unsigned short
+            # 5125 is unsigned int
+            # 5126 is signed float
+            acc={"bufferView": len(buf_json),
+                 "componentType": comp_type,
+                 "count": int(arr.shape[0]),
+                 "type": acc_type}
+            if bounds:
+                # The bounds are computed from the single precision
+                # values so that validators do not complain that the
+                # max and min are wrong
+                acc["max"]=arr.max(axis=0).tolist()
+                acc["min"]=arr.min(axis=0).tolist()
+            acc_json.append(acc)
+
+            # 34962 is "ARRAY_BUFFER"
+            # 34963 is "ELEMENT_ARRAY_BUFFER"
+            # 0 indicates no target, as for instance attributes
+            buf_view={"buffer": 0,
+                      "byteLength": int(arr.nbytes),
+                      "byteOffset": offset}
+            if target!=0:
+                buf_view["target"]=target
+            buf_json.append(buf_view)
+            bin_list.append(arr)
+            offset+=arr.nbytes
+            if arr.nbytes%4!=0:
+                pad=numpy.zeros(4-arr.nbytes%4,dtype=numpy.uint8)
+                bin_list.append(pad)
+                offset+=pad.nbytes
+            return len(acc_json)-1
+        
         for i in range(0,len(self.mesh_list)):
                 
             if verbose>1 and i%100==99:
                 print('td_plot_base::gltf(): mesh',i+1,'of',
                       len(self.mesh_list))
-                
+
+            mesh=self.mesh_list[i]
+            
             normals=False
-            if len(self.mesh_list[i].vn_list)>0:
+            if len(mesh.vn_list)>0:
                 normals=True
-                if (len(self.mesh_list[i].vert_list)!=
-                    len(self.mesh_list[i].vn_list)):
+                if len(mesh.vert_list)!=len(mesh.vn_list):
                    print('Problem with normals.')
                    quit()
             texcoords=False
-            if len(self.mesh_list[i].vt_list)>0:
+            if len(mesh.vt_list)>0:
                 texcoords=True
-                if (len(self.mesh_list[i].vert_list)!=
-                    len(self.mesh_list[i].vt_list)):
+                if len(mesh.vert_list)!=len(mesh.vt_list):
                    print('Problem with texcoords.')
                    quit()
 
             long_ints=False
-            if len(self.mesh_list[i].vert_list)>=32768:
+            if len(mesh.vert_list)>=32768:
                 long_ints=True
                 print('Function write_gltf() using long integers',
-                      'for mesh',self.mesh_list[i].name+'.')
+                      'for mesh',mesh.name+'.')
 
-            # The dictionary of attributes for the current primitive
-            att={}
+            # Single precision copies of the vertex data. Converting
+            # the vertices to single precision here ensures that
+            # the bounds match the data in the file.
+            if len(mesh.vert_list)>0:
+                vert_arr=numpy.asarray(mesh.vert_list,dtype='<f4')[:,0:3]
+            if normals:
+                norm_arr=numpy.asarray(mesh.vn_list,dtype='<f4')[:,0:3]
+            if texcoords:
+                txts_arr=numpy.asarray(mesh.vt_list,dtype='<f4')[:,0:2]
             
-            face_bin=[]
-            norm_bin=[]
-            txts_bin=[]
-            vert_bin=[]
-            vert_map = [-1] * len(self.mesh_list[i].vert_list)
             prim_json=[]
 
-            if False:
-                for j in range(0,len(self.mesh_list[i].vert_list)):
-                    for kk in range(0,3):
-                        v0=float(self.mesh_list[i].vert_list[j][kk])
-                        vert_bin.append(v0)
-
-                for j in range(0,len(self.mesh_list[i].vn_list)):
-                    for kk in range(0,3):
-                        v0=float(self.mesh_list[i].vn_list[j][kk])
-                        norm_bin.append(v0)
-
-                if texcoords and self.mat_list[mat_index].txt!='':
-                    for j in range(0,len(self.mesh_list[i].vt_list)):
-                        for kk in range(0,2):
-                            v0=float(self.mesh_list[i].vt_list[j][kk])
-                            txts_bin.append(v0)
-
-            for j in range(0,len(self.mesh_list[i].faces)):
-
-                # Determine the material for this face
-                mat1=''
-                mat_index=-1
-
-                lf1=len(self.mesh_list[i].faces[j])
-                if lf1==4:
-                    mat1=self.mesh_list[i].faces[j][lf1-1]
-                    mat_index=self.get_mat_index(mat1)
+            # Collect the vertex indices of the faces and split the
+            # faces into primitives. A new primitive begins when the
+            # next face specifies a different material.
+            n_faces=len(mesh.faces)
+            face_arr=numpy.zeros((n_faces,3),dtype=numpy.int64)
+            groups=[]
+            start=0
+            for j in range(0,n_faces):
+                face=mesh.faces[j]
+                face_arr[j,0]=face[0]
+                face_arr[j,1]=face[1]
+                face_arr[j,2]=face[2]
+                if len(face)==4:
+                    mat1=face[3]
                 else:
-                    mat1=self.mesh_list[i].mat
-                    if mat1!='':
-                        mat_index=self.get_mat_index(mat1)
-
-                if False:
-                    for kk in range(0,3):
-                        face_bin.append(self.mesh_list[i].faces[j][kk])
+                    mat1=mesh.mat
+                if j==n_faces-1:
+                    groups.append((start,j,mat1))
                 else:
-                    # Map the first vertex
-                    ix=self.mesh_list[i].faces[j][0]
-                    if vert_map[ix]==-1:
-                        # Converting the vertices to "float()"
-                        # helps ensure single precision and then
-                        # validators don't complain that max and
-                        # min are wrong.
-                        v0=float(self.mesh_list[i].vert_list[ix][0])
-                        vert_bin.append(v0)
-                        v1=float(self.mesh_list[i].vert_list[ix][1])
-                        vert_bin.append(v1)
-                        v2=float(self.mesh_list[i].vert_list[ix][2])
-                        vert_bin.append(v2)
-                        if normals:
-                            v3=float(self.mesh_list[i].vn_list[ix][0])
-                            norm_bin.append(v3)
-                            v4=float(self.mesh_list[i].vn_list[ix][1])
-                            norm_bin.append(v4)
-                            v5=float(self.mesh_list[i].vn_list[ix][2])
-                            norm_bin.append(v5)
-                        if texcoords and self.mat_list[mat_index].txt!='':
-                            v6=float(self.mesh_list[i].vt_list[ix][0])
-                            txts_bin.append(v6)
-                            v7=float(self.mesh_list[i].vt_list[ix][1])
-                            txts_bin.append(v7)
-                            #print(self.mesh_list[i].name,'texcoords1',v6,v7)
-                        vert_map[ix]=int(len(vert_bin)/3)
-                        # We have to subtract one here because
-                        # the point has already been added to 'vert_bin'
-                        face_bin.append(int(len(vert_bin)/3)-1)
-                    else:
-                        face_bin.append(vert_map[ix])
-                    # Map the second vertex
-                    ix=self.mesh_list[i].faces[j][1]
-                    if vert_map[ix]==-1:
-                        v8=float(self.mesh_list[i].vert_list[ix][0])
-                        vert_bin.append(v8)
-                        v9=float(self.mesh_list[i].vert_list[ix][1])
-                        vert_bin.append(v9)
-                        v10=float(self.mesh_list[i].vert_list[ix][2])
-                        vert_bin.append(v10)
-                        if normals:
-                            v11=float(self.mesh_list[i].vn_list[ix][0])
-                            norm_bin.append(v11)
-                            v12=float(self.mesh_list[i].vn_list[ix][1])
-                            norm_bin.append(v12)
-                            v13=float(self.mesh_list[i].vn_list[ix][2])
-                            norm_bin.append(v13)
-                        if texcoords and self.mat_list[mat_index].txt!='':
-                            v14=float(self.mesh_list[i].vt_list[ix][0])
-                            txts_bin.append(v14)
-                            v15=float(self.mesh_list[i].vt_list[ix][1])
-                            txts_bin.append(v15)
-                            #print(self.mesh_list[i].name,'texcoords2',v14,v15)
-                        vert_map[ix]=int(len(vert_bin)/3)
-                        # We have to subtract one here because
-                        # the point has already been added to 'vert_bin'
-                        face_bin.append(int(len(vert_bin)/3)-1)
-                    else:
-                        face_bin.append(vert_map[ix])
-                    # Map the third vertex
-                    ix=self.mesh_list[i].faces[j][2]
-                    if vert_map[ix]==-1:
-                        v16=float(self.mesh_list[i].vert_list[ix][0])
-                        vert_bin.append(v16)
-                        v17=float(self.mesh_list[i].vert_list[ix][1])
-                        vert_bin.append(v17)
-                        v18=float(self.mesh_list[i].vert_list[ix][2])
-                        vert_bin.append(v18)
-                        if normals:
-                            v19=float(self.mesh_list[i].vn_list[ix][0])
-                            norm_bin.append(v19)
-                            v20=float(self.mesh_list[i].vn_list[ix][1])
-                            norm_bin.append(v20)
-                            v21=float(self.mesh_list[i].vn_list[ix][2])
-                            norm_bin.append(v21)
-                        if texcoords and self.mat_list[mat_index].txt!='':
-                            v22=float(self.mesh_list[i].vt_list[ix][0])
-                            txts_bin.append(v22)
-                            v23=float(self.mesh_list[i].vt_list[ix][1])
-                            txts_bin.append(v23)
-                            #print(self.mesh_list[i].name,'texcoords3',v22,v23)
-                        vert_map[ix]=int(len(vert_bin)/3)
-                        # We have to subtract one here because
-                        # the point has already been added to 'vert_bin'
-                        face_bin.append(int(len(vert_bin)/3)-1)
-                    else:
-                        face_bin.append(vert_map[ix])
-
-                # Determine if the next face is composed of a
-                # different material, if so, set mat2 and
-                # flip next_face_different_mat to True
-                next_face_different_mat=False
-                if j<len(self.mesh_list[i].faces)-1:
-                    mat2=''
-                    lf2=len(self.mesh_list[i].faces[j+1])
-                    if lf2==4:
-                        mat2=self.mesh_list[i].faces[j+1][lf2-1]
-                        if mat1!=mat2:
-                            next_face_different_mat=True
-
-                # If we're at the end, or we're switching materials,
-                # then add the primitive to the mesh and update
-                # the binary data file accordingly
-                if (j==len(self.mesh_list[i].faces)-1 or
-                    next_face_different_mat==True):
-
-                    # 'f' is float, 'H' is unsigned short, and 'I' is
-                    # unsigned int
-                    
-                    dat1=pack('<'+'f'*len(vert_bin),*vert_bin)
-                    f2.write(dat1)
-                    if normals:
-                        dat3=pack('<'+'f'*len(norm_bin),*norm_bin)
-                        f2.write(dat3)
-                    # If the object provides texture coordinates, but
-                    # there's no texture, then there's no need to
-                    # output them
-                    if texcoords and self.mat_list[mat_index].txt!='':
-                        dat4=pack('<'+'f'*len(txts_bin),*txts_bin)
-                        f2.write(dat4)
-
-                    if long_ints==True:
-                        dat2=pack('<'+'I'*len(face_bin),*face_bin)
-                        f2.write(dat2)
-                    else:
-                        dat2=pack('<'+'H'*len(face_bin),*face_bin)
-                        f2.write(dat2)
-        
-                    max_v=[0,0,0]
-                    min_v=[0,0,0]
-                    for ii in range(0,len(vert_bin),3):
-                        for jj in range(0,3):
-                            if ii==0 or vert_bin[ii+jj]<min_v[jj]:
-                                min_v[jj]=vert_bin[ii+jj]
-                            if ii==0 or vert_bin[ii+jj]>max_v[jj]:
-                                max_v[jj]=vert_bin[ii+jj]
+                    face2=mesh.faces[j+1]
+                    if len(face2)==4 and face2[3]!=mat1:
+                        groups.append((start,j,mat1))
+                        start=j+1
+
+            for (j_start,j_end,mat1) in groups:
+
+                mat_index=-1
+                if mat1!='':
+                    if mat1 not in mat_map:
+                        raise ValueError("No mat named "+mat1)
+                    mat_index=mat_map[mat1]
                     
-                    # 5120 is signed byte
-                    # 5121 is unsigned byte
-                    # 5122 is signed short
-                    # 5123 is unsigned short
-                    # 5125 is unsigned int
-                    # 5126 is signed float
+                # The vertices used by this primitive, in the order
+                # in which they first appear in the faces, and the
+                # faces in terms of the new vertex indices
+                flat=face_arr[j_start:j_end+1].ravel()
+                uniq,first,inv=numpy.unique(flat,return_index=True,
+                                            return_inverse=True)
+                order=numpy.argsort(first,kind='stable')
+                rank=numpy.empty(len(uniq),dtype=numpy.int64)
+                rank[order]=numpy.arange(len(uniq))
+                used=uniq[order]
+
+                # The dictionary of attributes for the current primitive
+                att={}
+                att["POSITION"]=add_accessor(vert_arr[used],5126,
+                                             "VEC3",34962,bounds=True)
+                if normals:
+                    att["NORMAL"]=add_accessor(norm_arr[used],5126,
+                                               "VEC3",34962)
+                # If the object provides texture coordinates, but
+                # there's no texture, then there's no need to
+                # output them
+                if (texcoords and mat_index>=0 and
+                    self.mat_list[mat_index].txt!=''):
+                    att["TEXCOORD_0"]=add_accessor(txts_arr[used],5126,
+                                                   "VEC2",34962)
+                if long_ints==True:
+                    face_bin=rank[inv.ravel()].astype('<u4')
+                    ind=add_accessor(face_bin,5125,"SCALAR",34963)
+                else:
+                    face_bin=rank[inv.ravel()].astype('<u2')
+                    ind=add_accessor(face_bin,5123,"SCALAR",34963)
+
+                # AWS, 11/11/24: Lines and points don't have
+                # faces, so they won't need this code, but we
+                # probably need to keep an if statement here for
+                # future expansion to trangle strips and fans.
+                prim={"attributes": att,
+                      "indices": ind}
+                if mat1!='':
+                    prim["material"]=mat_index
+                if mesh.obj_type!='triangles':
                     
-                    acc_json.append({"bufferView": acc_index,
-                                     "componentType": 5126,
-                                     "count": int(len(vert_bin)/3),
-                                     "max": max_v,
-                                     "min": min_v,
-                                     "type": "VEC3"})
-                    att["POSITION"]=acc_index
-                    acc_index=acc_index+1
+                    #0 POINTS
+                    #1 LINES
+                    #2 LINE_LOOP
+                    #3 LINE_STRIP
+                    #4 TRIANGLES
+                    #5 TRIANGLE_STRIP
+                    #6 TRIANGLE_FAN
                     
-                    if normals:
-                        acc_json.append({"bufferView": acc_index,
-                                         "componentType": 5126,
-                                         "count": int(len(norm_bin)/3),
-                                         "type": "VEC3"})
-                        att["NORMAL"]=acc_index
-                        acc_index=acc_index+1
-                        
-                    # If the object provides texture coordinates, but
-                    # there's no texture, then there's no need to
-                    # output them
-                    if texcoords and self.mat_list[mat_index].txt!='':
-                        acc_json.append({"bufferView": acc_index,
-                                         "componentType": 5126,
-                                         "count": int(len(txts_bin)/2),
-                                         "type": "VEC2"})
-                        att["TEXCOORD_0"]=acc_index
-                        acc_index=acc_index+1
+                    prim["mode"]=4
+                prim_json.append(prim)
                         
-                    if long_ints:
-                        acc_json.append({"bufferView": acc_index,
-                                         "componentType": 5125,
-                                         "count": int(len(face_bin)/1),
-                                         "type": "SCALAR"})
-                    else:
-                        acc_json.append({"bufferView": acc_index,
-                                         "componentType": 5123,
-                                         "count": int(len(face_bin)/1),
-                                         "type": "SCALAR"})
-
-                    # AWS, 11/11/24: Lines and points don't have
-                    # faces, so they won't need this code, but we
-                    # probably need to keep an if statement here for
-                    # future expansion to trangle strips and fans.
-                    if self.mesh_list[i].obj_type=='triangles':
-                        if mat1=='':
-                            prim_json.append({"attributes": att,
-                                              "indices": acc_index})
-                        else:
-                            prim_json.append({"attributes": att,
-                                              "indices": acc_index,
-                                              "material": mat_index})
-                    else:
-                        
-                        #0 POINTS
-                        #1 LINES
-                        #2 LINE_LOOP
-                        #3 LINE_STRIP
-                        #4 TRIANGLES
-                        #5 TRIANGLE_STRIP
-                        #6 TRIANGLE_FAN
-
-                        mode_num=4
-                        if mat1=='':
-                            prim_json.append({"attributes": att,
-                                              "indices": acc_index,
-                                              "mode": mode_num})
-                        else:
-                            prim_json.append({"attributes": att,
-                                              "indices": acc_index,
-                                              "material": mat_index,
-                                              "mode": mode_num})
-                            
-                    if j==len(self.mesh_list[i].faces)-1:
-                        mesh_json.append({"name": self.mesh_list[i].name,
-                                          "primitives": prim_json})
-                        
-                    acc_index=acc_index+1
-        
-                    # 34962 is "ARRAY_BUFFER"
-                    # 34963 is "ELEMENT_ARRAY_BUFFER"
-                    
-                    buf_json.append({"buffer": 0,
-                                     "byteLength": 4*len(vert_bin),
-                                     "byteOffset": offset,
-                                     "target": 34962})
-                    offset+=4*len(vert_bin)
-                    if normals:
-                        buf_json.append({"buffer": 0,
-                                         "byteLength": 4*len(norm_bin),
-                                         "byteOffset": offset,
-                                         "target": 34962})
-                        offset+=4*len(norm_bin)
-                    # If the object provides texture coordinates, but
-                    # there's no texture, then there's no need to
-                    # output them
-                    if texcoords and self.mat_list[mat_index].txt!='':
-                        buf_json.append({"buffer": 0,
-                                         "byteLength": 4*len(txts_bin),
-                                         "byteOffset": offset,
-                                         "target": 34962})
-                        offset+=4*len(txts_bin)
-                    if long_ints==True:
-                        buf_json.append({"buffer": 0,
-                                         "byteLength": 4*len(face_bin),
-                                         "byteOffset": offset,
-                                         "target": 34963})
-                        offset+=4*len(face_bin)
-                    else:
-                        buf_json.append({"buffer": 0,
-                                         "byteLength": 2*len(face_bin),
-                                         "byteOffset": offset,
-                                         "target": 34963})
-                        offset+=2*len(face_bin)
-                    if verbose>2:
-                        print('offset:',offset)
-                        print('len(face_bin):',self.mesh_list[i].name,
-                              len(face_bin))
-                        print(('min,max: [%7.6e,%7.6e,%7.6e] '+
-                              '[%7.6e,%7.6e,%7.6e]') %
-                              (min_v[0],min_v[1],min_v[2],
-                               max_v[0],max_v[1],max_v[2]))
-                        print('')
-                    
-                    # Reset the primitive objects so that
-                    # we can start a new one
-                    att={}
-                    face_bin=[]
-                    vert_bin=[]
-                    norm_bin=[]
-                    vert_map = [-1] * len(self.mesh_list[i].vert_list)
-
-                # End of 'if (j==len(self.mesh_list[i].faces)-1...
-                
-            # End of loop over faces
-
-            if self.mesh_list[i].obj_type=='lines':
+                if verbose>2:
+                    print('offset:',offset)
+                    print('len(face_bin):',mesh.name,len(face_bin))
+                    print('min,max:',acc_json[att["POSITION"]]["min"],
+                          acc_json[att["POSITION"]]["max"])
+                    print('')
+
+            if n_faces>0:
+                mesh_json.append({"name": mesh.name,
+                                  "primitives": prim_json})
+            
+            if mesh.obj_type=='lines':
 
-                mat1=self.get_mat(self.mesh_list[i].mat)
+                mat1=self.get_mat(mesh.mat)
 
-                texcoords=False
-                if len(self.mesh_list[i].vt_list)>0 and mat1.txt!='':
-                    texcoords=True
-                    
-                vert_bin=[]
-                for ii in range(0,len(self.mesh_list[i].vert_list)):
-                    v0=float(self.mesh_list[i].vert_list[ii][0])
-                    vert_bin.append(v0)
-                    v1=float(self.mesh_list[i].vert_list[ii][1])
-                    vert_bin.append(v1)
-                    v2=float(self.mesh_list[i].vert_list[ii][2])
-                    vert_bin.append(v2)
-                    
-                if texcoords:
-                    txts_bin=[]
-                    for ix in range(0,len(self.mesh_list[i].vt_list)):
-                        v6=float(self.mesh_list[i].vt_list[ix][0])
-                        txts_bin.append(v6)
-                        v7=float(self.mesh_list[i].vt_list[ix][1])
-                        txts_bin.append(v7)
-                    
-                max_v=[0,0,0]
-                min_v=[0,0,0]
-                for ii in range(0,len(vert_bin),3):
-                    for jj in range(0,3):
-                        if ii==0 or vert_bin[ii+jj]<min_v[jj]:
-                            min_v[jj]=vert_bin[ii+jj]
-                        if ii==0 or vert_bin[ii+jj]>max_v[jj]:
-                            max_v[jj]=vert_bin[ii+jj]
-                            
-                acc_json.append({"bufferView": acc_index,
-                                 "componentType": 5126,
-                                 "count": int(len(vert_bin)/3),
-                                 "max": max_v,
-                                 "min": min_v,
-                                 "type": "VEC3"})
-                att["POSITION"]=acc_index
-                acc_index=acc_index+1
-
-                if texcoords:
-                    acc_json.append({"bufferView": acc_index,
-                                     "componentType": 5126,
-                                     "count": int(len(txts_bin)/2),
-                                     "type": "VEC2"})
-                    att["TEXCOORD_0"]=acc_index
-                    acc_index=acc_index+1
+                att={}
+                att["POSITION"]=add_accessor(vert_arr,5126,"VEC3",
+                                             34962,bounds=True)
+                if len(mesh.vt_list)>0 and mat1.txt!='':
+                    att["TEXCOORD_0"]=add_accessor(txts_arr,5126,"VEC2",
+                                                   34962)
                                     
                 if mat1=='':
                     prim_json.append({"attributes": att,
@@ -1461,58 +1295,16 @@ class threed_objects:
                                       "material": mat_index,
                                       "mode": 1})
                     
-                mesh_json.append({"name": self.mesh_list[i].name,
+                mesh_json.append({"name": mesh.name,
                                   "primitives": prim_json})
                 
-                buf_json.append({"buffer": 0,
-                                 "byteLength": 4*len(vert_bin),
-                                 "byteOffset": offset,
-                                 "target": 34962})
-                offset+=4*len(vert_bin)
-                
-                if texcoords:
-                    buf_json.append({"buffer": 0,
-                                     "byteLength": 4*len(txts_bin),
-                                     "byteOffset": offset,
-                                     "target": 34962})
-                    offset+=4*len(txts_bin)
-                    
-                dat1=pack('<'+'f'*len(vert_bin),*vert_bin)
-                f2.write(dat1)
-                if texcoords:
-                    dat4=pack('<'+'f'*len(txts_bin),*txts_bin)
-                    f2.write(dat4)
-                
-            elif self.mesh_list[i].obj_type=='points':
+            elif mesh.obj_type=='points':
             
-                vert_bin=[]
-                for ii in range(0,len(self.mesh_list[i].vert_list)):
-                    v0=float(self.mesh_list[i].vert_list[ii][0])
-                    vert_bin.append(v0)
-                    v1=float(self.mesh_list[i].vert_list[ii][1])
-                    vert_bin.append(v1)
-                    v2=float(self.mesh_list[i].vert_list[ii][2])
-                    vert_bin.append(v2)
-                    
-                max_v=[0,0,0]
-                min_v=[0,0,0]
-                for ii in range(0,len(vert_bin),3):
-                    for jj in range(0,3):
-                        if ii==0 or vert_bin[ii+jj]<min_v[jj]:
-                            min_v[jj]=vert_bin[ii+jj]
-                        if ii==0 or vert_bin[ii+jj]>max_v[jj]:
-                            max_v[jj]=vert_bin[ii+jj]
-                            
-                acc_json.append({"bufferView": acc_index,
-                                 "componentType": 5126,
-                                 "count": int(len(vert_bin)/3),
-                                 "max": max_v,
-                                 "min": min_v,
-                                 "type": "VEC3"})
-                att["POSITION"]=acc_index
-                acc_index=acc_index+1
-
-                mat1=self.mesh_list[i].mat
+                att={}
+                att["POSITION"]=add_accessor(vert_arr,5126,"VEC3",
+                                             34962,bounds=True)
+
+                mat1=mesh.mat
                     
                 if mat1=='':
                     prim_json.append({"attributes": att,
@@ -1523,19 +1315,33 @@ class threed_objects:
                                       "material": mat_index,
                                       "mode": 0})
                     
-                mesh_json.append({"name": self.mesh_list[i].name,
+                mesh_json.append({"name": mesh.name,
                                   "primitives": prim_json})
 
-                buf_json.append({"buffer": 0,
-                                 "byteLength": 4*len(vert_bin),
-                                 "byteOffset": offset,
-                                 "target": 34962})
-                offset+=4*len(vert_bin)
-
-                dat1=pack('<'+'f'*len(vert_bin),*vert_bin)
-                f2.write(dat1)
-                
             # End of if statements for lines and points
+
+            # Output the per-instance data and refer to it in the
+            # node for this mesh
+            if len(mesh.inst_trans)>0:
+                instancing=True
+                inst={}
+                inst_arr=numpy.asarray(mesh.inst_trans,dtype='<f4')
+                inst["TRANSLATION"]=add_accessor(inst_arr.reshape(-1,3),
+                                                 5126,"VEC3",0)
+                if len(mesh.inst_scale)>0:
+                    inst_arr=numpy.asarray(mesh.inst_scale,dtype='<f4')
+                    inst["SCALE"]=add_accessor(inst_arr.reshape(-1,3),
+                                               5126,"VEC3",0)
+                if len(mesh.inst_color)>0:
+                    inst_arr=numpy.asarray(mesh.inst_color,dtype='<f4')
+                    if inst_arr.shape[1]==4:
+                        inst["_COLOR_0"]=add_accessor(inst_arr,5126,
+                                                      "VEC4",0)
+                    else:
+                        inst["_COLOR_0"]=add_accessor(inst_arr[:,0:3],
+                                                      5126,"VEC3",0)
+                nodes_json[i]["extensions"]={"EXT_mesh_gpu_instancing":
+                                             {"attributes": inst}}
             
         # End of loop over mesh list
                     
@@ -1543,6 +1349,11 @@ class threed_objects:
         if verbose>2:
             print('Converting mesh list:')
         jdat["meshes"]=mesh_json
+        if instancing:
+            # Without the extension, only one copy of each instanced
+            # mesh would be drawn, so the extension is required
+            jdat["extensionsUsed"]=["EXT_mesh_gpu_instancing"]
+            jdat["extensionsRequired"]=["EXT_mesh_gpu_instancing"]
         if verbose>2:
             print('Converting materials:')
         if len(mat_json)>0:
@@ -1553,24 +1364,51 @@ class threed_objects:
         if verbose>2:
             print('Converting buffers:')
         jdat["bufferViews"]=buf_json
-        jdat["buffers"]=[{"byteLength": offset,
-                          "uri": prefix+'.bin'}]
+        if glb:
+            jdat["buffers"]=[{"byteLength": offset}]
+        else:
+            jdat["buffers"]=[{"byteLength": offset,
+                              "uri": prefix+'.bin'}]
         if verbose>2:
             print('Converting textures:')
         if len(txt_json)>0:
             jdat["textures"]=txt_json
             jdat["images"]=img_json
 
-        # write the json file
-        if verbose>2:
-            print('Writing JSON:')
-        f=open(gltf_file,'w',encoding='utf-8')
-        json.dump(jdat,f,ensure_ascii=False,indent=2)
-        f.close()
+        if glb:
 
-        if verbose>2:
-            print('Closing .bin file:')
-        f2.close()
+            # The GLB file is a 12-byte header followed by a JSON
+            # chunk, padded with spaces, and a binary chunk, each
+            # of which begins with its length and type
+            json_bytes=json.dumps(jdat,ensure_ascii=False,
+                                  separators=(',',':')).encode('utf-8')
+            json_bytes+=b' '*((4-len(json_bytes)%4)%4)
+            total=12+8+len(json_bytes)+8+offset
+            
+            if verbose>2:
+                print('Writing GLB:')
+            with open(gltf_file,'wb') as f:
+                f.write(pack('<4sII',b'glTF',2,total))
+                f.write(pack('<I4s',len(json_bytes),b'JSON'))
+                f.write(json_bytes)
+                f.write(pack('<I4s',offset,b'BIN\x00'))
+                for arr in bin_list:
+                    f.write(arr.tobytes())
+                    
+        else:
+            
+            # write the json file
+            if verbose>2:
+                print('Writing JSON:')
+            f=open(gltf_file,'w',encoding='utf-8')
+            json.dump(jdat,f,ensure_ascii=False,indent=2)
+            f.close()
+
+            if verbose>2:
+                print('Writing .bin file:')
+            with open(bin_file,'wb') as f2:
+                for arr in bin_list:
+                    f2.write(arr.tobytes())
 
         if zip_file!='':
             print('zip_list:',zip_list)
@@ -1899,7 +1737,8 @@ class td_plot_base(yt_plot_base):
         
     def td_scatter(self, amp, args, mat_name: str = '',
                    r: float = 0.04, n_subdiv: int = 0, 
-                   metal: str = '',rough: str = ''):
+                   metal: str = '',rough: str = '',
+                   instance: bool = False):
         
         """Documentation for o2graph command ``td-scatter``:
 
@@ -1924,6 +1763,16 @@ class td_plot_base(yt_plot_base):
         ``col:``. If the value of ``r`` is less than or equal to zero,
         then the icospheres are written as points.
 
+        If ``instance=True``, then a single icosphere is created and
+        the points are stored as per-instance translations, scales,
+        and colors which are written to GLTF files using the
+        ``EXT_mesh_gpu_instancing`` extension. This gives much smaller
+        files and is much faster for large tables. In this mode, all
+        points share one material, so the metalness and roughness
+        cannot be taken from table columns, and the colors are
+        written to the ``_COLOR_0`` instance attribute, which not all
+        viewers support.
+
         If the x-, y- and z-limits are not set, then ``td-scatter``
         uses the minimum and maximum values from the scattered points
         to set these limits so that the output will be normalized
@@ -2030,6 +1879,61 @@ class td_plot_base(yt_plot_base):
                 rolo=numpy.min(cro)
                 rohi=numpy.max(cro)
 
+        if r>0 and instance:
+
+            # Construct one icosphere of unit radius at the origin
+            # which is shared by all of the points
+            vtmp,ntmp,ftmp,ttmp=icosphere(0,0,0,1,n_subdiv=n_subdiv)
+            gf=mesh_object('scatter',ftmp)
+            gf.vert_list=vtmp
+            gf.vn_list=ntmp
+
+            # The per-instance translations and scales
+            gf.inst_trans=numpy.zeros((n,3),dtype=numpy.float32)
+            gf.inst_trans[:,0]=(cx-self.xlo)/(self.xhi-self.xlo)
+            gf.inst_trans[:,1]=(cy-self.ylo)/(self.yhi-self.ylo)
+            gf.inst_trans[:,2]=(cz-self.zlo)/(self.zhi-self.zlo)
+            gf.inst_scale=numpy.full((n,3),r,dtype=numpy.float32)
+
+            if colors==True:
+                
+                gf.inst_color=numpy.zeros((n,3),dtype=numpy.float32)
+                gf.inst_color[:,0]=cr
+                gf.inst_color[:,1]=cg
+                gf.inst_color[:,2]=cb
+
+                if col_m!='' or col_ro!='':
+                    print('td_scatter(): Metalness and roughness',
+                          'columns are not supported with instancing.')
+                if metal=='' or col_m!='':
+                    metal_float=0.0
+                else:
+                    metal_float=float(metal)
+                if rough=='' or col_ro!='':
+                    rough_float=1.0
+                else:
+                    rough_float=float(rough)
+
+                # A white base color, so that the instance colors
+                # determine the color of each point
+                k=1
+                while self.to.is_mat('mat_scatter_'+str(k)):
+                    k=k+1
+                mat_name='mat_scatter_'+str(k)
+                mat=material(mat_name,[1,1,1],metal=metal_float,
+                             rough=rough_float)
+                self.to.add_mat(mat)
+
+            # Use the same material as the icospheres which are
+            # not instanced
+            gf.mat=mat_name
+            self.to.add_object(gf,verbose=self.verbose)
+
+            if self.verbose>1:
+                print('td_plot_base::td_scatter(): Done.')
+        
+            return
+        
         if r<=0:
 
             if colors==False:
@@ -2196,7 +2100,7 @@ class td_plot_base(yt_plot_base):
         #gf.vert_list=vert2
         #gf.vn_list=norms2
         if colors==False:
-            gf.mat='white'
+            gf.mat=mat_name
         self.to.add_object(gf,verbose=self.verbose)
 
         if self.verbose>1:
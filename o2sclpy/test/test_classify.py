@@ -61,6 +61,16 @@ def test_all(tmp_path):
         result=im.eval(x[0])
         print('exact,result 1:', exact,result)
         assert numpy.allclose(exact,result,rtol=1.0e-4)
+
+        # Test the class probabilities and the rejection function
+        proba=im.eval_proba_list(xa)
+        print('probabilities:',proba)
+        assert numpy.shape(proba)==(3,len(im.dtc.classes_))
+        assert numpy.allclose(im.dtc.classes_[numpy.argmax(proba,axis=1)],
+                              ya)
+        rej=im.reject_list(xa,-840)
+        print('reject:',rej)
+        assert numpy.array_equal(rej,[False,True,False])
         
         im.save(filename,'dtc')
         
@@ -73,6 +83,13 @@ def test_all(tmp_path):
         ya_result=im4.eval_list(xa)
         print('exact,result 7:', ya,ya_result)
         assert numpy.allclose(ya,ya_result,rtol=1.0e-4)
+
+        # Save the tree as arrays and memory-map them
+        im.save(filename,'dtc_arr',model_format='arrays')
+        im7=o2sclpy.classify_sklearn_dtc()
+        im7.load(filename,'dtc_arr',mmap=True)
+        assert numpy.array_equal(im7.eval_list(x),im.eval_list(x))
+        assert numpy.allclose(im7.eval_proba_list(xa),proba)
         print(' ')
         
     if True:
@@ -100,6 +117,23 @@ def test_all(tmp_path):
         ya_result=im5.eval_list(xa)
         print('exact,result 8:', ya,ya_result)
         assert numpy.allclose(ya,ya_result,rtol=1.0e-4)
+
+        # Save the weights as arrays and memory-map them
+        proba=im2.eval_proba_list(xa)
+        im2.save(filename,'mlpc_arr',model_format='arrays')
+        im9=o2sclpy.classify_sklearn_mlpc()
+        im9.load(filename,'mlpc_arr',mmap=True)
+        assert numpy.allclose(im9.eval_proba_list(xa),proba)
+        assert numpy.array_equal(im9.eval_list(x),im2.eval_list(x))
+        assert numpy.array_equal(im9.reject_list(xa,-840),
+                                 im2.reject_list(xa,-840))
+        
+        # Add the training data again and ensure the classifier
+        # remains consistent
+        im2.add_data(x,y,epochs=10)
+        result=im2.eval(x[1])
+        print('exact,result 10:', exact,result)
+        assert numpy.allclose(exact,result,rtol=1.0)
         print(' ')
         
     if True:
@@ -125,8 +159,116 @@ def test_all(tmp_path):
         ya_result=im6.eval_list(xa)
         print('exact,result 9:', ya,ya_result)
         assert numpy.allclose(ya,ya_result,rtol=1.0e-4)
+
+        # Save the means and variances as arrays and memory-map them
+        im3.save(filename,'gnb_arr',model_format='arrays')
+        im8=o2sclpy.classify_sklearn_gnb()
+        im8.load(filename,'gnb_arr',mmap=True)
+        assert numpy.array_equal(im8.eval_list(x),im3.eval_list(x))
         print(' ')
         
+def test_proba():
+
+    rng=numpy.random.default_rng(6)
+    x=numpy.concatenate((rng.normal(0,1,(100,2)),
+                         rng.normal([3,30],[1,10],(100,2))))
+    y=numpy.array([0]*100+[1]*100)
+    xa=rng.normal([1.5,15],[2,20],(50,2))
+
+    for transform_in in ['none','standard']:
+    
+        im=o2sclpy.classify_sklearn_mlpc()
+        im.set_data(x,y,transform_in=transform_in,hlayers=[10],
+                    random_state=0,max_iter=2000)
+        im2=o2sclpy.classify_sklearn_gnb()
+        im2.set_data(x,y,transform_in=transform_in)
+        
+        for c,model in [(im,im.mlpc),(im2,im2.gnb)]:
+            
+            xt=xa
+            if transform_in!='none':
+                xt=c.SS1.transform(xa)
+
+            # The probabilities, the rejection function, and the
+            # predictions all use the transformed points
+            proba=c.eval_proba_list(xa)
+            assert numpy.allclose(proba,model.predict_proba(xt))
+            assert numpy.allclose(c.eval_proba_list(xa.tolist()),proba)
+            assert numpy.array_equal(c.reject_list(xa,1,0.3),
+                                     proba[:,1]<0.3)
+            assert numpy.array_equal(c.eval_list(xa),model.predict(xt))
+            
+            c.outformat='list'
+            assert numpy.allclose(c.eval_proba_list(xa),proba)
+            assert isinstance(c.reject_list(xa,0),numpy.ndarray)
+
+            try:
+                c.reject_list(xa,2)
+                assert False
+            except ValueError:
+                pass
+
+        # The naive Bayes classifier is trained on the transformed
+        # data
+        if transform_in=='standard':
+            assert numpy.allclose(im2.gnb.theta_,
+                                  [numpy.mean(im2.SS1.transform(x[0:100]),
+                                              axis=0),
+                                   numpy.mean(im2.SS1.transform(x[100:]),
+                                              axis=0)])
+            
+    return
+        
+def test_mlpc_arrays(tmp_path):
+
+    from o2sclpy.classify import _mlpc_to_arrays, _mlpc_arrays
+    from o2sclpy.classify import _write_model_arrays, _read_model_arrays
+
+    # Handle the tmp_path fixture gracefully if we're not using pytest
+    if 'pytest' in sys.modules:
+        filename=str(tmp_path/"test_mlpc_arrays.h5")
+    else:
+        filename=str(tmp_path+"test_mlpc_arrays.h5")
+
+    rng=numpy.random.default_rng(7)
+    x=rng.normal(0,1,(300,3))
+    xa=rng.normal(0,1.5,(40,3))
+
+    # Three classes with a softmax output and two classes with a
+    # logistic output, for each hidden layer activation
+    y3=numpy.argmax(x,axis=1)*10-5
+    y2=(x[:,0]*x[:,1]>0).astype(int)
+    for act in ['relu','tanh','logistic']:
+        for y in [y3,y2]:
+            im=o2sclpy.classify_sklearn_mlpc()
+            im.set_data(x,y,hlayers=[8,6],activation=act,
+                        solver='lbfgs',random_state=0,max_iter=2000,
+                        transform_in='standard')
+            arrays,meta=_mlpc_to_arrays(im.mlpc)
+            _write_model_arrays(filename,'mlpc_'+act,arrays)
+            arrays2=_read_model_arrays(filename,'mlpc_'+act,
+                                       list(arrays.keys()),mmap=True)
+            for key in arrays:
+                assert isinstance(arrays2[key],numpy.memmap)
+                assert numpy.array_equal(arrays2[key],arrays[key])
+            ma=_mlpc_arrays(arrays2,meta)
+            
+            xt=im.SS1.transform(xa)
+            assert numpy.allclose(ma.predict_proba(xt),
+                                  im.mlpc.predict_proba(xt),rtol=1.0e-10,
+                                  atol=1.0e-12)
+            assert numpy.array_equal(ma.predict(xt),im.mlpc.predict(xt))
+
+            # The classifier gives the same results with the arrays
+            proba=im.eval_proba_list(xa)
+            pred=im.eval_list(xa)
+            im.mlpc=ma
+            assert numpy.allclose(im.eval_proba_list(xa),proba,
+                                  rtol=1.0e-10,atol=1.0e-12)
+            assert numpy.array_equal(im.eval_list(xa),pred)
+            
+    return
+        
 if __name__ == '__main__':
 
     # Handle the tmp_path fixture gracefully if we're not using pytest
@@ -134,5 +276,10 @@ if __name__ == '__main__':
         test_all()
     else:
         test_all('./')
+    test_proba()
+    if 'pytest' in sys.modules:
+        test_mlpc_arrays()
+    else:
+        test_mlpc_arrays('./')
 
     print('All tests passed.')
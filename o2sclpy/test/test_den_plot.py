@@ -120,7 +120,127 @@ def test_all(tmp_path):
     
     return
     
+def test_update():
+
+    print('Running test_den_plot.py:test_update().')
+
+    plot.clf()
+    
+    x=numpy.linspace(0,1,5)
+    y=numpy.linspace(0,1,6)
+    m=numpy.outer(numpy.sin(x),numpy.cos(y))
+    
+    pb=o2sclpy.plot_base()
+    pb.blit=True
+    pb.den_plot([x,y,m],name='den')
+    pb.plot([x,x**2],name='line')
+
+    # Update the named artists in place
+    for k in range(1,4):
+        pb.den_plot([x,y,m*k],name='den')
+        pb.plot([x,x**2*k],name='line')
+        
+    assert len(pb.axes.images)==1
+    assert len(pb.axes.lines)==1
+    assert numpy.allclose(pb.axes.lines[0].get_ydata(),x**2*3)
+    assert numpy.allclose(pb.axes.images[0].get_array(),
+                          (m*3).transpose())
+
+    # Reusing a name for a different kind of plot creates a new
+    # artist rather than updating the old one
+    pb.scatter([x,x**3],name='line')
+    assert len(pb.axes.collections)==1
+    assert numpy.allclose(pb.artist_dict['line'].get_offsets()[:,1],x**3)
+    pb.den_plot([x,y,m],name='line')
+    assert len(pb.axes.images)==2
+    pb.den_plot([x,y,m],name='line',pcm=True)
+    assert pb.artist_dict['line'] is pb.axes.collections[-1]
+    pb.plot([x,x**4],name='den')
+    assert len(pb.axes.lines)==2
+    assert numpy.allclose(pb.artist_dict['den'].get_ydata(),x**4)
+    
+    print('Done in test_den_plot.py:test_update().')
+    
+    return
+    
+def test_lod():
+
+    print('Running test_den_plot.py:test_lod().')
+
+    plot.clf()
+
+    rng=numpy.random.default_rng(1)
+    x=numpy.linspace(0,1,100000)
+    y=numpy.sin(10*x)+0.1*rng.standard_normal(len(x))
+    
+    pb=o2sclpy.plot_base()
+    pb.lod_max=1000
+    pb.plot([x,y])
+    (nx,ny)=pb._lod_pixels()
+
+    # The decimated line keeps at most four points in each bucket
+    # and the same extrema
+    xd=pb.axes.lines[0].get_xdata()
+    yd=pb.axes.lines[0].get_ydata()
+    assert len(xd)<=nx*16
+    assert numpy.max(yd)==numpy.max(y)
+    assert numpy.min(yd)==numpy.min(y)
+    assert xd[0]==x[0] and xd[-1]==x[-1]
+
+    # Large scatter plots are reduced and rasterized
+    pb.scatter([rng.standard_normal(len(x)),
+                rng.standard_normal(len(x))],lod=1000)
+    assert len(pb.last_image.get_offsets())<len(x)
+    assert pb.last_image.get_rasterized()==True
+    
+    print('Done in test_den_plot.py:test_lod().')
+    
+    return
+    
+def test_dpa():
+
+    import pickle
+    import multiprocessing
+    from o2sclpy.o2graph_plotter import _dpa_init, _dpa_render
+    from o2sclpy.o2graph_plotter import _dpa_state, _dpa_frames
+
+    print('Running test_den_plot.py:test_dpa().')
+
+    # A small rank 3 tensor animated along the last index
+    x=numpy.linspace(0,1,12)
+    y=numpy.linspace(0,1,10)
+    z=numpy.linspace(1,2,3)
+    arr=numpy.exp(x[:,None,None]*z[None,None,:]+y[None,:,None])
+
+    fig,ax=plot.subplots(figsize=(2,2),dpi=50)
+    im=ax.imshow(arr[:,:,2].transpose(),origin='lower',aspect='auto')
+    fig.colorbar(im)
+    init_args=(pickle.dumps(fig),0,arr,2,True,3,True,False,0,0,
+               None,None)
+    plot.close(fig)
+
+    # Render the frames serially and with a pool of processes for
+    # each start method, with the tensor in shared memory
+    _dpa_init(*init_args)
+    serial=[_dpa_render(k) for k in range(0,3)]
+    _dpa_state.clear()
+    for method in multiprocessing.get_all_start_methods():
+        parallel=list(_dpa_frames(init_args,2,method))
+        assert len(parallel)==3
+        for k in range(0,3):
+            assert serial[k].shape==(100,100,3)
+            assert numpy.array_equal(serial[k],parallel[k])
+    # The frames are different from each other
+    assert not numpy.array_equal(serial[0],serial[2])
+    
+    print('Done in test_den_plot.py:test_dpa().')
+    
+    return
+    
 if __name__ == '__main__':
     test_all()
+    test_update()
+    test_lod()
+    test_dpa()
     print('All tests passed.')
     
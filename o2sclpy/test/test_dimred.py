@@ -49,6 +49,38 @@ def test_pca():
         print('test_pca(): column',i,tab.get_column_name(i))
     print(pca2.pca.explained_variance_ratio_)
 
+    # Incremental PCA directly from the table columns
+    pca3=o2sclpy.dimred_sklearn_pca()
+    pca3.run_table(tab,in_cols,n_components=4,method='incremental',
+                   chunk_size=500,out_prefix='ipca_')
+    for j in range(0,4):
+        assert numpy.isfinite(tab['ipca_'+str(j)][0:nrows]).all()
+        cc=numpy.corrcoef(tab['pca_'+str(j)][0:nrows],
+                          tab['ipca_'+str(j)][0:nrows])[0,1]
+        assert abs(cc)>0.95
+
+    return
+
+def test_pca_stream():
+
+    digits=load_digits()['data']
+    
+    pca=o2sclpy.dimred_sklearn_pca()
+    out_data=pca.run(digits,n_components=4)
+
+    # Stream the data in blocks and compare with the full PCA
+    pca2=o2sclpy.dimred_sklearn_pca()
+    pca2.run_stream(digits,n_components=4,chunk_size=400)
+    assert numpy.allclose(pca.pca.explained_variance_ratio_,
+                          pca2.pca.explained_variance_ratio_,
+                          rtol=0.05)
+    
+    # The stream can also be a list of blocks
+    blocks=[digits[i:i+600] for i in range(0,digits.shape[0],600)]
+    pca3=o2sclpy.dimred_sklearn_pca()
+    pca3.run_stream(blocks,n_components=4)
+    assert numpy.allclose(pca2.pca.mean_,pca3.pca.mean_)
+
     return
 
 def test_tsne():
@@ -81,8 +113,29 @@ def test_tsne():
 
     return
 
+def test_tsne_cache():
+
+    digits=load_digits()['data'][0:300]
+
+    # The second call uses the cached embedding
+    tsne=o2sclpy.dimred_sklearn_tsne()
+    out1=tsne.run(digits,random_state=1,method='barnes_hut')
+    tsne2=o2sclpy.dimred_sklearn_tsne()
+    out2=tsne2.run(digits,random_state=1,method='barnes_hut')
+    assert numpy.allclose(out1,out2)
+
+    # The cached neighbors give the same result as scikit-learn
+    tsne3=o2sclpy.dimred_sklearn_tsne()
+    out3=tsne3.run(digits,random_state=1,method='barnes_hut',
+                   cache=False)
+    assert numpy.allclose(out1,out3)
+
+    return
+
 if __name__ == '__main__':
     test_pca()
+    test_pca_stream()
     test_tsne()
+    test_tsne_cache()
     print('All tests passed.')
 
@@ -55,6 +55,17 @@ def test_gmm():
                          [0.0,0.0]]))
     print(' ')
 
+    # Test components_list() in chunks
+    print('components_list():')
+    pts=numpy.array([[0.7,0.7],[0.0,0.0],[0.3,0.3]])
+    cl=gs.components_list(pts,chunk_size=2)
+    print(cl)
+    assert numpy.allclose(cl,gs.components(pts))
+    lw=gs.components_list(pts,log=True,normalize=False)
+    assert numpy.allclose(numpy.log(numpy.sum(numpy.exp(lw),axis=1)),
+                          gs.score_samples(pts))
+    print(' ')
+
     # Test predict()
     print('predict():')
     print(gs.predict([0.5,0.5]))
@@ -92,6 +103,27 @@ def test_gmm():
     print('precisions:',gs.gm.precisions_)
     print(' ')
 
+    # Test the bulk export
+    w,m,c,pc=gs.get_data_full()
+    assert numpy.shape(c)==(2,2,2) and c.flags['C_CONTIGUOUS']
+    for k in range(0,2):
+        assert numpy.allclose(c[k]@pc[k]@pc[k].T,numpy.eye(2))
+
+    # Test the streaming fit, starting from the previous fit
+    gs2=o2sclpy.gmm_sklearn()
+    gs2.set_data_str(x,'n_components=2')
+    gs2.set_data_stream(x,chunk_size=30,warm_start=True,tol=1.0e-8)
+    print('set_data_stream():',gs.log_pdf(x),gs2.log_pdf(x))
+    assert gs2.log_pdf(x)>=gs.log_pdf(x)-1.0e-3
+
+    # Test the online mode with a generator
+    gs3=o2sclpy.gmm_sklearn()
+    gs3.set_data_stream((x[i:i+25] for i in range(0,N,25)),
+                        n_components=2,chunk_size=25,mode='online')
+    print('online:',gs3.log_pdf(x))
+    assert numpy.isfinite(gs3.log_pdf(x))
+    print(' ')
+    
     return
 
 def test_bgmm():
@@ -153,6 +185,18 @@ def test_bgmm():
     print('precisions:',gs.bgm.precisions_)
     print(' ')
 
+    # Test the exports
+    print('get_data():',gs.get_data()[0])
+    w,m,c,pc=gs.get_data_full()
+    assert numpy.allclose(w,gs.get_data()[0])
+
+    # Test the streaming fit
+    gs2=o2sclpy.bgmm_sklearn()
+    gs2.set_data_stream(x,n_components=2,chunk_size=30)
+    print('set_data_stream():',gs.log_pdf(x),gs2.log_pdf(x))
+    assert numpy.isfinite(gs2.log_pdf(x))
+    print(' ')
+
     return
 
 if __name__ == '__main__':
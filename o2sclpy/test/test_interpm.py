@@ -356,6 +356,13 @@ def test_all(tmp_path):
             print('eval_list():',p(interp3c))
             assert numpy.allclose(exact,interp3c,rtol=1.0)
 
+            # Test incremental training
+            im3.add_data(x[0:100],y[0:100],epochs=20)
+            interp3f=im3.eval_list(v2)
+            print('      exact:',p(exact))
+            print(' add_data():',p(interp3f))
+            assert numpy.allclose(exact,interp3f,rtol=1.0)
+
             # Test with two outputs instead of one
             if ik==0:
                 im3.set_data(x,y2,verbose=0,test_size=0.1,solver='lbfgs',
@@ -413,7 +420,15 @@ def test_all(tmp_path):
             print('      exact:',p(exact))
             print('eval_list():',p(interp4b))
             assert numpy.allclose(exact,interp4b,rtol=1.0)
-            
+
+            # Ensure the flattened tree gives the same result as
+            # scikit-learn's predict() function
+            if ik==0:
+                assert numpy.array_equal(im4.eval_list(v2),
+                                         im4.dtr.predict(v2))
+                interp4f=im4.eval_array(v2)
+                assert numpy.shape(interp4f)==(2,1)
+
             save_str=im4.save(filename,'ti_dtr')
             im4b=o2sclpy.interpm_sklearn_dtr()
             im4b.load(filename,'ti_dtr')
@@ -532,6 +547,28 @@ def test_all(tmp_path):
             interp5d=im5.deriv(v,1)
             print('      exact:',p(exact))
             print('   deriv(1):',p(interp5d))
+
+            # Test incremental training
+            im5.add_data(x[0:100],y[0:100],epochs=20)
+            exact=[f(v2[0,0],v2[0,1]),f(v2[1,0],v2[1,1])]
+            interp5e=im5.eval_list(v2)
+            print('      exact:',p(exact))
+            print(' add_data():',p(interp5e))
+            assert numpy.allclose(exact,interp5e,rtol=1.0)
+
+            # Test training from a source of data chunks
+            if ik==0:
+                src=[(x[i:i+250],y[i:i+250]) for i in range(0,N,250)]
+                im5s=o2sclpy.interpm_torch_dnn()
+                im5s.set_data(src,None,verbose=0,test_size=0.1,
+                              hlayers=[60,60],transform_in='standard',
+                              transform_out='standard',epochs=100,
+                              patience=20,device='cpu',batch_size=64,
+                              buffer_size=500)
+                interp5f=im5s.eval_list(v2)
+                print('      exact:',p(exact))
+                print('     stream:',p(interp5f))
+                assert numpy.allclose(exact,interp5f,rtol=1.0)
             print(' ')
             
             # AWS, 3/11/25: this doesn't work yet
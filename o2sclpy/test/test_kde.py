@@ -77,6 +77,17 @@ def test_kde2():
     print(ks.log_pdf([0,0]))
     print(ks.log_pdf([6300,45]))
 
+    # Compare the batch evaluation with single points
+    pts=numpy.array([[-6300,18],[0,0],[6300,45]])
+    lp=ks.log_pdf_batch(pts,chunk_size=2,n_jobs=2)
+    for i in range(0,3):
+        assert numpy.isclose(lp[i],ks.log_pdf(pts[i]))
+
+    # Sample into a preallocated array
+    buf=numpy.zeros((1000,2))
+    ks.sample(out=buf,chunk_size=300)
+    assert numpy.median(numpy.abs(buf[:,0]))>3000
+
     return
 
 def test_kde3():
@@ -212,6 +223,143 @@ def test_kde6():
     
     return
 
+def test_kde7():
+    """
+    Compare the tree-based scipy KDE with the exact one
+    """
+
+    print("Compare the tree-based scipy KDE with the exact one.\n")
+    N=2000
+    x=numpy.zeros((N,2))
+    y=numpy.zeros((N))
+    for i in range(0,N):
+        x[i,0]=numpy.sin(float(i*1e4))+0.1*numpy.cos(float(i*3e4))
+        x[i,1]=numpy.cos(float(i*2e4))
+        y[i]=1+i%3
+    
+    ks1=o2sclpy.kde_scipy()
+    ks1.set_data(x,weights=y,bw_method=0.1)
+    ks2=o2sclpy.kde_scipy()
+    ks2.set_data(x,weights=y,bw_method=0.1,method='tree',rtol=1.0e-6)
+
+    pts=numpy.array([[0.1*i-1.0,0.1*j-1.0] for i in range(0,21)
+                     for j in range(0,21)])
+    lp1=ks1.log_pdf(pts)
+    lp2=ks2.log_pdf(pts)
+    print('max relative difference:',numpy.max(numpy.abs(
+        numpy.expm1(lp2-lp1))))
+    assert numpy.allclose(numpy.exp(lp2),numpy.exp(lp1),rtol=1.0e-6,
+                          atol=0.0)
+    assert numpy.isclose(ks2.pdf(pts[5]),ks1.pdf(pts[5]),rtol=1.0e-6)
+    
+    return
+
+def test_kde8(tmp_path):
+    """
+    Test the cached bandwidth selection for the sklearn KDE
+    """
+
+    print("Test the cached bandwidth selection for the sklearn KDE.\n")
+    N=200
+    x=numpy.zeros((N,2))
+    for i in range(0,N):
+        x[i,0]=numpy.sin(float(i*1e4))
+        x[i,1]=numpy.cos(float(i*2e4))
+
+    ks1=o2sclpy.kde_sklearn()
+    ks1.set_data(x,numpy.logspace(-3,0,20),verbose=1,n_jobs=2,
+                 cache_dir=str(tmp_path))
+    ks2=o2sclpy.kde_sklearn()
+    ks2.set_data(x,numpy.logspace(-3,0,20),verbose=1,
+                 cache_dir=str(tmp_path))
+    print('bws:',ks1.get_bandwidth(),ks2.get_bandwidth())
+    assert ks1.get_bandwidth()==ks2.get_bandwidth()
+    assert numpy.allclose(ks1.cv_scores,ks2.cv_scores)
+    assert ks1.cv_scores[numpy.argmax(ks1.cv_bw==ks1.get_bandwidth())]==(
+        numpy.max(ks1.cv_scores))
+    
+    return
+
+def test_kde9():
+    """
+    Test the evaluation of the sklearn KDE on a grid
+    """
+
+    print("Test the evaluation of the sklearn KDE on a grid.\n")
+    N=2000
+    x=numpy.zeros((N,2))
+    for i in range(0,N):
+        x[i,0]=numpy.sin(float(i*1e4))*2+1
+        x[i,1]=numpy.cos(float(i*2e4))
+
+    ks=o2sclpy.kde_sklearn()
+    ks.set_data(x,[],bandwidth=0.05)
+    g0=numpy.linspace(-1,3,41)
+    g1=numpy.linspace(-1,1,31)
+    d1=ks.pdf_grid([g0,g1],method='exact')
+    d2=ks.pdf_grid([g0,g1],method='fft')
+    print('max,diff:',numpy.max(d1),numpy.max(numpy.abs(d1-d2)))
+    assert d1.shape==(41,31)
+    assert numpy.allclose(d1[10,20],ks.pdf([g0[10],g1[20]]))
+    assert numpy.max(numpy.abs(d1-d2))<5.0e-3*numpy.max(d1)
+    
+    return
+
+def test_kde10():
+    """
+    Check the block sizes and the accuracy of the tree-based scipy KDE
+    """
+    import scipy.spatial
+
+    # A KD-tree which records the number of pairs in each block
+    n_pairs=[]
+    class counting_tree(scipy.spatial.cKDTree):
+        def sparse_distance_matrix(self,*args,**kwargs):
+            pairs=super().sparse_distance_matrix(*args,**kwargs)
+            n_pairs.append(len(pairs))
+            return pairs
+
+    rng=numpy.random.default_rng(0)
+    x=rng.standard_normal((20000,2))
+    w=rng.random(20000)
+    pts=rng.standard_normal((2000,2))
+
+    cKDTree=scipy.spatial.cKDTree
+    scipy.spatial.cKDTree=counting_tree
+    try:
+        
+        ks1=o2sclpy.kde_scipy()
+        ks1.set_data(x,weights=w)
+        ks2=o2sclpy.kde_scipy()
+        ks2.set_data(x,weights=w,method='tree')
+        
+        # With the default bandwidth, the radius contains a large
+        # fraction of the data, so the exact method is used and no
+        # pairs are stored
+        lp1=ks1.log_pdf(pts)
+        lp2=ks2.log_pdf(pts)
+        assert n_pairs==[]
+        assert numpy.array_equal(lp1,lp2)
+
+        # With a narrow bandwidth and a small limit on the number of
+        # pairs, the points are evaluated in many small blocks
+        ks3=o2sclpy.kde_scipy()
+        ks3.set_data(x,weights=w,bw_method=0.05,method='tree')
+        ks3.max_pairs=20000
+        lp3=ks3.log_pdf(pts)
+        print('Blocks, max pairs:',len(n_pairs),max(n_pairs))
+        assert len(n_pairs)>10
+        assert max(n_pairs)<=2*ks3.max_pairs
+        ks1.set_data(x,weights=w,bw_method=0.05)
+        lp1=ks1.log_pdf(pts)
+        assert numpy.allclose(numpy.exp(lp3),numpy.exp(lp1),rtol=1.0e-4,
+                              atol=0.0)
+        
+    finally:
+        scipy.spatial.cKDTree=cKDTree
+    
+    return
+
 if __name__ == '__main__':
     print('----------------------------------------------------')
     test_kde1()
@@ -225,4 +373,12 @@ if __name__ == '__main__':
     test_kde5()
     print('----------------------------------------------------')
     test_kde6()
+    print('----------------------------------------------------')
+    test_kde7()
+    print('----------------------------------------------------')
+    test_kde8('./')
+    print('----------------------------------------------------')
+    test_kde9()
+    print('----------------------------------------------------')
+    test_kde10()
     print('All tests passed.')
@@ -23,6 +23,7 @@ import o2sclpy
 import numpy
 import random
 import sys
+import os
 
 plots=True
 if 'pytest' in sys.modules:
@@ -55,6 +56,13 @@ def test_all():
     for i in range(0,300):
         out.append(nsf.sample(1))
 
+    # Sample in blocks into a preallocated buffer
+    buf=numpy.zeros((1000,2))
+    nsf.sample_fill(buf,chunk_size=300)
+    assert numpy.all(numpy.isfinite(buf))
+    assert numpy.median(numpy.abs(buf[:,0]))<1.0
+    assert numpy.all(buf[:,1]!=0.0)
+    
     if plots:
         pb=o2sclpy.plot_base()
         pb.xlimits(-1,1)
@@ -79,6 +87,12 @@ def test_all():
             y=nsf.log_pdf(x)
             ymat[i,j]=numpy.exp(y)
 
+    # Evaluate the full grid in chunks and compare
+    pts=numpy.array([[xgrid[i],ygrid[j]] for i in range(0,nx)
+                     for j in range(0,ny)])
+    ymat2=numpy.exp(nsf.log_pdf(pts,chunk_size=100)).reshape(nx,ny)
+    assert numpy.allclose(ymat,ymat2,rtol=1.0e-3)
+
     print('Plotting density')
     if plots:
         pb=o2sclpy.plot_base()
@@ -88,7 +102,55 @@ def test_all():
         pb.den_plot([xgrid,ygrid,ymat])
         pb.show()
             
+
+def test_checkpoint(tmp_path):
+
+    import torch
+    
+    x=numpy.random.default_rng(0).normal(size=(200,2))
+    filename=os.path.join(str(tmp_path),'nflows_ckpt.pt')
+    opts=('num_layers=2,num_hidden_channels=8,n_threads=1,'+
+          'checkpoint_file='+filename)
+
+    # Train for 20 iterations without interruption
+    torch.manual_seed(1)
+    nsf=o2sclpy.nflows_nsf()
+    nsf.set_data_str(x,'max_iter=20,num_layers=2,num_hidden_channels=8')
+
+    # Train for 10 iterations, then resume from the checkpoint
+    torch.manual_seed(1)
+    nsf2=o2sclpy.nflows_nsf()
+    nsf2.set_data_str(x,'max_iter=10,checkpoint_every=5,'+opts)
+    nsf3=o2sclpy.nflows_nsf()
+    nsf3.set_data_str(x,'max_iter=20,resume=True,'+opts)
+    
+    assert numpy.allclose(nsf.log_pdf(x[0:10]),nsf3.log_pdf(x[0:10]))
+
+def test_offset():
+
+    import torch
+    
+    # Data with a large offset relative to its spread, which cannot
+    # be represented accurately in single precision
+    x=1.0e6+numpy.random.default_rng(0).normal(size=(200,2))
+    nsf=o2sclpy.nflows_nsf()
+    nsf.set_data_str(x,'max_iter=10,num_layers=2,num_hidden_channels=8')
+
+    # The standardization is done in double precision
+    xs=nsf.SS1.transform(x[0:10]).astype(numpy.float32)
+    with torch.no_grad():
+        lp=nsf.model.log_prob(torch.from_numpy(xs)).numpy()
+    assert numpy.allclose(nsf.log_pdf(x[0:10]),lp)
+
+    # The inverse scaling of the samples is also done in double
+    # precision, so they are not quantized to the float32 spacing
+    # near 1.0e6
+    out=nsf.sample(100)
+    assert out.dtype==numpy.float64
+    assert numpy.all(numpy.mod(out,0.0625)!=0.0)
     
 if __name__ == '__main__':
     test_all()
+    test_checkpoint('./')
+    test_offset()
     print('All tests passed.')
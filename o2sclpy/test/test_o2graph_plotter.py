@@ -0,0 +1,85 @@
+#  -------------------------------------------------------------------
+#  
+#  Copyright (C) 2025, Andrew W. Steiner
+#  
+#  This file is part of O2sclpy.
+#  
+#  O2sclpy is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  O2sclpy is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with O2sclpy. If not, see <http://www.gnu.org/licenses/>.
+#  
+#  -------------------------------------------------------------------
+#
+import numpy
+import o2sclpy
+import matplotlib.pyplot as plot
+
+def test_corner():
+
+    print('Running test_o2graph_plotter.py:test_corner().')
+
+    plot.close('all')
+    
+    rng=numpy.random.default_rng(3)
+    x=rng.standard_normal(5000)
+    y=0.5*x+rng.standard_normal(5000)
+    z=rng.uniform(2,3,5000)
+    names=[b'x',b'y',b'z']
+    bins=20
+    
+    o2gp=o2sclpy.o2graph_plotter()
+    o2gp.fig_dict='fig_size_x=5,fig_size_y=5'
+    o2gp._corner_plot(names,[x,y,z],bins=bins,n_jobs=2,chunk_size=1000)
+
+    # The figure comes from canvas() and has one panel for each
+    # entry on or below the diagonal
+    assert numpy.allclose(o2gp.fig.get_size_inches(),[5,5])
+    assert 'main' not in o2gp.axes_dict
+    visible=[ax for ax in o2gp.fig.axes if ax.get_visible()]
+    assert len(visible)==6
+    for i in range(0,3):
+        for j in range(0,3):
+            key='corner_'+str(i)+'_'+str(j)
+            assert (key in o2gp.axes_dict)==(j<=i)
+    assert o2gp.axes is o2gp.axes_dict['corner_2_0']
+    left=o2gp.axes_dict['corner_0_0'].get_position().x0
+    bottom=o2gp.axes_dict['corner_2_2'].get_position().y0
+    assert o2gp.axes_dict['corner_2_0'].get_position().x0==left
+    assert o2gp.axes_dict['corner_2_0'].get_position().y0==bottom
+    
+    for k,v in enumerate([x,y,z]):
+        ax=o2gp.axes_dict['corner_'+str(k)+'_'+str(k)]
+        
+        # The diagonal histograms match numpy
+        counts,edges=numpy.histogram(v,bins=bins)
+        st=ax.patches[0]
+        assert numpy.array_equal(st.get_data().values,counts)
+        assert numpy.allclose(st.get_data().edges,edges)
+
+        # The quantile lines match numpy to within a small fraction
+        # of the range
+        qs=[line.get_xdata()[0] for line in ax.lines]
+        q2=numpy.quantile(v,[0.16,0.5,0.84])
+        assert numpy.allclose(qs,q2,atol=1.0e-3*(v.max()-v.min()))
+
+    # The off-diagonal panels match a numpy two-dimensional histogram
+    img=o2gp.axes_dict['corner_1_0'].images[0]
+    c2,ex,ey=numpy.histogram2d(x,y,bins=bins)
+    assert numpy.array_equal(img.get_array(),c2.transpose())
+    
+    print('Done in test_o2graph_plotter.py:test_corner().')
+    
+    return
+
+if __name__ == '__main__':
+    test_corner()
+    print('All tests passed.')
@@ -0,0 +1,316 @@
+#  -------------------------------------------------------------------
+#  
+#  Copyright (C) 2025, Andrew W. Steiner
+#  
+#  This file is part of O2sclpy.
+#  
+#  O2sclpy is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  O2sclpy is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with O2sclpy. If not, see <http://www.gnu.org/licenses/>.
+#  
+#  -------------------------------------------------------------------
+#
+import os
+import json
+import struct
+import numpy
+import o2sclpy
+from o2sclpy.td_plot_base import threed_objects, mesh_object, material
+from o2sclpy.utils import icosphere
+
+# The numpy data types of the GLTF component types
+gltf_dtypes={5121: '<u1', 5123: '<u2', 5125: '<u4', 5126: '<f4'}
+gltf_ncomp={'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4}
+
+def read_glb(fname):
+    """Read the GLB file ``fname``, check the header and the chunks,
+    and return the JSON and the binary chunk
+    """
+    with open(fname,'rb') as f:
+        data=f.read()
+
+    # The header
+    magic,version,total=struct.unpack('<4sII',data[0:12])
+    assert magic==b'glTF'
+    assert version==2
+    assert total==len(data)
+
+    # The JSON chunk
+    json_len,json_type=struct.unpack('<I4s',data[12:20])
+    assert json_type==b'JSON'
+    assert json_len%4==0
+    jdat=json.loads(data[20:20+json_len].decode('utf-8'))
+
+    # The binary chunk, which is the rest of the file
+    bin_start=20+json_len
+    bin_len,bin_type=struct.unpack('<I4s',data[bin_start:bin_start+8])
+    assert bin_type==b'BIN\x00'
+    assert bin_len%4==0
+    assert bin_start+8+bin_len==total
+    assert jdat['buffers'][0]['byteLength']==bin_len
+    assert 'uri' not in jdat['buffers'][0]
+    
+    return jdat,data[bin_start+8:]
+
+def read_accessor(jdat,bin_data,index):
+    """Return the data for accessor ``index`` as a numpy array
+    """
+    acc=jdat['accessors'][index]
+    bv=jdat['bufferViews'][acc['bufferView']]
+    nc=gltf_ncomp[acc['type']]
+    arr=numpy.frombuffer(bin_data,dtype=gltf_dtypes[acc['componentType']],
+                         count=acc['count']*nc,offset=bv['byteOffset'])
+    assert arr.nbytes==bv['byteLength']
+    if nc>1:
+        return arr.reshape(-1,nc)
+    return arr
+
+def check_buffer(jdat,bin_data):
+    """Check the bufferViews and accessors
+    """
+    assert jdat['buffers'][0]['byteLength']==len(bin_data)
+    end=0
+    for bv in jdat['bufferViews']:
+        assert bv['byteOffset']%4==0
+        assert bv['byteOffset']>=end
+        end=bv['byteOffset']+bv['byteLength']
+        assert end<=len(bin_data)
+    for i in range(0,len(jdat['accessors'])):
+        acc=jdat['accessors'][i]
+        arr=read_accessor(jdat,bin_data,i)
+        assert len(arr)==acc['count']
+        if 'max' in acc:
+            assert numpy.array_equal(acc['max'],arr.max(axis=0))
+            assert numpy.array_equal(acc['min'],arr.min(axis=0))
+    return
+
+def test_gltf(tmp_path):
+
+    print('Running test_td_plot_base.py:test_gltf().')
+    
+    to=threed_objects()
+    to.mesh_list=[]
+    to.mat_list=[]
+    to.add_mat(material('red',[1,0,0]))
+    to.add_mat(material('blue',[0,0,1,0.5]))
+
+    # A mesh with two primitives from the per-face materials, and
+    # which does not use all of its vertices
+    rng=numpy.random.default_rng(4)
+    v1=rng.uniform(-1,1,(9,3))
+    f1=[[0,1,2,'red'],[2,3,4,'red'],[4,5,6,'blue'],[6,7,1,'red']]
+    m1=mesh_object('m1',f1)
+    m1.vert_list=v1.tolist()
+    m1.vn_list=(v1/numpy.linalg.norm(v1,axis=1)[:,None]).tolist()
+    to.add_object(m1)
+
+    # A mesh with a single material and an odd number of indices,
+    # so the index bufferView needs padding
+    v2=rng.uniform(2,3,(3,3))
+    f2=[[0,1,2]]
+    m2=mesh_object('m2',f2,mat='blue')
+    m2.vert_list=v2.tolist()
+    to.add_object(m2)
+
+    wdir=str(tmp_path)
+    to.write_gltf(wdir,'scene.gltf')
+    to.write_gltf(wdir,'scene.glb')
+    assert os.path.isfile(wdir+'/scene.bin')
+    
+    with open(wdir+'/scene.gltf') as f:
+        jdat=json.load(f)
+    with open(wdir+'/scene.bin','rb') as f:
+        bin_data=f.read()
+    assert jdat['buffers'][0]['uri']=='scene.bin'
+    jdat2,bin_data2=read_glb(wdir+'/scene.glb')
+
+    # The two files contain the same scene
+    assert bin_data==bin_data2
+    del jdat['buffers'][0]['uri']
+    assert jdat==jdat2
+    
+    check_buffer(jdat2,bin_data2)
+    assert [m['name'] for m in jdat2['materials']]==['red','blue']
+    assert 'extensionsUsed' not in jdat2
+
+    # The faces were sorted by material in add_object()
+    assert sorted(map(tuple,m1.faces))==sorted(map(tuple,f1))
+    
+    # Decode the triangles of each primitive and compare them, and
+    # the materials, with the input
+    for k,(verts,faces,mat) in enumerate([(v1,m1.faces,''),
+                                          (v2,m2.faces,'blue')]):
+        tri=[]
+        tri_mat=[]
+        for prim in jdat2['meshes'][k]['primitives']:
+            pos=read_accessor(jdat2,bin_data2,prim['attributes']['POSITION'])
+            ind=read_accessor(jdat2,bin_data2,prim['indices'])
+            assert ind.max()<len(pos)
+            tri.append(pos[ind].reshape(-1,3,3))
+            name=jdat2['materials'][prim['material']]['name']
+            tri_mat+=[name]*(len(ind)//3)
+        tri=numpy.concatenate(tri)
+        assert numpy.array_equal(tri,verts[[face[0:3] for face in faces]].
+                                 astype(numpy.float32))
+        assert tri_mat==[face[3] if len(face)==4 else mat
+                         for face in faces]
+    assert len(jdat2['meshes'][0]['primitives'])==2
+        
+    print('Done in test_td_plot_base.py:test_gltf().')
+    
+    return
+
+def test_instancing(tmp_path):
+
+    print('Running test_td_plot_base.py:test_instancing().')
+    
+    to=threed_objects()
+    to.mesh_list=[]
+    to.mat_list=[]
+    to.add_mat(material('white',[1,1,1]))
+
+    # An instanced icosphere with scales and colors, as created by
+    # td_scatter() with instance=True
+    n=1000
+    rng=numpy.random.default_rng(5)
+    vtmp,ntmp,ftmp,ttmp=icosphere(0,0,0,1,n_subdiv=1)
+    m1=mesh_object('scatter',ftmp,mat='white')
+    m1.vert_list=vtmp
+    m1.vn_list=ntmp
+    m1.inst_trans=rng.random((n,3)).astype(numpy.float32)
+    m1.inst_scale=numpy.full((n,3),0.04,dtype=numpy.float32)
+    m1.inst_color=rng.random((n,3)).astype(numpy.float32)
+    to.add_object(m1)
+
+    # An instanced triangle with only translations and RGBA colors
+    m2=mesh_object('tri',[[0,1,2]],mat='white')
+    m2.vert_list=[[0,0,0],[1,0,0],[0,1,0]]
+    m2.inst_trans=rng.random((7,3)).tolist()
+    m2.inst_color=rng.random((7,4)).tolist()
+    to.add_object(m2)
+
+    # A mesh which is not instanced
+    m3=mesh_object('plain',[[0,1,2]],mat='white')
+    m3.vert_list=[[0,0,1],[1,0,1],[0,1,1]]
+    to.add_object(m3)
+
+    wdir=str(tmp_path)
+    to.write_gltf(wdir,'inst.glb')
+    jdat,bin_data=read_glb(wdir+'/inst.glb')
+    check_buffer(jdat,bin_data)
+
+    # The extension is used and required, since without it only one
+    # copy of each mesh would be drawn
+    assert jdat['extensionsUsed']==['EXT_mesh_gpu_instancing']
+    assert jdat['extensionsRequired']==['EXT_mesh_gpu_instancing']
+    assert 'extensions' not in jdat['nodes'][2]
+
+    # The mesh is written once
+    pos=read_accessor(jdat,bin_data,
+                      jdat['meshes'][0]['primitives'][0]['attributes']
+                      ['POSITION'])
+    assert len(pos)==len(vtmp)
+
+    for k,mesh,atts in [(0,m1,['TRANSLATION','SCALE','_COLOR_0']),
+                        (1,m2,['TRANSLATION','_COLOR_0'])]:
+        inst=jdat['nodes'][k]['extensions']['EXT_mesh_gpu_instancing']
+        assert sorted(inst['attributes'].keys())==sorted(atts)
+        for att,val in [('TRANSLATION',mesh.inst_trans),
+                        ('SCALE',mesh.inst_scale),
+                        ('_COLOR_0',mesh.inst_color)]:
+            if att in atts:
+                index=inst['attributes'][att]
+                acc=jdat['accessors'][index]
+                bv=jdat['bufferViews'][acc['bufferView']]
+                
+                # Instance attributes are not vertex attributes, so
+                # the bufferView has no target
+                assert 'target' not in bv
+                assert acc['componentType']==5126
+                assert acc['count']==len(val)
+                assert numpy.array_equal(read_accessor(jdat,bin_data,index),
+                                         numpy.asarray(val,
+                                                       dtype=numpy.float32))
+    assert jdat['accessors'][inst['attributes']['_COLOR_0']]['type']=='VEC4'
+        
+    print('Done in test_td_plot_base.py:test_instancing().')
+    
+    return
+
+class fake_table:
+    """A table with numpy columns for testing td_scatter() without
+    O2scl
+    """
+    def __init__(self,cols):
+        self.cols=cols
+    def get_nlines(self):
+        return len(self.cols['x'])
+    def __getitem__(self,col):
+        return self.cols[col]
+
+def test_scatter_mat(monkeypatch):
+
+    import sys
+    # The package exports the td_plot_base class with the same name
+    # as the module
+    tdpb=sys.modules['o2sclpy.td_plot_base']
+
+    print('Running test_td_plot_base.py:test_scatter_mat().')
+
+    rng=numpy.random.default_rng(8)
+    tab=fake_table({'x': rng.random(5),'y': rng.random(5),
+                    'z': rng.random(5),'r': rng.random(5),
+                    'g': rng.random(5),'b': rng.random(5)})
+    class fake_acol_manager:
+        def __init__(self,amp):
+            return
+        def get_table_obj(self):
+            return tab
+    monkeypatch.setattr(tdpb,'o2scl_get_type',lambda amp: b'table')
+    monkeypatch.setattr(tdpb,'acol_manager',fake_acol_manager)
+
+    # The instanced and the separate icospheres use the same
+    # material, either the default or the one which is specified
+    for kwargs in [{},{'mat_name': 'red'}]:
+        mats=[]
+        for instance in [False,True]:
+            tdp=tdpb.td_plot_base()
+            tdp.to.mesh_list=[]
+            tdp.to.mat_list=[]
+            tdp.to.add_mat(material('red',[1,0,0]))
+            tdp.td_scatter(None,['x','y','z'],instance=instance,**kwargs)
+            assert len(tdp.to.mesh_list)==1
+            mats.append(tdp.to.mesh_list[0].mat)
+            assert tdp.to.is_mat(mats[-1])
+            assert (len(tdp.to.mesh_list[0].inst_trans)==5)==instance
+        assert mats[0]==mats[1]
+        assert mats[0]==kwargs.get('mat_name','white')
+        
+    # With colors, the instanced icospheres share a white material
+    tdp=tdpb.td_plot_base()
+    tdp.to.mesh_list=[]
+    tdp.to.mat_list=[]
+    tdp.td_scatter(None,['x','y','z','r','g','b'],instance=True)
+    mesh=tdp.to.mesh_list[0]
+    assert tdp.to.get_mat(mesh.mat).base_color==[1,1,1]
+    assert numpy.shape(mesh.inst_color)==(5,3)
+        
+    print('Done in test_td_plot_base.py:test_scatter_mat().')
+    
+    return
+
+if __name__ == '__main__':
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_gltf(tmp_dir)
+        test_instancing(tmp_dir)
+    print('All tests passed.')
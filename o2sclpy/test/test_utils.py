@@ -0,0 +1,234 @@
+#  -------------------------------------------------------------------
+#  
+#  Copyright (C) 2025, Andrew W. Steiner
+#  
+#  This file is part of O2sclpy.
+#  
+#  O2sclpy is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  O2sclpy is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with O2sclpy. If not, see <http://www.gnu.org/licenses/>.
+#  
+#  -------------------------------------------------------------------
+#
+import o2sclpy
+import numpy
+from o2sclpy.utils import _replay_mix
+
+def test_replay_mix():
+
+    numpy.random.seed(1)
+    y=numpy.arange(1000,dtype=float)
+    x=numpy.stack((y,-y),axis=1)
+    x_orig=x.copy()
+
+    # The reservoir is bounded and the original data is not modified
+    rx,ry,n_seen=x,y,1000
+    for i in range(0,20):
+        yn=numpy.full(500,1000.0+i)
+        xn=numpy.stack((yn,-yn),axis=1)
+        xt,yt,rx,ry,n_seen=_replay_mix(rx,ry,n_seen,xn,yn,
+                                       n_replay=100,n_max=800)
+        assert numpy.shape(xt)==(600,2)
+        assert numpy.shape(yt)==(600,)
+        assert numpy.shape(rx)==(800,2)
+        assert numpy.shape(ry)==(800,)
+    assert n_seen==11000
+    assert numpy.array_equal(x,x_orig)
+
+    # The reservoir rows remain consistent between input and output
+    assert numpy.array_equal(rx[:,0],ry)
+    assert numpy.array_equal(rx[:,1],-ry)
+
+    # The reservoir is approximately uniform over all the points
+    # seen, of which 1000 were from the original data
+    frac=numpy.mean(ry<1000)
+    print('frac:',frac)
+    assert numpy.allclose(frac,1000.0/11000.0,atol=0.05)
+
+    # The reservoir fills up before points are replaced
+    xt,yt,rx,ry,n_seen=_replay_mix(None,None,0,x[0:10],y[0:10])
+    assert numpy.shape(rx)==(10,2)
+    assert numpy.shape(xt)==(10,2)
+    assert n_seen==10
+    
+    return
+    
+def test_ffmpeg_sink(tmp_path,monkeypatch):
+
+    import os
+    import stat
+    import pytest
+    
+    # A stub for ffmpeg which waits for STUB_SLEEP seconds, copies
+    # the raw frames from standard input to the output file, and
+    # exits with the code in STUB_CODE
+    stub=os.path.join(str(tmp_path),'ffmpeg')
+    with open(stub,'w') as f:
+        f.write('#!/bin/sh\n'+
+                'for a in "$@"; do last="$a"; done\n'+
+                'sleep ${STUB_SLEEP:-0}\n'+
+                'cat > "$last"\n'+
+                'exit ${STUB_CODE:-0}\n')
+    os.chmod(stub,os.stat(stub).st_mode|stat.S_IEXEC)
+    monkeypatch.setenv('PATH',str(tmp_path)+os.pathsep+
+                       os.environ['PATH'])
+
+    # The frames arrive in order, and floating point frames are
+    # converted to bytes
+    out=os.path.join(str(tmp_path),'movie')
+    frames=[numpy.full((4,6,3),k,dtype=numpy.uint8) for k in range(0,20)]
+    with o2sclpy.ffmpeg_sink(out,max_queue=2) as sink:
+        for k in range(0,19):
+            sink.write(frames[k])
+        sink.write(frames[19]/255.0)
+    assert sink.returncode==0
+    assert sink.n_frames==20
+    raw=numpy.fromfile(out+'.mp4',dtype=numpy.uint8)
+    assert numpy.array_equal(raw.reshape(20,4,6,3),numpy.array(frames))
+
+    # Frames with a different shape are rejected
+    sink=o2sclpy.ffmpeg_sink(out)
+    sink.write(frames[0])
+    with pytest.raises(ValueError):
+        sink.write(numpy.zeros((2,2,3),dtype=numpy.uint8))
+    sink.close()
+
+    # Reusing one buffer or one figure for all of the frames, while
+    # ffmpeg is slow to read them, does not change the frames which
+    # are waiting in the queue
+    import matplotlib
+    matplotlib.use('agg')
+    import matplotlib.pyplot as plot
+    
+    monkeypatch.setenv('STUB_SLEEP','0.5')
+    buf=numpy.zeros((4,6,3),dtype=numpy.uint8)
+    with o2sclpy.ffmpeg_sink(out,max_queue=16) as sink:
+        for k in range(0,10):
+            buf[:]=k
+            sink.write(buf)
+    raw=numpy.fromfile(out+'.mp4',dtype=numpy.uint8).reshape(10,4,6,3)
+    assert numpy.array_equal(raw[:,0,0,0],numpy.arange(10))
+    
+    fig=plot.figure(figsize=(1,1),dpi=10)
+    with o2sclpy.ffmpeg_sink(out,max_queue=16) as sink:
+        for k in range(0,10):
+            fig.set_facecolor((k/9.0,0,0))
+            sink.write_canvas(fig)
+    plot.close(fig)
+    raw=numpy.fromfile(out+'.mp4',dtype=numpy.uint8).reshape(10,10,10,4)
+    assert len(numpy.unique(raw[:,0,0,0]))==10
+    monkeypatch.delenv('STUB_SLEEP')
+
+    # A non-zero exit code raises an exception
+    monkeypatch.setenv('STUB_CODE','1')
+    sink=o2sclpy.ffmpeg_sink(out)
+    sink.write(frames[0])
+    with pytest.raises(RuntimeError):
+        sink.close()
+    
+    return
+    
+def test_binned_hist():
+
+    rng=numpy.random.default_rng(1)
+    x=rng.standard_normal(100000)
+    y=rng.standard_normal(100000)
+    x[::10]=numpy.nan
+
+    # Compare with numpy after rebinning the base histogram
+    bh=o2sclpy.binned_hist(chunk_size=30000)
+    bh.fill(x)
+    for n_bins in [10,40,100]:
+        counts,edges=bh.rebin(n_bins)
+        c2,e2=numpy.histogram(x[numpy.isfinite(x)],bins=n_bins)
+        assert numpy.array_equal(counts,c2)
+        assert numpy.allclose(edges[0],e2)
+
+    # Add chunks with a fixed range
+    bh2=o2sclpy.binned_hist(n_dim=2)
+    bh2.set_range([-2,-2],[2,2])
+    bh2.add(x[0:50000],y[0:50000])
+    bh2.add(x[50000:],y[50000:])
+    counts,edges=bh2.rebin([20,10])
+    c2,ex,ey=numpy.histogram2d(x,y,bins=[20,10],range=[[-2,2],[-2,2]])
+    assert numpy.array_equal(counts,c2)
+    
+    return
+
+def test_hist_cache():
+
+    o2gp=o2sclpy.o2graph_plotter()
+    
+    rng=numpy.random.default_rng(2)
+    x=rng.standard_normal(200000)
+
+    # Count the number of times the data is binned
+    n_fill=[0]
+    fill=o2sclpy.binned_hist.fill
+    def count_fill(self,*args,**kwargs):
+        n_fill[0]+=1
+        return fill(self,*args,**kwargs)
+    o2sclpy.binned_hist.fill=count_fill
+
+    try:
+        
+        counts,edges=o2gp._hist_counts([x],['x'],20)
+        c2,e2=numpy.histogram(x,bins=20)
+        assert numpy.array_equal(counts,c2)
+        assert n_fill[0]==1
+
+        # Rebinning uses the cached base histogram and does not read
+        # the data, so a change in place which is not recorded in
+        # data_gen is not seen
+        x0=x.copy()
+        x[1::3]*=0.5
+        for n_bins in [10,40,100]:
+            counts,edges=o2gp._hist_counts([x],['x'],n_bins)
+            c2,e2=numpy.histogram(x0,bins=n_bins)
+            assert numpy.array_equal(counts,c2)
+        assert n_fill[0]==1
+        
+        # After data_gen is incremented, as it is by every acol
+        # command, the data is binned again
+        o2gp.data_gen+=1
+        counts,edges=o2gp._hist_counts([x],['x'],20)
+        c2,e2=numpy.histogram(x,bins=20)
+        assert numpy.array_equal(counts,c2)
+        assert n_fill[0]==2
+        
+        # A different array with the same name and size is binned
+        x2=x.copy()
+        x2[0:10]=0.0
+        counts,edges=o2gp._hist_counts([x2],['x'],20)
+        c2,e2=numpy.histogram(x2,bins=20)
+        assert numpy.array_equal(counts,c2)
+        assert n_fill[0]==3
+
+        q=o2gp._column_quantiles(x,'x',[0.16,0.5,0.84])
+        assert numpy.allclose(q,numpy.quantile(x,[0.16,0.5,0.84]),
+                              atol=0.02)
+        x[1::3]*=4.0
+        o2gp.data_gen+=1
+        q=o2gp._column_quantiles(x,'x',[0.16,0.5,0.84])
+        assert numpy.allclose(q,numpy.quantile(x,[0.16,0.5,0.84]),
+                              atol=0.02)
+        assert n_fill[0]==5
+        
+    finally:
+        o2sclpy.binned_hist.fill=fill
+    
+    return
+    
+if __name__ == '__main__':
+    test_replay_mix()
+    test_binned_hist()
+    test_hist_cache()
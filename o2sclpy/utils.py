@@ -1829,3 +1829,596 @@ def screenify_py(tlist, ncols : int = 79):
                 row=row+colt
         output_list.append(row)
     return output_list
+
+def _ffmpeg_output_args(output,vf='',crf=25):
+    """Return the list of ffmpeg arguments which encode the video
+    stream to the mp4 file ``output`` with x264, adding the ``.mp4``
+    suffix if it is missing
+
+    See https://trac.ffmpeg.org/wiki/StreamingGuide. The x264 video
+    codec and yuv420p pixel format are recommended for wide
+    compatibility. The x264 encoder requires even dimensions, so the
+    frames are padded if necessary. The Constant Rate Factor (CRF) is
+    the quality setting for the x264 encoder, see
+    https://trac.ffmpeg.org/wiki/Encode/H.264 .
+    """
+    if output[-4:]!='.mp4':
+        output=output+'.mp4'
+    vf_loc='pad=ceil(iw/2)*2:ceil(ih/2)*2'
+    if vf!='':
+        vf_loc=vf+','+vf_loc
+    return ['-vcodec','libx264','-vf',vf_loc,'-crf',str(crf),
+            '-pix_fmt','yuv420p',output]
+
+class ffmpeg_sink:
+    """An mp4 encoder which accepts frames as numpy arrays and sends
+    them to an ffmpeg process through a pipe, so that no image files
+    are needed
+
+    Frames are given to :meth:`write()` as arrays of shape
+    ``(height,width,3)`` (RGB) or ``(height,width,4)`` (RGBA) of type
+    ``uint8``, or of a floating point type with values between 0 and
+    1, and all frames must have the same shape as the first one. The
+    method :meth:`write_canvas()` adds the current contents of a
+    matplotlib figure and :meth:`write_file()` adds an image read
+    from a file.
+
+    The frames are passed to a separate thread through a queue which
+    holds at most ``max_queue`` frames, so that rendering the next
+    frame overlaps with encoding, and :meth:`write()` blocks when
+    ffmpeg falls behind. If ffmpeg fails, the next call to
+    :meth:`write()` or :meth:`close()` raises a ``RuntimeError``
+    containing the end of ffmpeg's error output.
+
+    This class can be used as a context manager, which calls
+    :meth:`close()` at the end of the block. It requires the
+    installation of ``ffmpeg``.
+    """
+
+    def __init__(self,output,fps=10,vf='',crf=25,max_queue=8,
+                 verbose=0,ffmpeg_cmd='ffmpeg'):
+        self.output=output
+        self.fps=fps
+        self.vf=vf
+        self.crf=crf
+        self.max_queue=max_queue
+        self.verbose=verbose
+        self.ffmpeg_cmd=ffmpeg_cmd
+        self.n_frames=0
+        self.shape=None
+        self.returncode=None
+        self._proc=None
+        self._queue=None
+        self._thread=None
+        self._stderr=None
+        self._error=''
+        return
+
+    def _start(self,shape):
+        """Start the ffmpeg process and the writer thread for frames
+        of shape ``shape``
+        """
+        import shutil
+        import subprocess
+        import tempfile
+        import threading
+        import queue
+
+        if shutil.which(self.ffmpeg_cmd) is None:
+            print('ffmpeg_sink: Could not find',self.ffmpeg_cmd,'.')
+            raise FileNotFoundError('Could not find '+self.ffmpeg_cmd+
+                                    ' in ffmpeg_sink.')
+        
+        self.shape=shape
+        pix_fmt='rgb24'
+        if shape[2]==4:
+            pix_fmt='rgba'
+        cmd=([self.ffmpeg_cmd,'-y','-loglevel','error','-f','rawvideo',
+              '-pix_fmt',pix_fmt,'-s',str(shape[1])+'x'+str(shape[0]),
+              '-r',str(self.fps),'-i','-']+
+             _ffmpeg_output_args(self.output,self.vf,self.crf))
+        if self.verbose>0:
+            print('ffmpeg_sink: Executing "'+' '.join(cmd)+'".')
+            
+        # The error output is sent to a temporary file rather than
+        # a pipe so that it can never fill up and block ffmpeg
+        self._stderr=tempfile.TemporaryFile()
+        self._proc=subprocess.Popen(cmd,stdin=subprocess.PIPE,
+                                    stdout=subprocess.DEVNULL,
+                                    stderr=self._stderr)
+        self._queue=queue.Queue(maxsize=self.max_queue)
+        self._thread=threading.Thread(target=self._writer,daemon=True)
+        self._thread.start()
+        return
+    
+    def _writer(self):
+        """Send the frames in the queue to ffmpeg until a None is
+        found
+        """
+        while True:
+            frame=self._queue.get()
+            if frame is None:
+                break
+            if self._error=='':
+                try:
+                    self._proc.stdin.write(frame)
+                except (BrokenPipeError,OSError) as e:
+                    self._error='ffmpeg stopped accepting frames: '+str(e)
+        return
+
+    def _check(self):
+        """Raise a ``RuntimeError`` if ffmpeg has failed
+        """
+        if self._error!='' or (self._proc is not None and
+                               self._proc.poll() not in [None,0]):
+            msg=self._error
+            if self._stderr is not None:
+                self._stderr.seek(0)
+                msg=msg+' '+self._stderr.read()[-2000:].decode(
+                    errors='replace')
+            print('ffmpeg_sink: ffmpeg failed:',msg)
+            raise RuntimeError('ffmpeg failed in ffmpeg_sink: '+msg)
+        return
+        
+    def write(self,frame):
+        """Add one frame to the movie
+        """
+        frame=numpy.asarray(frame)
+        if frame.dtype!=numpy.uint8:
+            frame=numpy.clip(numpy.rint(frame*255.0),0,
+                             255).astype(numpy.uint8)
+        if frame.ndim!=3 or frame.shape[2] not in [3,4]:
+            print('ffmpeg_sink: Frame shape',frame.shape,
+                  'is not (height,width,3) or (height,width,4).')
+            raise ValueError('Invalid frame shape '+str(frame.shape)+
+                             ' in ffmpeg_sink.')
+        if self._proc is None:
+            self._start(frame.shape)
+        elif frame.shape!=self.shape:
+            print('ffmpeg_sink: Frame shape',frame.shape,
+                  'does not match first frame shape',self.shape,'.')
+            raise ValueError('Frame shape '+str(frame.shape)+
+                             ' does not match '+str(self.shape)+
+                             ' in ffmpeg_sink.')
+        self._check()
+        # Queue a copy, since the caller may reuse the array, e.g. the
+        # buffer of a figure which is redrawn for the next frame,
+        # before the writer thread sends this frame to ffmpeg
+        self._queue.put(numpy.array(frame,order='C',copy=True))
+        self.n_frames+=1
+        return
+
+    def write_canvas(self,fig):
+        """Draw the matplotlib figure ``fig`` and add it to the movie
+        """
+        fig.canvas.draw()
+        self.write(numpy.asarray(fig.canvas.buffer_rgba()))
+        return
+
+    def write_file(self,fname):
+        """Read the image in file ``fname`` and add it to the movie
+        """
+        import matplotlib.image
+        
+        self.write(matplotlib.image.imread(fname))
+        return
+    
+    def close(self):
+        """Finish the movie, wait for ffmpeg to complete, and return
+        its return code
+        """
+        if self._proc is None:
+            return 0
+        if self.returncode is None:
+            self._queue.put(None)
+            self._thread.join()
+            try:
+                self._proc.stdin.close()
+            except (BrokenPipeError,OSError):
+                pass
+            self.returncode=self._proc.wait()
+            if self.verbose>0:
+                print('ffmpeg_sink: Wrote',self.n_frames,'frames.')
+            self._check()
+            self._stderr.close()
+            self._stderr=None
+        return self.returncode
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        if exc_type is None:
+            self.close()
+        elif self._proc is not None and self.returncode is None:
+            self._queue.put(None)
+            self._thread.join()
+            self._proc.kill()
+            self.returncode=self._proc.wait()
+        return False
+
+def _bin_indices(col,lo,hi,n):
+    """Return the indices of the values in the array ``col`` in
+    ``n`` uniform bins from ``lo`` to ``hi``, with the last bin
+    including its upper edge, and with index ``n`` for values outside
+    the range and NaNs
+    """
+    with numpy.errstate(invalid='ignore'):
+        ok=(col>=lo) & (col<=hi)
+        u=(col-lo)*(n/(hi-lo))
+        i=numpy.clip(numpy.where(ok,u,0.0).astype(numpy.int64),0,n-1)
+    i[~ok]=n
+    return i
+
+class binned_hist:
+    """A one- or two-dimensional histogram with uniform bins, computed
+    in a single vectorized pass over the data without sorting or
+    copying it
+
+    The data is binned into a fine base histogram with ``n_base``
+    bins in each dimension, and coarser histograms are obtained from
+    :meth:`rebin()` by summing groups of base bins, which does not
+    require the data. The defaults of 50400 bins in one dimension
+    and 1200 bins in two dimensions are divisible by most of the
+    common bin counts, including 10, 20, 25, 40, 50, and 100. The
+    data can be given all at once to
+    :meth:`fill()`, or in chunks, e.g. from a large table, to
+    :meth:`add()` after the range is set with :meth:`set_range()`.
+    Chunks larger than ``chunk_size`` points are split and, if
+    ``n_jobs`` is not 1, binned in a pool of threads (one per core
+    if ``n_jobs`` is -1).
+
+    As in ``numpy.histogram()``, the last bin includes its upper
+    edge, and points outside the range and NaNs are ignored. Points
+    within rounding error of a bin edge may be counted in the
+    neighboring bin.
+    """
+
+    def __init__(self,n_dim=1,n_base=0,chunk_size=1000000,n_jobs=1,
+                 verbose=0):
+        if n_dim!=1 and n_dim!=2:
+            raise ValueError('Only one or two dimensions are supported '+
+                             'in binned_hist::__init__().')
+        if n_base<=0:
+            if n_dim==1:
+                n_base=50400
+            else:
+                n_base=1200
+        self.n_dim=n_dim
+        self.n_base=n_base
+        self.chunk_size=chunk_size
+        self.n_jobs=n_jobs
+        self.verbose=verbose
+        self.lo=None
+        self.hi=None
+        self.counts=None
+        self.n_points=0
+
+    def set_range(self,lo,hi):
+        """Set the lower and upper limits of the histogram, given as
+        lists with one entry for each dimension, and clear the
+        counts
+        """
+        if len(lo)!=self.n_dim or len(hi)!=self.n_dim:
+            raise ValueError('Limits must have '+str(self.n_dim)+
+                             ' entries in binned_hist::set_range().')
+        self.lo=[float(v) for v in lo]
+        self.hi=[float(v) for v in hi]
+        for j in range(0,self.n_dim):
+            if self.hi[j]<=self.lo[j]:
+                # Same convention as numpy.histogram() for a single
+                # value
+                self.lo[j]-=0.5
+                self.hi[j]+=0.5
+        self.counts=numpy.zeros([self.n_base]*self.n_dim)
+        self.n_points=0
+        return
+
+    def _bin_chunk(self,cols,weights):
+        """Return the base histogram counts for one chunk of data,
+        flattened to one dimension, including an extra bin in each
+        dimension for points outside the range
+        """
+        n=self.n_base
+        flat=_bin_indices(cols[0],self.lo[0],self.hi[0],n)
+        for j in range(1,self.n_dim):
+            flat*=n+1
+            flat+=_bin_indices(cols[j],self.lo[j],self.hi[j],n)
+        w=None
+        if weights is not None:
+            w=numpy.asarray(weights,dtype=numpy.float64)
+        return numpy.bincount(flat,weights=w,minlength=(n+1)**self.n_dim)
+
+    def add(self,*cols,weights=None):
+        """Add the points in the one-dimensional arrays ``cols``, one
+        for each dimension, to the base histogram, optionally with
+        weights
+        """
+        if self.counts is None:
+            raise ValueError('Range not set in binned_hist::add().')
+        if len(cols)!=self.n_dim:
+            raise ValueError('Expected '+str(self.n_dim)+' arrays in '+
+                             'binned_hist::add().')
+        cols=[numpy.asarray(c) for c in cols]
+        npts=len(cols[0])
+        starts=range(0,npts,self.chunk_size)
+
+        def bin_one(i):
+            wc=None
+            if weights is not None:
+                wc=weights[i:i+self.chunk_size]
+            return self._bin_chunk([c[i:i+self.chunk_size] for c in cols],
+                                   wc)
+
+        if self.n_jobs==1 or len(starts)<=1:
+            flat=sum(bin_one(i) for i in starts)
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            
+            n_jobs=self.n_jobs
+            if n_jobs<=0:
+                n_jobs=os.cpu_count()
+            with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+                flat=sum(pool.map(bin_one,starts))
+        if npts>0:
+            flat=flat.reshape([self.n_base+1]*self.n_dim)
+            self.counts+=flat[tuple([slice(0,self.n_base)]*self.n_dim)]
+        self.n_points+=npts
+        return
+
+    def fill(self,*cols,weights=None,lo=None,hi=None):
+        """Compute the base histogram of the one-dimensional arrays
+        ``cols``, one for each dimension, with limits ``lo`` and
+        ``hi`` or, if they are not given, the minimum and maximum of
+        the finite values of the data
+        """
+        if len(cols)!=self.n_dim:
+            raise ValueError('Expected '+str(self.n_dim)+' arrays in '+
+                             'binned_hist::fill().')
+        if lo is None:
+            lo=[numpy.nanmin(c) for c in cols]
+        if hi is None:
+            hi=[numpy.nanmax(c) for c in cols]
+        self.set_range(lo,hi)
+        self.add(*cols,weights=weights)
+        return
+
+    def edges(self,n_bins):
+        """Return a list of the bin edges for ``n_bins`` bins in each
+        dimension
+        """
+        if isinstance(n_bins,int):
+            n_bins=[n_bins]*self.n_dim
+        return [numpy.linspace(self.lo[j],self.hi[j],n_bins[j]+1)
+                for j in range(0,self.n_dim)]
+        
+    def can_rebin(self,n_bins):
+        """Return true if :meth:`rebin()` gives exact counts for
+        ``n_bins`` bins in each dimension
+        """
+        if isinstance(n_bins,int):
+            n_bins=[n_bins]*self.n_dim
+        return all(b>0 and self.n_base%b==0 for b in n_bins)
+        
+    def rebin(self,n_bins):
+        """Return the counts and a list of the bin edges for ``n_bins``
+        bins (an integer, or a list with one integer for each
+        dimension) spanning the range of the base histogram
+
+        If the number of base bins is not divisible by the number of
+        bins, each base bin is assigned to the bin which contains its
+        center, so the counts are approximate.
+        """
+        if self.counts is None:
+            raise ValueError('Histogram is empty in binned_hist::rebin().')
+        if isinstance(n_bins,int):
+            n_bins=[n_bins]*self.n_dim
+        res=self.counts
+        for j in range(0,self.n_dim):
+            b=n_bins[j]
+            if self.n_base%b==0:
+                shape=list(res.shape)
+                shape[j:j+1]=[b,self.n_base//b]
+                res=res.reshape(shape).sum(axis=j+1)
+            else:
+                if self.verbose>0:
+                    print('binned_hist::rebin(): Number of bins',b,
+                          'does not divide',self.n_base,'so counts',
+                          'are approximate.')
+                centers=(numpy.arange(self.n_base)+0.5)*b/self.n_base
+                res=numpy.add.reduceat(res,numpy.searchsorted(
+                    centers,numpy.arange(b)),axis=j)
+        return res,self.edges(n_bins)
+
+    def to_hist(self,n_bins):
+        """Return an O2scl ``hist`` (for one dimension) or ``hist_2d``
+        (for two dimensions) object with ``n_bins`` bins filled with
+        the counts from :meth:`rebin()`
+        """
+        from o2sclpy.base import std_vector
+        from o2sclpy.other import hist, hist_2d
+        
+        counts,edges=self.rebin(n_bins)
+        ve=[]
+        for e in edges:
+            v=std_vector()
+            v.from_list(e.tolist())
+            ve.append(v)
+            
+        if self.n_dim==1:
+            h=hist()
+            h.set_bin_edges_vec(len(edges[0]),ve[0])
+            for i in range(0,len(counts)):
+                h.set_wgt_i(i,counts[i])
+        else:
+            h=hist_2d()
+            h.set_bin_edges_vec(len(edges[0]),ve[0],len(edges[1]),ve[1])
+            for i in range(0,counts.shape[0]):
+                for j in range(0,counts.shape[1]):
+                    h.set_wgt_i(i,j,counts[i,j])
+        return h
+
+def _replay_mix(res_in,res_out,n_seen,in_data,out_data,n_replay=None,
+                n_max=100000):
+    """Combine new training data with points replayed from a bounded
+    reservoir of previous training data, and add the new data to the
+    reservoir
+
+    The reservoir, ``res_in`` and ``res_out`` (or None if it is
+    empty), is a uniform random sample of at most ``n_max`` of the
+    ``n_seen`` points which have been used for training so far. The
+    training data is the new data followed by ``n_replay`` points
+    (by default, the number of new points) drawn from the reservoir.
+    The new points are then added to the reservoir with reservoir
+    sampling, so the memory is bounded by ``n_max`` and the cost
+    scales with the size of the new data.
+
+    This function returns the training input and output, the
+    updated reservoir input and output, and the updated value of
+    ``n_seen``.
+    """
+    n_new=numpy.shape(in_data)[0]
+    n_old=0
+    if res_in is not None:
+        n_old=numpy.shape(res_in)[0]
+    n_seen=max(n_seen,n_old)
+    
+    if n_replay is None:
+        n_replay=n_new
+    n_replay=min(n_replay,n_old)
+
+    if n_replay>0:
+        ix=numpy.random.choice(n_old,n_replay,replace=False)
+        in_train=numpy.concatenate((in_data,res_in[ix]))
+        out_train=numpy.concatenate((out_data,res_out[ix]))
+    else:
+        in_train=in_data
+        out_train=out_data
+
+    # If the reservoir is still the full training data, then it
+    # is not owned by the caller and must be copied (or subsampled)
+    # before it is modified below
+    if n_old>n_max:
+        ix=numpy.sort(numpy.random.choice(n_old,n_max,replace=False))
+        res_in=res_in[ix]
+        res_out=res_out[ix]
+        n_old=n_max
+    elif n_old==n_max and n_seen==n_old and n_new>0:
+        res_in=numpy.array(res_in)
+        res_out=numpy.array(res_out)
+
+    # Fill the reservoir until it contains n_max points
+    n_fill=min(n_new,n_max-n_old)
+    if n_fill>0:
+        if n_old==0:
+            res_in=numpy.array(in_data[0:n_fill])
+            res_out=numpy.array(out_data[0:n_fill])
+        else:
+            res_in=numpy.concatenate((res_in,in_data[0:n_fill]))
+            res_out=numpy.concatenate((res_out,out_data[0:n_fill]))
+    n_seen+=n_fill
+
+    # Replace random reservoir points with the remaining new
+    # points. The point which is the t-th seen is kept with
+    # probability n_max/t.
+    n_rest=n_new-n_fill
+    if n_rest>0:
+        t=n_seen+numpy.arange(1,n_rest+1)
+        j=(numpy.random.random_sample(n_rest)*t).astype(numpy.int64)
+        keep=numpy.nonzero(j<n_max)[0]
+        res_in[j[keep]]=numpy.asarray(in_data)[n_fill+keep]
+        res_out[j[keep]]=numpy.asarray(out_data)[n_fill+keep]
+        n_seen+=n_rest
+        
+    return in_train,out_train,res_in,res_out,n_seen
+
+def _flatten_tree(tree):
+    """Copy the fitted scikit-learn tree object ``tree`` (the
+    ``tree_`` attribute of a decision tree) into compact contiguous
+    arrays which can be traversed without scikit-learn
+
+    This function returns the feature index of each node, the
+    threshold of each node, an array of shape ``(n_nodes,2)`` with
+    the left and right children of each node, and the depth of the
+    tree. Leaves are stored as nodes with an infinite threshold
+    whose children are the leaf itself, so that a traversal of
+    ``depth`` levels always ends at the correct leaf.
+    """
+    leaf=tree.children_left<0
+    feature=numpy.where(leaf,0,tree.feature).astype(numpy.intp)
+    threshold=numpy.where(leaf,numpy.inf,tree.threshold).astype(
+        numpy.float64)
+    children=numpy.ascontiguousarray(numpy.stack(
+        [tree.children_left,tree.children_right],axis=1),
+                                     dtype=numpy.intp)
+    ix=numpy.nonzero(leaf)[0]
+    children[ix,0]=ix
+    children[ix,1]=ix
+    return feature,threshold,children,int(tree.max_depth)
+
+def _tree_walk(feature,threshold,children,depth,x):
+    """Traverse a tree flattened by :func:`_flatten_tree` for all of
+    the points in ``x`` simultaneously and return the index of the
+    leaf for each point
+    """
+    # scikit-learn compares single-precision inputs to the
+    # thresholds, so we do the same to obtain identical results
+    x=numpy.asarray(numpy.asarray(x,dtype=numpy.float32),
+                    dtype=numpy.float64)
+    if x.ndim==1:
+        x=x.reshape(1,-1)
+    n_pts,n_dim=x.shape
+
+    if n_pts==1:
+        # For a single point, a scalar loop is faster than the
+        # vectorized traversal below
+        xp=x[0].tolist()
+        node=0
+        for k in range(0,depth):
+            if xp[feature[node]]<=threshold[node]:
+                node=children[node,0]
+            else:
+                node=children[node,1]
+        return numpy.array([node],dtype=numpy.intp)
+        
+    # Move all points one level down the tree in each pass, using
+    # the flattened array and a single index to avoid
+    # two-dimensional fancy indexing
+    xf=x.ravel()
+    pos=numpy.arange(n_pts)*n_dim
+    child=children.ravel()
+    node=numpy.zeros(n_pts,dtype=numpy.intp)
+    for k in range(0,depth):
+        right=xf[pos+feature[node]]>threshold[node]
+        node=child[2*node+right]
+    return node
+
+def _iter_chunks(source,chunk_size,col_names=None):
+    """Yield the data in ``source`` as two-dimensional numpy arrays
+    with at most ``chunk_size`` rows
+
+    The source can be a numpy array, an O2scl :class:`table` object
+    (using the columns in ``col_names``, or all columns if
+    ``col_names`` is None), or any other iterable of arrays. If the
+    iterable yields tuples, as :class:`interpm_hdf_source` does for
+    tables on disk, the first element of each tuple is used.
+    """
+    if isinstance(source,numpy.ndarray):
+        for i in range(0,source.shape[0],chunk_size):
+            yield source[i:i+chunk_size]
+    elif hasattr(source,'get_nlines') and hasattr(source,'get_ncolumns'):
+        if col_names is None:
+            col_names=[source.get_column_name(i) for i in
+                       range(0,source.get_ncolumns())]
+        n_lines=source.get_nlines()
+        cols=[source[name] for name in col_names]
+        # The column views may be longer than the number of lines
+        for i in range(0,n_lines,chunk_size):
+            j=min(i+chunk_size,n_lines)
+            yield numpy.column_stack([col[i:j] for col in cols])
+    else:
+        for item in source:
+            if isinstance(item,tuple):
+                item=item[0]
+            yield numpy.asarray(item,dtype=numpy.float64)
+    return